@@ -0,0 +1,182 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+# =============================
+# 清掃実績の集計（レポート索引の追加/削除通知で逐次更新）
+# - 日別 / 清掃者別 / 部屋別 / タスク別 + 全体
+# - 件数、totalScore の平均/最小/最大、durationSeconds のパーセンタイル、タスクごとの要修正率
+# - 所要時間は固定幅のヒストグラムで持つので、パーセンタイルの計算量は件数に依存しない
+# - 置き換え・削除（最小/最大を戻せない）があった場合は、次の参照時に索引から作り直す
+# - 参照のたびに索引の取り込み位置（rowid）より後の行を読むので、gunicorn の他のワーカーが
+#   保存したレポートも（このワーカーの通知が無くても）反映される
+# - 取り込み済みかどうかは rowid の取り込み位置だけで判断する（ファイル名を覚えておかない）
+#   通知は取り込み位置の直後から続く行だけ取り込み、間に他のワーカーの行があれば次の参照に任せる
+# =============================
+
+DIMENSIONS = ("day", "cleaner", "room", "task")
+DURATION_BUCKET_SECONDS = 30
+DURATION_BUCKETS = 480  # 30秒刻みで4時間まで（それ以上は最後のバケット）
+PERCENTILES = (50, 90, 95, 99)
+
+# 未判定のステータス（要修正率の分母に含めない）
+UNCHECKED_STATUSES = {"", "pending", "todo"}
+FIX_STATUSES = {"fix"}
+
+
+class Rollup:
+    __slots__ = ("count", "score_n", "score_sum", "score_min", "score_max",
+                 "dur_n", "dur_max", "dur_hist", "tasks")
+
+    def __init__(self):
+        self.count = 0
+        self.score_n = 0
+        self.score_sum = 0.0
+        self.score_min: Optional[float] = None
+        self.score_max: Optional[float] = None
+        self.dur_n = 0
+        self.dur_max: Optional[float] = None
+        self.dur_hist = [0] * DURATION_BUCKETS
+        self.tasks: Dict[str, List[int]] = {}  # task_id -> [判定済み件数, 要修正件数]
+
+    def add(self, rec: Dict[str, Any]):
+        self.count += 1
+        score = rec.get("totalScore")
+        if score is not None:
+            self.score_n += 1
+            self.score_sum += score
+            self.score_min = score if self.score_min is None else min(self.score_min, score)
+            self.score_max = score if self.score_max is None else max(self.score_max, score)
+        dur = rec.get("durationSeconds")
+        if dur is not None and dur >= 0:
+            self.dur_n += 1
+            self.dur_max = dur if self.dur_max is None else max(self.dur_max, dur)
+            self.dur_hist[min(int(dur // DURATION_BUCKET_SECONDS), DURATION_BUCKETS - 1)] += 1
+        for tid, status in (rec.get("tasks") or {}).items():
+            if status in UNCHECKED_STATUSES:
+                continue
+            t = self.tasks.setdefault(tid, [0, 0])
+            t[0] += 1
+            if status in FIX_STATUSES:
+                t[1] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.dur_n:
+            return None
+        target = self.dur_n * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.dur_hist):
+            if not n:
+                continue
+            if seen + n >= target:
+                # バケット内は一様と仮定して線形補間
+                lo = i * DURATION_BUCKET_SECONDS
+                frac = (target - seen) / n
+                value = lo + frac * DURATION_BUCKET_SECONDS
+                return round(min(value, self.dur_max), 1)
+            seen += n
+        return self.dur_max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "totalScore": {
+                "mean": round(self.score_sum / self.score_n, 2) if self.score_n else None,
+                "min": self.score_min,
+                "max": self.score_max,
+            },
+            "durationSeconds": {
+                **{f"p{p}": self.percentile(p) for p in PERCENTILES},
+                "max": self.dur_max,
+            },
+            "tasks": {
+                tid: {"checked": c, "fix": f, "fix_rate": round(f / c, 4) if c else None}
+                for tid, (c, f) in sorted(self.tasks.items())
+            },
+        }
+
+
+class Analytics:
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._stale = True
+        self._overall = Rollup()
+        self._rollups: Dict[str, Dict[str, Rollup]] = {d: {} for d in DIMENSIONS}
+        # 索引の取り込み位置（rowid: ここまでの行は集計済み）と、その時点の上書き・削除の回数
+        self._hwm = 0
+        self._removals = 0
+        index.subscribe(self.on_change)
+        self.rebuild()
+
+    def _ingest(self, rec: Dict[str, Any]):
+        self._overall.add(rec)
+        keys = {
+            "day": [rec.get("day") or ""],
+            "cleaner": [rec.get("cleanerId") or ""],
+            "room": [rec.get("roomId") or ""],
+            "task": list((rec.get("tasks") or {}).keys()),
+        }
+        for dim, values in keys.items():
+            bucket = self._rollups[dim]
+            for k in values:
+                r = bucket.get(k)
+                if r is None:
+                    r = bucket[k] = Rollup()
+                r.add(rec)
+
+    def rebuild(self):
+        with self._lock:
+            self._overall = Rollup()
+            self._rollups = {d: {} for d in DIMENSIONS}
+            # 先に位置を読んでおく（読み込み中に増えた行は飛ばし、次の参照で changes_since から取り込む）
+            self._hwm, self._removals = self.index.high_water()
+            for rec in self.index.iter_records():
+                if rec["seq"] <= self._hwm:
+                    self._ingest(rec)
+            self._stale = False
+
+    def on_change(self, added: List[Dict[str, Any]], removed: List[Dict[str, Any]]):
+        with self._lock:
+            if removed:
+                self._stale = True
+                return
+            if self._stale:
+                return
+            for rec in added:  # seq の昇順
+                if rec["seq"] <= self._hwm:
+                    continue  # 作り直し・changes_since で取り込み済み
+                if rec["seq"] != self._hwm + 1:
+                    break  # 間に他のワーカーの行がある: 次の参照で順に取り込む
+                self._ingest(rec)
+                self._hwm = rec["seq"]
+
+    def _fresh(self):
+        if not self._stale:
+            with self._lock:
+                changes = self.index.changes_since(self._hwm, self._removals)
+                if changes is None:
+                    self._stale = True
+                else:
+                    records, self._hwm = changes
+                    for rec in records:
+                        self._ingest(rec)
+        if self._stale:
+            self.rebuild()
+
+    def summary(self, dim: Optional[str] = None, key: Optional[str] = None) -> Dict[str, Any]:
+        self._fresh()
+        with self._lock:
+            if not dim:
+                return self._overall.summary()
+            if dim not in self._rollups:
+                raise KeyError(dim)
+            bucket = self._rollups[dim]
+            if key is not None:
+                r = bucket.get(key)
+                return r.summary() if r else Rollup().summary()
+            return {k: bucket[k].summary() for k in sorted(bucket)}
+
+    def keys(self, dim: str) -> List[str]:
+        self._fresh()
+        with self._lock:
+            return sorted(self._rollups.get(dim, {}))
@@ -1,11 +1,28 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, session, redirect, url_for, abort
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, abort, stream_with_context
 import os
 import uuid
-import urllib.request
 import re
+import base64
+import hashlib
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
 
-app = Flask(__name__)
+import model_assets
+from report_index import ReportIndex
+import report_store
+import report_codec
+from analytics import Analytics
+from outbox import Outbox, STATUS_PENDING
+import bulk_ingest
+import report_export
+import metrics
+import precompress
+import vendor_assets
+from werkzeug.security import safe_join
+
+# /static は下の static_asset で配信する（圧縮済みコピー・内容ハッシュでのキャッシュ）
+app = Flask(__name__, static_folder=None)
 
 # ===== 監査ログイン（初期パスワード固定）=====
 # ※要件どおり初期パスワードは 1111
@@ -14,82 +31,373 @@ AUDITOR_PASSWORD = "1111"
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-key")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+# 保存先は REPORTS_DIR で変更可（ベンチマークなどで一時ディレクトリを使う場合）
+REPORTS_DIR = os.environ.get("REPORTS_DIR", os.path.join(BASE_DIR, "reports"))
 os.makedirs(REPORTS_DIR, exist_ok=True)
+# 索引などの内部データ（reports/ とは分ける: /reports/ からダウンロードされないように）
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(BASE_DIR, "var"))
+os.makedirs(DATA_DIR, exist_ok=True)
+# レポートの保存方式: fs（REPORTS_DIR に日付別のディレクトリで保存）/ sqlite（DATA_DIR/reports.sqlite3, WALモード）
+# 既存の reports/ 直下のファイルは fs でそのまま読める。移行は tools/migrate_reports.py
+REPORT_STORE_KIND = os.environ.get("REPORT_STORE", "fs").strip().lower() or "fs"
+REPORT_STORE = report_store.open_store(REPORT_STORE_KIND, REPORTS_DIR, os.path.join(DATA_DIR, "reports.sqlite3"))
 
 # 送信先（任意）: 環境変数で指定
 # 例: AUDITOR_ENDPOINT=https://xxxxx.a.run.app/api/receive_report
 AUDITOR_ENDPOINT = os.environ.get("AUDITOR_ENDPOINT", "").strip()
+# 転送のまとめ件数・タイムアウト・再送間隔の上限（秒）
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_TIMEOUT = float(os.environ.get("OUTBOX_TIMEOUT", "10"))
+OUTBOX_MAX_BACKOFF = float(os.environ.get("OUTBOX_MAX_BACKOFF", "300"))
+# 受信側が ok: false で拒否したレポートを何回まで送り直すか（4xx は1回で送信失敗にする）
+OUTBOX_MAX_REJECTIONS = int(os.environ.get("OUTBOX_MAX_REJECTIONS", "3"))
+# 一括受信（/api/receive_report）で1回にまとめて書き込む件数
+RECEIVE_BATCH_SIZE = int(os.environ.get("RECEIVE_BATCH_SIZE", "200"))
+
+# /metrics（Prometheus形式）。METRICS_TOKEN を指定すると Authorization: Bearer <token> が必要
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "").strip()
+
+# 画像判定API（/api/classify）のマイクロバッチ設定
+CLASSIFY_MAX_BATCH = int(os.environ.get("CLASSIFY_MAX_BATCH", "16"))
+CLASSIFY_MAX_WAIT_MS = float(os.environ.get("CLASSIFY_MAX_WAIT_MS", "10"))
+CLASSIFY_QUEUE_SIZE = int(os.environ.get("CLASSIFY_QUEUE_SIZE", "64"))
+CLASSIFY_TIMEOUT = float(os.environ.get("CLASSIFY_TIMEOUT", "10"))
+CLASSIFY_MAX_IMAGES = int(os.environ.get("CLASSIFY_MAX_IMAGES", "16"))
+# 推論を行うプロセス数（inference_pool.py）。0: このプロセス内のスレッドで推論
+# auto（既定）: CPUコア数 ÷ gunicornのワーカー数（GUNICORN_WORKERS）。1コアなら 0 と同じ
+CLASSIFY_PROCESSES = os.environ.get("CLASSIFY_PROCESSES", "auto").strip().lower() or "auto"
+# 起動時にモデルを読み込んで1回推論しておく（デプロイ直後の最初のリクエストを遅くしない）
+CLASSIFY_WARMUP = os.environ.get("CLASSIFY_WARMUP", "1") != "0"
+
+# ===== モデル配信（内容ハッシュ付きファイル名 + immutableキャッシュ）=====
+MODEL_ASSET_DIR = os.path.join(BASE_DIR, "build", "model")
+MODEL_ASSETS = model_assets.build(MODEL_ASSET_DIR)
+
+def model_asset_urls():
+    return {
+        "version": MODEL_ASSETS["version"],
+        "model_url": f"/model/{MODEL_ASSETS['model']}",
+        "metadata_url": f"/model/{MODEL_ASSETS['metadata']}",
+    }
+
+# ===== 圧縮済みコピー（.br/.gz）と条件付きリクエスト（ETag / Last-Modified → 304）=====
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+PRECOMPRESSED_DIR = os.path.join(BASE_DIR, "build", "precompressed")
+# レポートの圧縮済みコピーは初回のダウンロード時に作る（名前は内容のハッシュ、合計が上限を超えたら古いものから消す）
+REPORT_VARIANTS_DIR = os.path.join(DATA_DIR, "precompressed", "reports")
+REPORT_VARIANTS_MAX_MB = float(os.environ.get("REPORT_VARIANTS_MAX_MB", "256"))
+# 監査画面などの動的なページは、この大きさ以上なら応答時に圧縮する
+DYNAMIC_COMPRESS_MIN_BYTES = int(os.environ.get("DYNAMIC_COMPRESS_MIN_BYTES", "1024"))
+REPORT_CACHE_CONTROL = "private, no-cache"
+
+# 起動時に1回だけ作る（作成済みで元ファイルより新しければそのまま使う）
+precompress.build_dir(STATIC_DIR, os.path.join(PRECOMPRESSED_DIR, "static"))
+precompress.build_dir(MODEL_ASSET_DIR, os.path.join(PRECOMPRESSED_DIR, "model"))
+
+def _send_asset(root, variants_root, filename, cache_control, **kwargs):
+    path = safe_join(root, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    variants_dir = os.path.join(variants_root, os.path.dirname(filename))
+    return precompress.send_file(request, path, variants_dir, cache_control=cache_control, **kwargs)
+
+@app.get("/model/<path:filename>")
+def model_asset(filename):
+    return _send_asset(MODEL_ASSET_DIR, os.path.join(PRECOMPRESSED_DIR, "model"), filename,
+                       model_assets.IMMUTABLE_CACHE_CONTROL)
+
+@app.get("/static/<path:filename>", endpoint="static")
+def static_asset(filename):
+    # asset_url() の ?v=<内容ハッシュ> が今の内容と一致するときだけ immutable で長期キャッシュ
+    path = safe_join(STATIC_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    version = request.args.get("v", "")
+    immutable = bool(version) and version == precompress.file_digest(path)[:12]
+    return _send_asset(STATIC_DIR, os.path.join(PRECOMPRESSED_DIR, "static"), filename,
+                       model_assets.IMMUTABLE_CACHE_CONTROL if immutable else "no-cache")
+
+@app.template_global()
+def asset_url(filename):
+    path = safe_join(STATIC_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return f"/static/{filename}"
+    return f"/static/{filename}?v={precompress.file_digest(path)[:12]}"
+
+@app.after_request
+def _compress_dynamic(resp):
+    # テンプレートやJSONの応答: 強いETagで 304 を返し、Accept-Encoding に応じて圧縮する
+    if resp.mimetype in ("text/html", "application/json") and request.endpoint not in ("static", "model_asset"):
+        if request.path.startswith("/auditor") and "Cache-Control" not in resp.headers:
+            resp.headers["Cache-Control"] = REPORT_CACHE_CONTROL
+        return precompress.compress_response(request, resp, min_size=DYNAMIC_COMPRESS_MIN_BYTES)
+    return resp
 
 @app.get("/")
 def index():
-    return render_template("index.html")
+    return render_template("index.html", model_assets=model_asset_urls(),
+                           vendor_scripts=vendor_assets.script_urls(asset_url))
 
-@app.post("/api/report")
-def api_report():
-    data = request.get_json(silent=True) or {}
-    report_id = uuid.uuid4().hex[:12]
-    filename = f"cleaning_report_{report_id}.txt"
-    filepath = os.path.join(REPORTS_DIR, filename)
-
-    # ===== テキスト化（監査側で読み込みやすい形式）=====
-    lines = []
-    lines.append("CLEANING_REPORT_V1")
-    lines.append(f"report_id: {report_id}")
-    lines.append(f"roomId: {data.get('roomId','')}")
-    lines.append(f"cleanerId: {data.get('cleanerId','')}")
-    lines.append(f"startedAt: {data.get('startedAt','')}")
-    lines.append(f"finishedAt: {data.get('finishedAt','')}")
-    lines.append(f"durationSeconds: {data.get('durationSeconds','')}")
-    lines.append(f"totalScore: {data.get('totalScore','')}")
-    lines.append("")
-    lines.append("tasks:")
-    tasks = data.get("tasks") or {}
-    for tid, tinfo in tasks.items():
-        status = (tinfo or {}).get("status","")
-        score = (tinfo or {}).get("score","")
-        checkedAt = (tinfo or {}).get("checkedAt","")
-        notes = (tinfo or {}).get("notes","")
-        lines.append(f"- id: {tid}")
-        lines.append(f"  status: {status}")
-        lines.append(f"  score: {score}")
-        lines.append(f"  checkedAt: {checkedAt}")
-        lines.append(f"  notes: {notes}")
-    text = "\n".join(lines) + "\n"
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(text)
+# ===== オフライン対応（Service Worker）=====
+# スコープを / にするためルート直下で配信する。中身（事前キャッシュのURL）は毎回ここで組み立てる
+@app.get("/sw.js")
+def service_worker():
+    precache = [asset_url(name) for name in ("styles.css", "app.js", "report_queue.js", "room_map.png")]
+    precache += vendor_assets.script_urls(asset_url)
+    precache += [f"/model/{name}" for name in
+                 [MODEL_ASSETS["model"], MODEL_ASSETS["metadata"], *MODEL_ASSETS.get("weights", [])]]
+    version = hashlib.sha256("\n".join(precache).encode("utf-8")).hexdigest()[:12]
+    body = render_template("sw.js", version=version, precache=precache,
+                           report_queue_url=asset_url("report_queue.js"))
+    return Response(body, mimetype="text/javascript", headers={"Cache-Control": "no-cache"})
 
-    # ===== 外部送信（任意：旧仕様互換）=====
-    sent = False
-    send_error = ""
-    if AUDITOR_ENDPOINT:
-        try:
-            payload = json_bytes({"filename": filename, "content": text})
-            req = urllib.request.Request(
-                AUDITOR_ENDPOINT,
-                data=payload,
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=5) as resp:
-                _ = resp.read()
-            sent = True
-        except Exception as e:
-            send_error = str(e)
-
-    return jsonify({
+# 端末側で付ける clientReportId（UUIDなど）。同じIDの再送は同じレポートとして扱う
+CLIENT_REPORT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+# /api/reports/batch で1回に受け付ける件数
+REPORT_BATCH_MAX = int(os.environ.get("REPORT_BATCH_MAX", "100"))
+
+def _report_id(data):
+    # clientReportId があればそこから決める（再送されても同じファイル名になる）
+    client_id = str(data.get("clientReportId") or "")
+    if client_id:
+        return hashlib.sha256(client_id.encode("utf-8")).hexdigest()[:12]
+    return uuid.uuid4().hex[:12]
+
+def _report_result(report_id, filename, duplicate, forward_status):
+    return {
         "ok": True,
         "report_id": report_id,
         "filename": filename,
         "download_url": f"/reports/{filename}",
-        "sent_to_auditor": sent,
-        "send_error": send_error,
-    })
+        "duplicate": duplicate,
+        # 旧仕様互換のキー: 転送しない設定なら false、する設定なら転送の状態（queued / sent / failed）
+        "sent_to_auditor": forward_status or False,
+        "send_error": "",
+        "forward_status": forward_status,
+    }
+
+def _forward(filename, text):
+    # ===== 外部送信（任意：旧仕様互換）=====
+    # アウトボックスに積むだけ。送信はバックグラウンドで行い、状態は監査画面で確認できる
+    if OUTBOX is None:
+        return ""
+    OUTBOX.enqueue(filename, text)
+    return "queued"
+
+def _forward_status(filename):
+    if OUTBOX is None:
+        return ""
+    status = OUTBOX.status(filename)
+    if not status:
+        return ""
+    return "queued" if status["status"] == STATUS_PENDING else status["status"]
+
+@app.post("/api/report")
+def api_report():
+    data = request.get_json(silent=True) or {}
+    if data.get("clientReportId") and not CLIENT_REPORT_ID_RE.match(str(data["clientReportId"])):
+        return jsonify({"ok": False, "error": "invalid clientReportId"}), 400
+    report_id = _report_id(data)
+    filename = f"cleaning_report_{report_id}.txt"
+
+    # 同じ clientReportId の再送: 保存も転送もし直さない
+    if data.get("clientReportId") and REPORT_STORE.exists(filename):
+        return jsonify(_report_result(report_id, filename, True, _forward_status(filename)))
+
+    # テキスト化（CLEANING_REPORT_V1, report_codec.py）
+    text = report_codec.encode(report_codec.Report.from_payload(data, report_id))
+    if data.get("clientReportId"):
+        # 上の確認と保存の間に同じIDの再送が先に保存した場合も、書き直さず duplicate として返す
+        if not _create_reports([(filename, text)]):
+            return jsonify(_report_result(report_id, filename, True, _forward_status(filename)))
+    else:
+        _save_report(filename, text)
+    return jsonify(_report_result(report_id, filename, False, _forward(filename, text)))
+
+# 端末のキューからのまとめ送信: {"reports": [{clientReportId, roomId, ..., tasks}, ...]}
+# - clientReportId は必須。保存済みのものは duplicate: true で成功扱い（端末はキューから消してよい）
+# - 結果は results に1件ずつ（clientReportId ごと）
+@app.post("/api/reports/batch")
+def api_reports_batch():
+    data = request.get_json(silent=True) or {}
+    reports = data.get("reports")
+    if not isinstance(reports, list):
+        return jsonify({"ok": False, "error": "reports must be a list"}), 400
+    if len(reports) > REPORT_BATCH_MAX:
+        return jsonify({"ok": False, "error": f"too many reports (max {REPORT_BATCH_MAX})"}), 413
+
+    results = []
+    batch = {}
+    for item in reports:
+        client_id = str(item.get("clientReportId") or "") if isinstance(item, dict) else ""
+        if not CLIENT_REPORT_ID_RE.match(client_id):
+            results.append({"clientReportId": client_id, "ok": False, "error": "invalid clientReportId"})
+            continue
+        report_id = _report_id(item)
+        filename = f"cleaning_report_{report_id}.txt"
+        if filename in batch or REPORT_STORE.exists(filename):
+            results.append({"clientReportId": client_id,
+                            **_report_result(report_id, filename, True, _forward_status(filename))})
+            continue
+        batch[filename] = report_codec.encode(report_codec.Report.from_payload(item, report_id))
+        results.append({"clientReportId": client_id, **_report_result(report_id, filename, False, "")})
+
+    # 保存は「まだ無ければ」で行う（同じIDを同時に送ってきた別のリクエストが先に保存していれば duplicate）
+    created = set(_create_reports(list(batch.items()))) if batch else set()
+    for r in results:
+        if r["ok"] and not r["duplicate"]:
+            if r["filename"] in created:
+                r["forward_status"] = _forward(r["filename"], batch[r["filename"]])
+            else:
+                r.update(duplicate=True, forward_status=_forward_status(r["filename"]))
+            r["sent_to_auditor"] = r["forward_status"] or False
+    return jsonify({"ok": all(r["ok"] for r in results), "saved": len(created), "results": results})
+
+def _send_report(filename):
+    st = REPORT_STORE.stat(filename)
+    if st is None:
+        abort(404)
+    return precompress.send_data(request, filename, st.mtime, st.mtime_ns, st.size,
+                                 lambda: REPORT_STORE.read_bytes(filename) or b"", REPORT_VARIANTS_DIR,
+                                 cache_control=REPORT_CACHE_CONTROL, as_attachment=True, mimetype="text/plain",
+                                 content_addressed=True, max_variants_bytes=int(REPORT_VARIANTS_MAX_MB * 1024 * 1024))
 
 @app.get("/reports/<path:filename>")
 def download_report(filename):
-    return send_from_directory(REPORTS_DIR, filename, as_attachment=True)
+    return _send_report(filename)
+
+# ===== 画像判定API（サーバー側推論 + マイクロバッチ）=====
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def _classify_processes() -> int:
+    if CLASSIFY_PROCESSES != "auto":
+        return max(0, int(CLASSIFY_PROCESSES))
+    workers = max(1, int(os.environ.get("GUNICORN_WORKERS", "1") or 1))
+    n = (os.cpu_count() or 1) // workers
+    return n if n > 1 else 0
+
+def _get_classifier():
+    # モデル読込は初回リクエスト時（または gunicorn のワーカー起動時のウォームアップ）に1回だけ（numpy未導入の環境でも他の機能は動かす）
+    # モデルファイルが更新された場合は tm_engine.get_model() / InferencePool が読み直す
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                import tm_engine
+                from classify_queue import MicroBatcher
+                tm_engine.get_model()
+                processes = _classify_processes()
+                pool = None
+                if processes:
+                    from inference_pool import InferencePool
+                    pool = InferencePool(processes)
+                    predict = pool.predict_batch
+                else:
+                    predict = lambda x: tm_engine.get_model().predict_batch(x)
+                batcher = MicroBatcher(
+                    predict,
+                    max_batch=CLASSIFY_MAX_BATCH,
+                    max_wait=CLASSIFY_MAX_WAIT_MS / 1000.0,
+                    max_queue=CLASSIFY_QUEUE_SIZE,
+                    workers=max(1, processes),
+                )
+                _classifier = (tm_engine, batcher, pool)
+    engine, batcher, _pool = _classifier
+    return engine.get_model(), batcher
+
+def warm_up_classifier():
+    """モデルの読み込みと推論プロセスの起動・ダミー推論を済ませる（gunicorn.conf.py の post_worker_init から呼ぶ）。
+    import app では行わない（テスト・ベンチマーク・ツールが読み込んでもプロセスプールを起動しない）。CLASSIFY_WARMUP=0 で無効。"""
+    if not CLASSIFY_WARMUP:
+        return
+    # 失敗しても起動は止めない（/api/classify が 503 model_unavailable を返す）
+    try:
+        model, _batcher = _get_classifier()
+        pool = _classifier[2]
+        if pool is not None:
+            pool.warm_up()
+        else:
+            model.warm_up()
+    except Exception:
+        pass
+
+def _decode_image_field(value):
+    # "data:image/jpeg;base64,..." でも素のbase64でも受け付ける
+    if not isinstance(value, str):
+        return b""
+    if value.startswith("data:"):
+        value = value.split(",", 1)[1] if "," in value else ""
+    try:
+        return base64.b64decode(value, validate=False)
+    except Exception:
+        return b""
+
+def _classify_payload_images():
+    if request.files:
+        return [f.read() for f in request.files.getlist("image") or request.files.values()]
+    data = request.get_json(silent=True) or {}
+    if "images" in data:
+        return [_decode_image_field(v) for v in (data.get("images") or [])]
+    if "image" in data:
+        return [_decode_image_field(data.get("image"))]
+    return []
+
+@app.post("/api/classify")
+def api_classify():
+    images = _classify_payload_images()
+    if not images:
+        return jsonify({"ok": False, "error": "no_image"}), 400
+    if len(images) > CLASSIFY_MAX_IMAGES:
+        return jsonify({"ok": False, "error": "too_many_images", "max_images": CLASSIFY_MAX_IMAGES}), 413
+
+    try:
+        model, batcher = _get_classifier()
+    except Exception as e:
+        return jsonify({"ok": False, "error": "model_unavailable", "detail": str(e)}), 503
+
+    from classify_queue import QueueFull
+    from prediction_cache import get_cache
+
+    # 同じ画像（SHA-256 + モデルのバージョン）は推論せずキャッシュから返す
+    cache = get_cache()
+    cache_version = cache.version  # 推論を始める前のバージョン（推論中にモデルが変わったら保存しない）
+    digests = [hashlib.sha256(raw).hexdigest() for raw in images]
+
+    # デコード/前処理はリクエストスレッドで並列に行い、推論だけをまとめる
+    inputs, slots = [], []
+    results = [None] * len(images)
+    for i, raw in enumerate(images):
+        cached = cache.get(digests[i])
+        if cached is not None:
+            results[i] = cached
+            continue
+        try:
+            inputs.append(model.preprocess_bytes(raw))
+            slots.append(i)
+        except Exception:
+            results[i] = {"error": "invalid_image"}
+
+    if inputs:
+        try:
+            futures = batcher.submit(inputs)
+        except QueueFull:
+            resp = jsonify({"ok": False, "error": "busy"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = "1"
+            return resp
+        # wait: キュー待ち + まとめて推論（推論自体は inference として別に記録される）
+        with metrics.CLASSIFY_STAGE.time(stage="wait"):
+            for i, fut in zip(slots, futures):
+                try:
+                    results[i] = model.to_results(fut.result(timeout=CLASSIFY_TIMEOUT))
+                    cache.put(digests[i], results[i], cache_version)
+                except Exception as e:
+                    fut.cancel()
+                    results[i] = {"error": "timeout" if isinstance(e, FutureTimeout) else "inference_failed"}
+
+    return jsonify({"ok": True, "results": results})
 
 # ===== 監査機能（統合）=====
 
@@ -119,24 +427,118 @@ def auditor_logout():
     session.pop("auditor_ok", None)
     return redirect("/")
 
+AUDITOR_PER_PAGE = 50
+ANALYTICS_DAYS = 31  # ダッシュボードに表示する直近の日数
+
+def _float_arg(name):
+    try:
+        v = (request.args.get(name) or "").strip()
+        return float(v) if v else None
+    except ValueError:
+        return None
+
+def _int_arg(name, default):
+    try:
+        return int(request.args.get(name) or default)
+    except ValueError:
+        return default
+
+def _auditor_filters():
+    return {
+        "room": (request.args.get("room") or "").strip(),
+        "cleaner": (request.args.get("cleaner") or "").strip(),
+        "date_from": (request.args.get("date_from") or "").strip(),
+        "date_to": (request.args.get("date_to") or "").strip(),
+        "min_score": _float_arg("min_score"),
+        "max_score": _float_arg("max_score"),
+    }
+
 @app.get("/auditor")
 def auditor_index():
     gate = _require_auditor_login()
     if gate:
         return gate
 
-    reports = []
-    for fn in sorted(os.listdir(REPORTS_DIR), reverse=True):
-        if not fn.endswith(".txt"):
-            continue
-        path = os.path.join(REPORTS_DIR, fn)
-        try:
-            mtime = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            mtime = ""
-        meta = parse_meta(path)
-        reports.append({"filename": fn, "mtime": mtime, **meta})
-    return render_template("auditor_index.html", reports=reports)
+    # 外部から reports/ にファイルが置かれた場合だけ差分同期（通常は索引をそのまま使う）
+    REPORT_INDEX.ensure_fresh()
+    filters = {
+        **_auditor_filters(),
+        "sort": request.args.get("sort") or "mtime",
+        "order": "asc" if request.args.get("order") == "asc" else "desc",
+    }
+    result = REPORT_INDEX.query(
+        page=_int_arg("page", 1),
+        per_page=_int_arg("per_page", AUDITOR_PER_PAGE),
+        **filters,
+    )
+    forward = None
+    if OUTBOX is not None:
+        forward = OUTBOX.statuses([r["filename"] for r in result["reports"]])
+    return render_template(
+        "auditor_index.html",
+        reports=result["reports"],
+        forward=forward,
+        outbox=OUTBOX.stats() if OUTBOX is not None else None,
+        page=result["page"],
+        pages=result["pages"],
+        total=result["total"],
+        per_page=result["per_page"],
+        filters={k: ("" if v is None else v) for k, v in filters.items()},
+        query={k: v for k, v in filters.items() if v not in ("", None)},
+    )
+
+# ===== 一括エクスポート（ZIP: 元の.txt / CSV・NDJSON: タスク1件1行）=====
+@app.get("/auditor/export")
+def auditor_export():
+    gate = _require_auditor_login()
+    if gate:
+        return gate
+
+    fmt = (request.args.get("format") or "zip").lower()
+    if fmt not in report_export.EXPORT_FORMATS:
+        abort(400)
+    REPORT_INDEX.ensure_fresh()
+    filters = _auditor_filters()
+    body, content_type = report_export.stream(fmt, REPORT_STORE, REPORT_INDEX.iter_filenames(**filters))
+    name = "_".join(["cleaning_reports"] + [re.sub(r"[^A-Za-z0-9_.-]", "_", str(filters[k]))
+                                             for k in ("room", "cleaner", "date_from", "date_to") if filters[k]])
+    return Response(stream_with_context(body), content_type=content_type, headers={
+        "Content-Disposition": f'attachment; filename="{name}.{fmt}"',
+        "Cache-Control": "no-store",
+    })
+
+# ===== 清掃実績の集計（日別/清掃者別/部屋別/タスク別） =====
+@app.get("/auditor/api/analytics")
+def auditor_api_analytics():
+    gate = _require_auditor_login()
+    if gate:
+        return jsonify({"ok": False, "error": "login required"}), 401
+
+    REPORT_INDEX.ensure_fresh()
+    dim = (request.args.get("dim") or "").strip()
+    key = request.args.get("key")
+    try:
+        data = ANALYTICS.summary(dim or None, key)
+    except KeyError:
+        return jsonify({"ok": False, "error": f"unknown dim: {dim}"}), 400
+    return jsonify({"ok": True, "dim": dim or "all", "key": key, "data": data})
+
+@app.get("/auditor/analytics")
+def auditor_analytics():
+    gate = _require_auditor_login()
+    if gate:
+        return gate
+
+    REPORT_INDEX.ensure_fresh()
+    days = ANALYTICS.summary("day")
+    return render_template(
+        "auditor_analytics.html",
+        overall=ANALYTICS.summary(),
+        cleaners=ANALYTICS.summary("cleaner"),
+        rooms=ANALYTICS.summary("room"),
+        tasks=ANALYTICS.summary("task"),
+        days=dict(sorted(days.items(), reverse=True)[:ANALYTICS_DAYS]),
+    )
 
 @app.get("/auditor/reports/<path:filename>")
 def auditor_view_report(filename):
@@ -144,60 +546,146 @@ def auditor_view_report(filename):
     if gate:
         return gate
 
-    path = os.path.join(REPORTS_DIR, filename)
-    if not os.path.isfile(path):
+    text = REPORT_STORE.read(filename)
+    if text is None:
         abort(404)
-    with open(path, "r", encoding="utf-8", errors="replace") as f:
-        text = f.read()
-    meta = parse_meta(path)
-    return render_template("auditor_report.html", filename=filename, text=text, meta=meta)
+    meta = parse_meta(text)
+    forward = OUTBOX.status(filename) if OUTBOX is not None else None
+    return render_template("auditor_report.html", filename=filename, text=text, meta=meta,
+                           forward=forward, forward_enabled=OUTBOX is not None)
 
 @app.get("/auditor/download/<path:filename>")
 def auditor_download(filename):
     gate = _require_auditor_login()
     if gate:
         return gate
-    return send_from_directory(REPORTS_DIR, filename, as_attachment=True)
+    return _send_report(filename)
 
 # 旧：外部から受信したい場合の互換API（統合後も利用可）
+# - {"filename", "content"} の1件
+# - {"reports": [...]} のまとめ送信（アウトボックスから）
+# - 一括受信: NDJSON（gzip可）/ tar / zip を本文に直接（Content-Type か ?format= で判定）
 @app.post("/api/receive_report")
 def receive_report():
+    fmt = bulk_ingest.detect_format(request.mimetype, request.args.get("format", ""))
+    if fmt:
+        items = bulk_ingest.iter_items(
+            request.stream, fmt,
+            content_encoding=request.headers.get("Content-Encoding", ""),
+            mimetype=request.mimetype,
+        )
+        return jsonify(_receive_many(items, default_name=_bulk_filename))
+
     data = request.get_json(silent=True) or {}
-    filename = (data.get("filename") or "").strip()
-    content = data.get("content") or ""
+    if isinstance(data.get("reports"), list):
+        items = (
+            (str(item.get("filename") or ""), item.get("content") or "", "")
+            if isinstance(item, dict) else ("", None, "invalid item")
+            for item in data["reports"]
+        )
+        return jsonify(_receive_many(items, default_name=_bulk_filename))
 
-    if not filename or not filename.endswith(".txt"):
-        filename = f"cleaning_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    filename = _safe_filename(data.get("filename"), _legacy_filename)
+    _save_report(filename, data.get("content") or "")
+    # accepts_batch: 送信側（outbox.py）は、これを見てから {"reports": [...]} でまとめて送るようになる
+    return jsonify({"ok": True, "saved_as": filename, "view_url": f"/auditor/reports/{filename}",
+                    "accepts_batch": True})
+
+def _legacy_filename():
+    # 同じ秒に複数届いても重ならないよう、マイクロ秒と乱数を付ける
+    return f"cleaning_report_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:6]}.txt"
 
+def _bulk_filename():
+    # 一括受信では同じ秒に何件も来るので、時刻ではなくランダムな名前にする
+    return f"cleaning_report_{uuid.uuid4().hex[:12]}.txt"
+
+def _safe_filename(name, default_name):
+    filename = (name or "").strip()
+    if not filename or not filename.endswith(".txt"):
+        filename = default_name()
     filename = re.sub(r"[^A-Za-z0-9_.-]", "_", filename)
-    path = os.path.join(REPORTS_DIR, filename)
+    # 「.」で始まる名前（隠しファイル・書き込み中の一時ファイルと紛らわしいもの）は使わない
+    return filename if report_store.valid_filename(filename) else default_name()
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
+def _receive_many(items, default_name):
+    # RECEIVE_BATCH_SIZE 件ずつ書き込み、索引の更新はバッチごとに1回
+    results = []
+    batch = []
+    saved = failed = 0
+    for name, content, error in items:
+        if error:
+            results.append({"filename": name, "ok": False, "error": error})
+            failed += 1
+            continue
+        filename = _safe_filename(name, default_name)
+        batch.append((filename, content))
+        results.append({"filename": name, "ok": True, "saved_as": filename})
+        if len(batch) >= RECEIVE_BATCH_SIZE:
+            saved += _save_reports(batch)
+            batch = []
+    if batch:
+        saved += _save_reports(batch)
+    return {"ok": failed == 0, "saved": saved, "failed": failed, "results": results}
 
-    return jsonify({"ok": True, "saved_as": filename, "view_url": f"/auditor/reports/{filename}"})
+def _save_report(filename, text):
+    # レポートを書き込み、一覧用の索引も同時に更新する
+    REPORT_STORE.write(filename, text)
+    REPORT_INDEX.upsert(filename)
 
-def parse_meta(path):
-    meta = {"roomId":"", "cleanerId":"", "totalScore":"", "finishedAt":""}
-    try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            for _ in range(40):
-                line = f.readline()
-                if not line:
-                    break
-                line=line.strip()
-                if line.startswith("roomId:"):
-                    meta["roomId"]=line.split(":",1)[1].strip()
-                elif line.startswith("cleanerId:"):
-                    meta["cleanerId"]=line.split(":",1)[1].strip()
-                elif line.startswith("totalScore:"):
-                    meta["totalScore"]=line.split(":",1)[1].strip()
-                elif line.startswith("finishedAt:"):
-                    meta["finishedAt"]=line.split(":",1)[1].strip()
-    except Exception:
-        pass
-    return meta
+def _save_reports(batch):
+    REPORT_STORE.write_many(batch)
+    REPORT_INDEX.upsert_many([filename for filename, _ in batch])
+    return len(batch)
+
+def _create_reports(batch):
+    # 既に保存されているものは書かない。新しく保存したファイル名を返す
+    created = REPORT_STORE.create_many(batch)
+    if created:
+        REPORT_INDEX.upsert_many(created)
+    return created
+
+def parse_meta(text):
+    # 監査画面用: ヘッダー項目（report_id, roomId, cleanerId, startedAt, finishedAt, durationSeconds, totalScore）
+    return report_codec.decode(text).header()
+
+def parse_summary(text):
+    # 索引・集計用: ヘッダー項目 + タスクごとの status（{"tasks": {id: status}}）
+    return report_codec.decode(text).summary()
 
 def json_bytes(obj):
     import json
     return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+# ===== 監査一覧の索引（起動時に差分同期）=====
+REPORT_INDEX = ReportIndex(REPORT_STORE, os.path.join(DATA_DIR, "report_index.sqlite3"), parse_summary)
+ANALYTICS = Analytics(REPORT_INDEX)
+REPORT_INDEX.ensure_fresh()
+
+# ===== 監査先への転送（AUDITOR_ENDPOINT 指定時のみ）=====
+OUTBOX = None
+if AUDITOR_ENDPOINT:
+    OUTBOX = Outbox(
+        os.path.join(DATA_DIR, "outbox.sqlite3"),
+        AUDITOR_ENDPOINT,
+        batch_size=OUTBOX_BATCH_SIZE,
+        timeout=OUTBOX_TIMEOUT,
+        max_backoff=OUTBOX_MAX_BACKOFF,
+        max_rejections=OUTBOX_MAX_REJECTIONS,
+    )
+    OUTBOX.start()
+
+# ===== メトリクス（/metrics）=====
+def _cache_stat(key):
+    from prediction_cache import get_cache
+    return get_cache().stats()[key]
+
+metrics.init_app(app, token=METRICS_TOKEN)
+metrics.Gauge("reports_stored", "Reports in the report store.", REPORT_INDEX.count)
+metrics.Gauge("reports_stored_bytes", "Total size of stored report files.", REPORT_INDEX.total_bytes)
+metrics.Gauge("auditor_outbox_pending", "Reports waiting to be forwarded to AUDITOR_ENDPOINT.",
+              lambda: OUTBOX.stats()["pending"] if OUTBOX is not None else None)
+metrics.Gauge("prediction_cache_entries", "Entries in the prediction cache.", lambda: _cache_stat("size"))
+metrics.Gauge("prediction_cache_hits_total", "Prediction cache hits.", lambda: _cache_stat("hits"), kind="counter")
+metrics.Gauge("prediction_cache_misses_total", "Prediction cache misses.", lambda: _cache_stat("misses"), kind="counter")
+metrics.Gauge("classify_inference_processes", "Processes in the inference pool (0: in-process inference).",
+              lambda: (_classifier[2].processes if _classifier[2] is not None else 0) if _classifier else None)
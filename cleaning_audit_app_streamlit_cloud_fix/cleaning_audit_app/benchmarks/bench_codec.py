@@ -0,0 +1,116 @@
+"""レポート形式（report_codec.py）の解析・書き出しのベンチマーク。
+
+使い方:
+    python benchmarks/bench_codec.py                      # 10k / 100k 件
+    python benchmarks/bench_codec.py --sizes 1000 --out codec.json
+
+合成したレポート（benchmarks/synth.py）をメモリ上に用意して、件数ごとに計測する:
+- decode:         標準の形（api_report / Streamlit が書く形）の解析（reports_per_s, MB_per_s）
+- decode_crlf:    CRLF に変換したもの（元の行の並びを覚える方の解析）
+- encode:         書き出し
+- legacy_parse:   変更前の parse_summary（比較用。タスクの status だけを読む）
+- decode_many_fs: 保存先（FileReportStore）から読みながらの一括解析（読み込みを含む）
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synth  # noqa: E402
+import report_codec  # noqa: E402
+import report_store  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000)
+
+
+def legacy_parse_summary(text: str) -> Dict[str, Any]:
+    # 変更前の app.parse_summary と同じ処理
+    meta = {"roomId": "", "cleanerId": "", "totalScore": "", "finishedAt": "", "durationSeconds": "", "tasks": {}}
+    current_task = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("- id:"):
+            current_task = line.split(":", 1)[1].strip()
+            meta["tasks"][current_task] = ""
+        elif current_task is not None:
+            if line.startswith("status:"):
+                meta["tasks"][current_task] = line.split(":", 1)[1].strip()
+        elif ":" in line:
+            k, v = line.split(":", 1)
+            if k in meta and k != "tasks":
+                meta[k] = v.strip()
+    return meta
+
+
+def throughput(fn: Callable[[Any], Any], items: List[Any], nbytes: int, repeat: int) -> Dict[str, float]:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return {
+        "reports_per_s": round(len(items) / best, 1) if best else None,
+        "MB_per_s": round(nbytes / best / 1e6, 2) if best else None,
+        "per_report_us": round(best / max(1, len(items)) * 1e6, 2),
+    }
+
+
+def bench_size(size: int, repeat: int) -> Dict[str, Any]:
+    texts = [synth.report_text(p, f"{i:012x}") for i, p in enumerate(synth.payloads(size))]
+    crlf = [t.replace("\n", "\r\n") for t in texts]
+    nbytes = sum(len(t.encode("utf-8")) for t in texts)
+    reports = report_codec.decode_all(texts)
+    decoded_crlf = report_codec.decode_all(crlf)
+    assert all(report_codec.encode(r) == t for r, t in zip(reports, texts))
+    assert all(report_codec.encode(r) == t for r, t in zip(decoded_crlf, crlf))
+
+    out = {
+        "n": size,
+        "bytes": nbytes,
+        "decode": throughput(report_codec.decode, texts, nbytes, repeat),
+        "decode_crlf": throughput(report_codec.decode, crlf, nbytes + size * texts[0].count("\n"), repeat),
+        "encode": throughput(report_codec.encode, reports, nbytes, repeat),
+        "legacy_parse": throughput(legacy_parse_summary, texts, nbytes, repeat),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench_codec_") as root:
+        store = report_store.FileReportStore(root)
+        names = [f"cleaning_report_{i:08d}.txt" for i in range(size)]
+        for i in range(0, size, 5000):
+            store.write_many(list(zip(names[i:i + 5000], texts[i:i + 5000])))
+        t0 = time.perf_counter()
+        n = sum(1 for _ in report_codec.decode_many(store, names))
+        dt = time.perf_counter() - t0
+        out["decode_many_fs"] = {"reports_per_s": round(n / dt, 1) if dt else None,
+                                 "per_report_us": round(dt / max(1, n) * 1e6, 2)}
+    return out
+
+
+def run(sizes=DEFAULT_SIZES, repeat: int = 3) -> Dict[str, Any]:
+    return {str(size): bench_size(size, repeat) for size in sizes}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    ap.add_argument("--repeat", type=int, default=3, help="各項目の計測回数（最良値を使う）")
+    ap.add_argument("--out", help="結果のJSON出力先")
+    args = ap.parse_args()
+
+    result = run(args.sizes, args.repeat)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
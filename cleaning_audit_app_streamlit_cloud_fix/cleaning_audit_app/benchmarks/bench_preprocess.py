@@ -0,0 +1,100 @@
+"""classify_image の前処理ベンチマーク（旧: フルデコード+PNG化 / 新: draftデコード+サムネイル）。
+
+使い方:
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --repeat 5 --out preprocess.json
+
+カメラ解像度ごとに、1枚あたりの
+- 転送量（コンポーネントに渡す data URL のバイト数）
+- CPU時間（time.process_time）
+を比較する。入力は合成したJPEG（実写に近いノイズ + グラデーション）。
+"""
+import io
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocess  # noqa: E402
+
+RESOLUTIONS = {
+    "2MP (1600x1200)": (1600, 1200),
+    "8MP (3264x2448)": (3264, 2448),
+    "12MP (4032x3024)": (4032, 3024),
+}
+
+
+def synth_jpeg(size, quality: int = 90) -> bytes:
+    w, h = size
+    img = Image.effect_noise((w // 4, h // 4), 48).convert("RGB").resize((w, h))
+    grad = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    img = Image.blend(img, grad, 0.5).filter(ImageFilter.SMOOTH)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def legacy_data_url(image_bytes: bytes) -> str:
+    # 変更前の classify_image と同じ処理
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def lean_data_url(image_bytes: bytes) -> str:
+    return preprocess.thumbnail_data_url(preprocess.load_for_model(image_bytes))
+
+
+def measure(fn, image_bytes: bytes, repeat: int):
+    best = None
+    out = None
+    for _ in range(repeat):
+        t0 = time.process_time()
+        out = fn(image_bytes)
+        dt = time.process_time() - t0
+        best = dt if best is None else min(best, dt)
+    return len(out), best
+
+
+def run(repeat: int = 3):
+    image_size, grayscale = preprocess.model_input_spec()
+    rows = []
+    for label, size in RESOLUTIONS.items():
+        jpeg = synth_jpeg(size)
+        legacy_bytes, legacy_cpu = measure(legacy_data_url, jpeg, repeat)
+        lean_bytes, lean_cpu = measure(lean_data_url, jpeg, repeat)
+        rows.append({
+            "resolution": label,
+            "jpeg_bytes": len(jpeg),
+            "legacy_bytes": legacy_bytes,
+            "legacy_cpu_ms": round(legacy_cpu * 1000, 2),
+            "lean_bytes": lean_bytes,
+            "lean_cpu_ms": round(lean_cpu * 1000, 2),
+        })
+    return {"image_size": image_size, "grayscale": grayscale, "repeat": repeat, "rows": rows}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="結果のJSON出力先")
+    args = ap.parse_args()
+
+    result = run(args.repeat)
+    print(f"{'resolution':<18} {'jpeg':>10} {'legacy bytes':>14} {'legacy ms':>10} {'lean bytes':>11} {'lean ms':>8}")
+    for r in result["rows"]:
+        print(f"{r['resolution']:<18} {r['jpeg_bytes']:>10} {r['legacy_bytes']:>14} {r['legacy_cpu_ms']:>10} "
+              f"{r['lean_bytes']:>11} {r['lean_cpu_ms']:>8}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
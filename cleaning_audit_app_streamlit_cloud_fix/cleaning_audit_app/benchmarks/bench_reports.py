@@ -0,0 +1,182 @@
+"""レポート処理のベンチマーク（保存・受信・監査一覧・メタデータ解析）。
+
+使い方:
+    python benchmarks/bench_reports.py                       # 1k / 10k / 100k 件
+    python benchmarks/bench_reports.py --sizes 1000 10000 --out reports.json
+
+一時ディレクトリに REPORTS_DIR / DATA_DIR を向けた app を読み込み、Flask のテストクライアントで
+HTTP を通さずにハンドラーを呼ぶ（ネットワークの揺れを含めない）。計測項目:
+- api_report:       1件ずつの保存（reports_per_s, p50/p95 ms）
+- receive_report:   1件ずつの受信と gzip NDJSON の一括受信（reports_per_s）
+- auditor_index:    保存件数ごとの一覧の応答時間（先頭ページ / 絞り込み / 並べ替え / 最終ページ）と索引の作り直し時間
+- parse_meta:       1件あたりの読み込み時間（保存先から）と解析時間（parse_meta / parse_summary）
+
+--store sqlite で SQLite の保存先（REPORT_STORE=sqlite）を計測する（既定は fs）。
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import importlib
+import statistics
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synth  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+INGEST_CHUNK = 5000
+
+
+def load_app(root: str, store: str = "fs"):
+    """root 配下を保存先にした app を読み込む（読み込むたびに新しい Flask アプリになる）。"""
+    os.environ["REPORTS_DIR"] = os.path.join(root, "reports")
+    os.environ["DATA_DIR"] = os.path.join(root, "var")
+    os.environ["REPORT_STORE"] = store
+    os.environ.pop("AUDITOR_ENDPOINT", None)
+    import app
+    return importlib.reload(app)
+
+
+def latency(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def bench_api_report(app, n: int) -> Dict[str, Any]:
+    client = app.app.test_client()
+    bodies = synth.payloads(n, seed=1)
+    it = iter(bodies)
+    t0 = time.perf_counter()
+    stats = latency(lambda: client.post("/api/report", json=next(it)), n)
+    elapsed = time.perf_counter() - t0
+    return {"n": n, "reports_per_s": round(n / elapsed, 1), **stats}
+
+
+def bench_receive_report(app, n: int, bulk_n: int) -> Dict[str, Any]:
+    client = app.app.test_client()
+    items = list(synth.report_items(n, seed=2, start=9_000_000))
+    it = iter(items)
+    t0 = time.perf_counter()
+    stats = latency(lambda: client.post("/api/receive_report", json=next(it)), n)
+    single = {"n": n, "reports_per_s": round(n / (time.perf_counter() - t0), 1), **stats}
+
+    body = synth.ndjson_gz(synth.report_items(bulk_n, seed=3, start=8_000_000))
+    t0 = time.perf_counter()
+    r = client.post("/api/receive_report", data=body,
+                    headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+    elapsed = time.perf_counter() - t0
+    saved = (r.get_json() or {}).get("saved", 0)
+    bulk = {"n": bulk_n, "saved": saved, "body_bytes": len(body),
+            "reports_per_s": round(saved / elapsed, 1), "total_ms": round(elapsed * 1000, 1)}
+    return {"single": single, "bulk_ndjson_gzip": bulk}
+
+
+def fill_store(app, client, have: int, want: int):
+    # 一括受信（公開API）で want 件まで増やす
+    while have < want:
+        n = min(INGEST_CHUNK, want - have)
+        body = synth.ndjson_gz(synth.report_items(n, seed=0, start=have))
+        client.post("/api/receive_report", data=body,
+                    headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+        have += n
+    return have
+
+
+def bench_auditor_index(app, sizes: List[int], repeat: int) -> Dict[str, Any]:
+    from report_index import ReportIndex
+
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess["auditor_ok"] = True
+    rng = random.Random(5)
+    have = 0
+    out = {}
+    for size in sorted(sizes):
+        t0 = time.perf_counter()
+        have = fill_store(app, client, have, size)
+        fill_s = time.perf_counter() - t0
+
+        # 索引を一から作り直す時間（初回起動・スキーマ変更時）
+        t0 = time.perf_counter()
+        ReportIndex(app.REPORT_STORE, os.path.join(app.DATA_DIR, f"rebuild_{size}.sqlite3"), app.parse_summary).sync()
+        rebuild_ms = (time.perf_counter() - t0) * 1000
+
+        count = app.REPORT_INDEX.count()
+        last_page = max(1, -(-count // app.AUDITOR_PER_PAGE))
+        out[str(size)] = {
+            "stored": count,
+            "fill_reports_per_s": round(size / fill_s, 1) if fill_s else None,
+            "index_rebuild_ms": round(rebuild_ms, 1),
+            "first_page": latency(lambda: client.get("/auditor"), repeat),
+            "filter_room": latency(lambda: client.get(f"/auditor?room={rng.choice(synth.ROOMS)}"), repeat),
+            "filter_cleaner_dates": latency(lambda: client.get(
+                f"/auditor?cleaner={rng.choice(synth.CLEANERS)}&date_from=2026-01-10&date_to=2026-02-10"), repeat),
+            "sort_score": latency(lambda: client.get("/auditor?sort=totalScore&order=asc"), repeat),
+            "last_page": latency(lambda: client.get(f"/auditor?page={last_page}"), repeat),
+            "analytics": latency(lambda: client.get("/auditor/api/analytics?dim=cleaner"), repeat),
+        }
+    return out
+
+
+def bench_parse_meta(app, sample: int) -> Dict[str, Any]:
+    names = sorted(fn for fn, _st in app.REPORT_STORE.scan())[:sample]
+    t0 = time.perf_counter()
+    texts = [app.REPORT_STORE.read(n) for n in names]
+    out = {"n": len(texts), "store_read_us": round((time.perf_counter() - t0) / max(1, len(texts)) * 1e6, 2)}
+    for name in ("parse_meta", "parse_summary"):
+        fn = getattr(app, name)
+        t0 = time.perf_counter()
+        for text in texts:
+            fn(text)
+        out[f"{name}_us"] = round((time.perf_counter() - t0) / max(1, len(texts)) * 1e6, 2)
+    return out
+
+
+def run(sizes=DEFAULT_SIZES, writes: int = 500, bulk: int = 5000, repeat: int = 30,
+        store: str = "fs") -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="bench_reports_") as root:
+        app = load_app(os.path.join(root, "writes"), store)
+        results = {
+            "api_report": bench_api_report(app, writes),
+            "receive_report": bench_receive_report(app, writes, bulk),
+        }
+        app = load_app(os.path.join(root, "index"), store)
+        results["auditor_index"] = bench_auditor_index(app, list(sizes), repeat)
+        results["parse_meta"] = bench_parse_meta(app, 2000)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    ap.add_argument("--writes", type=int, default=500, help="api_report / receive_report の件数")
+    ap.add_argument("--bulk", type=int, default=5000, help="一括受信の件数")
+    ap.add_argument("--repeat", type=int, default=30, help="一覧の応答時間の計測回数")
+    ap.add_argument("--store", choices=("fs", "sqlite"), default="fs", help="レポートの保存先（REPORT_STORE）")
+    ap.add_argument("--out", help="結果のJSON出力先")
+    args = ap.parse_args()
+
+    result = run(args.sizes, args.writes, args.bulk, args.repeat, args.store)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
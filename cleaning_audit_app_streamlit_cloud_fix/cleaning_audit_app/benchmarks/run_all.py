@@ -0,0 +1,115 @@
+"""ベンチマークをまとめて実行し、JSON に保存する（前回の結果との比較つき）。
+
+使い方:
+    python benchmarks/run_all.py                                  # benchmarks/results/<日時>.json に保存
+    python benchmarks/run_all.py --quick                          # 1k 件だけ・回数少なめ
+    python benchmarks/run_all.py --compare benchmarks/results/前回.json
+
+比較では、名前が *_ms / *_us で終わる値は小さいほど良い、*_per_s は大きいほど良いとして、
+--threshold（既定 10%）以上悪化した項目を REGRESSION と表示する（終了コード 1）。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from typing import Any, Dict, Iterator, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench_codec  # noqa: E402
+import bench_preprocess  # noqa: E402
+import bench_reports  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    if quick:
+        reports = bench_reports.run(sizes=(1000,), writes=100, bulk=1000, repeat=10)
+        preprocess = bench_preprocess.run(repeat=1)
+        codec = bench_codec.run(sizes=(1000,), repeat=1)
+    else:
+        reports = bench_reports.run()
+        preprocess = bench_preprocess.run(repeat=3)
+        codec = bench_codec.run()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": {**reports, "preprocess": preprocess, "codec": codec},
+    }
+
+
+def _flatten(obj: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else str(k))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = v.get("resolution", i) if isinstance(v, dict) else i
+            yield from _flatten(v, f"{prefix}[{key}]")
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    before = dict(_flatten(old.get("results", {})))
+    regressions = 0
+    for key, value in _flatten(new.get("results", {})):
+        if key not in before:
+            continue
+        if key.endswith(("_ms", "_us")):
+            worse = value > before[key] * (1 + threshold)
+        elif key.endswith("_per_s"):
+            worse = value < before[key] * (1 - threshold)
+        else:
+            continue
+        delta = (value - before[key]) / before[key] * 100 if before[key] else 0.0
+        mark = "REGRESSION" if worse else ""
+        regressions += bool(worse)
+        print(f"{key:<60} {before[key]:>12.3f} -> {value:>12.3f} ({delta:+6.1f}%) {mark}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--out", help="結果のJSON出力先（既定: benchmarks/results/<日時>.json）")
+    ap.add_argument("--compare", help="比較する前回の結果JSON")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    args = ap.parse_args()
+
+    result = run(args.quick)
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"saved: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        if compare(old, result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""ベンチマーク用の合成データ（CLEANING_REPORT_V1 のレポートと写真）。
+
+- report_payload(): /api/report に送る JSON（static/app.js と同じ形）
+- report_text(): api_report が保存するテキスト（report_codec.encode）
+- ndjson_gz(): /api/receive_report の一括受信用（gzip NDJSON）
+- 写真は bench_preprocess.synth_jpeg（ノイズ + グラデーションのJPEG）を使う
+
+乱数のシードを固定しているので、同じ引数なら毎回同じデータになる。
+"""
+import os
+import sys
+import json
+import gzip
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+from bench_preprocess import RESOLUTIONS, synth_jpeg  # noqa: F401  (写真の生成はここから使う)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import report_codec  # noqa: E402
+
+# streamlit_app.TASKS / static/app.js と同じタスクと配点
+TASK_WEIGHTS = {"trash": 10, "bed": 30, "bath": 20, "sink": 15, "floor": 15, "amen": 10}
+ROOMS = [f"{floor}{room:02d}" for floor in range(2, 10) for room in range(1, 21)]
+CLEANERS = [f"staff{i:02d}" for i in range(1, 31)]
+NOTES = ["", "", "", "シーツ交換済み", "排水溝に髪の毛あり", "アメニティ補充", "照明1灯切れ（フロント連絡済み）"]
+BASE_TIME = datetime(2026, 1, 1, 9, 0, tzinfo=timezone(timedelta(hours=9)))
+
+
+def report_payload(rng: random.Random, i: int) -> Dict[str, Any]:
+    started = BASE_TIME + timedelta(days=i // 400, minutes=rng.randint(0, 8 * 60))
+    duration = int(rng.lognormvariate(7.2, 0.35))  # 中央値 約22分
+    tasks = {}
+    total = 0
+    for tid, weight in TASK_WEIGHTS.items():
+        status = rng.choices(["done", "fix", "todo"], weights=[85, 10, 5])[0]
+        score = weight if status == "done" else 0
+        total += score
+        tasks[tid] = {
+            "status": status,
+            "score": score,
+            "checkedAt": (started + timedelta(seconds=rng.randint(60, max(61, duration)))).isoformat(),
+            "notes": rng.choice(NOTES),
+        }
+    return {
+        "roomId": rng.choice(ROOMS),
+        "cleanerId": rng.choice(CLEANERS),
+        "startedAt": started.isoformat(),
+        "finishedAt": (started + timedelta(seconds=duration)).isoformat(),
+        "durationSeconds": duration,
+        "totalScore": total,
+        "tasks": tasks,
+    }
+
+
+def report_text(payload: Dict[str, Any], report_id: str) -> str:
+    return report_codec.encode(report_codec.Report.from_payload(payload, report_id))
+
+
+def payloads(n: int, seed: int = 0, start: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed * 1_000_003 + start)
+    return [report_payload(rng, start + i) for i in range(n)]
+
+
+def report_items(n: int, seed: int = 0, start: int = 0) -> Iterator[Dict[str, str]]:
+    """{"filename", "content"} を n 件（ファイル名は start からの通し番号で一意）。"""
+    rng = random.Random(seed * 1_000_003 + start)
+    for i in range(start, start + n):
+        report_id = uuid.UUID(int=rng.getrandbits(128)).hex[:12]
+        yield {
+            "filename": f"cleaning_report_bench{i:07d}.txt",
+            "content": report_text(report_payload(rng, i), report_id),
+        }
+
+
+def ndjson_gz(items) -> bytes:
+    lines = (json.dumps(item, ensure_ascii=False) for item in items)
+    return gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), compresslevel=1)
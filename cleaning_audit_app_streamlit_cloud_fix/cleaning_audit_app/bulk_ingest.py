@@ -0,0 +1,109 @@
+import json
+import gzip
+import zlib
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import posixpath
+from typing import IO, Iterator, Optional, Tuple
+
+# =============================
+# /api/receive_report の一括受信（過去分の移行・他拠点からの同期用）
+# - NDJSON（1行1件 {"filename", "content"}、gzip可）/ tar（.tar, .tar.gz）/ zip に対応
+# - NDJSON と tar はリクエスト本文をストリームのまま読む（全体をメモリに載せない）
+# - zip は末尾の目次が必要なので、一時ファイル（小さければメモリ）に書き出してから読む
+# - 1件ごとに (filename, content, error) を返す。error があれば content は None
+# =============================
+
+BULK_FORMATS = ("ndjson", "tar", "zip")
+ZIP_SPOOL_BYTES = 8 * 1024 * 1024
+READ_CHUNK = 64 * 1024
+
+_MIMETYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/gzip": "ndjson",
+    "application/x-tar": "tar",
+    "application/x-gtar": "tar",
+    "application/zip": "zip",
+    "application/x-zip-compressed": "zip",
+}
+
+Item = Tuple[str, Optional[str], str]
+
+
+def detect_format(mimetype: str, fmt: str = "") -> Optional[str]:
+    """?format= の指定があればそれを、なければ Content-Type から判定する（一括形式でなければ None）。"""
+    fmt = (fmt or "").strip().lower()
+    if fmt in BULK_FORMATS:
+        return fmt
+    return _MIMETYPES.get((mimetype or "").lower())
+
+
+def _gunzip_stream(stream: IO[bytes]) -> IO[bytes]:
+    return gzip.GzipFile(fileobj=stream, mode="rb")
+
+
+def iter_ndjson(stream: IO[bytes], gzipped: bool = False) -> Iterator[Item]:
+    src = _gunzip_stream(stream) if gzipped else stream
+    lineno = 0
+    for raw in iter(src.readline, b""):
+        lineno += 1
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError) as e:
+            yield (f"line {lineno}", None, f"invalid json: {e}")
+            continue
+        if not isinstance(obj, dict) or not isinstance(obj.get("content"), str):
+            yield (f"line {lineno}", None, "expected {\"filename\", \"content\"}")
+            continue
+        yield (str(obj.get("filename") or ""), obj["content"], "")
+
+
+def _member_text(name: str, fileobj: Optional[IO[bytes]]) -> Item:
+    if fileobj is None:
+        return (name, None, "unreadable member")
+    return (posixpath.basename(name), fileobj.read().decode("utf-8", errors="replace"), "")
+
+
+def iter_tar(stream: IO[bytes]) -> Iterator[Item]:
+    # "r|*" はシーク不要のストリームモード（gzip/bz2/xz も自動判定）
+    with tarfile.open(fileobj=stream, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith(".txt"):
+                continue
+            yield _member_text(member.name, tar.extractfile(member))
+
+
+def iter_zip(stream: IO[bytes]) -> Iterator[Item]:
+    with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES) as spool:
+        shutil.copyfileobj(stream, spool, READ_CHUNK)
+        spool.seek(0)
+        with zipfile.ZipFile(spool) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.endswith(".txt"):
+                    continue
+                with zf.open(info) as f:
+                    yield _member_text(info.filename, f)
+
+
+def iter_items(stream: IO[bytes], fmt: str, content_encoding: str = "", mimetype: str = "") -> Iterator[Item]:
+    gzipped = (content_encoding or "").lower() == "gzip" or (mimetype or "").lower() == "application/gzip"
+    try:
+        if fmt == "ndjson":
+            yield from iter_ndjson(stream, gzipped)
+        elif fmt == "tar":
+            # tar は r|* が圧縮を判定するので Content-Encoding: gzip でもそのまま渡す
+            yield from iter_tar(stream)
+        elif fmt == "zip":
+            yield from iter_zip(_gunzip_stream(stream) if gzipped else stream)
+        else:
+            raise ValueError(f"unknown format: {fmt}")
+    except (OSError, EOFError, zlib.error, tarfile.TarError, zipfile.BadZipFile) as e:
+        # 壊れたアーカイブ/途中で切れた本文: それまでの分は保存済みとして、最後にエラーを1件返す
+        yield ("", None, f"stream error: {e}")
@@ -0,0 +1,105 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+# =============================
+# 推論リクエストのマイクロバッチ化
+# - gunicornの各スレッドから来た画像を1つの共有キューに積む
+# - ワーカースレッドが「最大 max_batch 枚」または「最大 max_wait 秒待つ」まで集めて1回で推論
+#   （workers > 1 なら複数のバッチを同時に推論する。推論をプロセスプールで行う場合用）
+# - キューが満杯なら QueueFull（呼び出し側で 503 + Retry-After を返す）
+# =============================
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    def __init__(self, predict_batch: Callable[[np.ndarray], np.ndarray],
+                 max_batch: int = 16, max_wait: float = 0.01, max_queue: int = 64, workers: int = 1):
+        self.predict_batch = predict_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.max_queue = max(1, int(max_queue))
+
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._collecting = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"classify-batcher-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def submit(self, inputs: List[np.ndarray]) -> List[Future]:
+        """前処理済みの入力（1枚ずつ）をキューに積む。全件入らない場合は1件も積まない。"""
+        futures = [Future() for _ in inputs]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            if len(self._items) + len(inputs) > self.max_queue:
+                raise QueueFull()
+            for x, fut in zip(inputs, futures):
+                self._items.append((x, fut))
+            self._cond.notify_all()
+        return futures
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                # 相乗りを待つのは同時に1スレッドだけ（複数で取り合うとバッチが小さく割れる）
+                while (not self._items or self._collecting) and not self._closed:
+                    self._cond.wait()
+                if not self._items:
+                    return []
+                # 最初の1件が来てから max_wait 秒だけ相乗りを待つ
+                self._collecting = True
+                try:
+                    deadline = time.monotonic() + self.max_wait
+                    while len(self._items) < self.max_batch and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                finally:
+                    self._collecting = False
+                    self._cond.notify_all()
+                n = min(self.max_batch, len(self._items))
+                if n:
+                    return [self._items.popleft() for _ in range(n)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            # キャンセル済み（クライアント側タイムアウト）は推論しない
+            batch = [(x, fut) for x, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                probs = self.predict_batch(np.stack([x for x, _ in batch]))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), p in zip(batch, probs):
+                fut.set_result(p)
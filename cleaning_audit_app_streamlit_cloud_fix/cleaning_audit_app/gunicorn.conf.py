@@ -0,0 +1,29 @@
+import os
+
+# =============================
+# gunicorn の設定（Dockerfile の CMD から読み込まれる）
+# - 画像判定の推論は inference_pool.py のプロセスプールで行うので、ワーカーは1つ + スレッドで十分
+# - ワーカーを増やす場合は GUNICORN_WORKERS を指定する（推論プロセス数の auto はこの値で割る）
+#   どのワーカー・推論プロセスも同じ重みファイル（build/model_shared/）を mmap するので、重みは増えない
+# =============================
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 0
+
+
+def on_starting(server):
+    # ワーカーより先にマスターで重みを畳み込んで共有ファイルを作っておく（各ワーカーは mmap するだけ）
+    # NumPy はマスターには読み込まない（fork 前に BLAS のスレッドを作らない）ので別プロセスで行う
+    import subprocess
+    import sys
+    subprocess.run([sys.executable, "-c", "import tm_engine; tm_engine.TMModel()"],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=False)
+
+
+def post_worker_init(worker):
+    # 各ワーカーがリクエストを受け付ける前に、モデルの読み込みと推論プロセスの起動を済ませる（CLASSIFY_WARMUP=0 で無効）
+    # import app の時点では行わないので、ここで呼ぶ（flask run では最初の /api/classify で読み込む）
+    import app
+    app.warm_up_classifier()
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import numpy as np
+
+import metrics
+from model_assets import model_signature
+
+# =============================
+# 推論のプロセスプール（GILに縛られずにCPUコアの数だけ並列に推論する）
+# - 各プロセスは tm_engine の共有ファイル（畳み込み済みの重み）を mmap するだけなので、
+#   プロセスを増やしても重みのメモリは増えない（OSのページキャッシュ上の1つを全プロセスで共有）
+# - 各プロセスは起動時にダミー入力で1回推論してから受け付ける（ウォームアップ）
+# - spawn で起動する（gunicornのスレッドを持つプロセスを fork しない）
+# - model.json / weights.bin が更新されたら、プールごと作り直して新しいモデルを読ませる
+# =============================
+
+POOL_RELOAD_CHECK_INTERVAL = 2.0
+# 各プロセス内の BLAS のスレッド数（プロセス数 × コア数のスレッドで取り合わないように）
+_BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_worker_model = None
+
+
+def _init_worker(model_dir: Optional[str]):
+    global _worker_model
+    import tm_engine
+    _worker_model = tm_engine.TMModel(model_dir)
+    _worker_model.warm_up()
+
+
+def _forward(x: np.ndarray) -> np.ndarray:
+    return _worker_model.forward(x)
+
+
+def _ready(delay: float) -> int:
+    # 少し待たせて、先に起動したプロセスだけが全部を受け取らないようにする
+    time.sleep(delay)
+    return os.getpid()
+
+
+def default_processes() -> int:
+    return os.cpu_count() or 1
+
+
+class InferencePool:
+    def __init__(self, processes: int, model_dir: Optional[str] = None):
+        self.processes = max(1, int(processes))
+        self.model_dir = model_dir
+        self._lock = threading.Lock()
+        self._signature = model_signature(model_dir)
+        self._checked_at = time.monotonic()
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        # 子プロセスは起動時の環境変数を引き継ぐ（このプロセスのNumPyは初期化済みなので影響しない）
+        for name in _BLAS_THREAD_VARS:
+            os.environ.setdefault(name, "1")
+        return ProcessPoolExecutor(max_workers=self.processes,
+                                   mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(self.model_dir,))
+
+    def _restart(self, broken: Optional[ProcessPoolExecutor] = None):
+        with self._lock:
+            if broken is not None and self._executor is not broken:
+                return  # 別のスレッドが作り直し済み
+            old, self._executor = self._executor, self._start()
+        # 推論中のものは古いプロセスで最後まで処理させる
+        old.shutdown(wait=False)
+
+    def _check_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < POOL_RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        signature = model_signature(self.model_dir)
+        if signature != self._signature:
+            self._signature = signature
+            self._restart()
+
+    def warm_up(self, timeout: float = 60.0) -> int:
+        """全プロセスを起動し、重みの読み込みとダミー推論を済ませる。準備できたプロセス数を返す。"""
+        # 同時に投げれば空きプロセスが無いので processes 個まで起動される。
+        # 各プロセスは初期化（=ウォームアップ）が終わってから受け取るので、全プロセスの応答が揃うまで繰り返す
+        deadline = time.monotonic() + timeout
+        pids = set()
+        while len(pids) < self.processes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            futures = [self._executor.submit(_ready, 0.05) for _ in range(self.processes)]
+            pids.update(fut.result(timeout=remaining) for fut in futures)
+        return len(pids)
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        """TMModel.predict_batch と同じ（inference の時間にはプロセス間の受け渡しも含まれる）。"""
+        self._check_reload()
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 3:
+            x = x[None]
+        metrics.CLASSIFY_BATCH_SIZE.observe(len(x))
+        with metrics.CLASSIFY_STAGE.time(stage="inference"):
+            executor = self._executor
+            try:
+                return executor.submit(_forward, x).result()
+            except BrokenProcessPool:
+                # プロセスが落ちた（メモリ不足など）: 作り直して1回だけやり直す
+                self._restart(executor)
+            except RuntimeError:
+                # モデル更新でプールが入れ替わった直後（古い方は受け付け終了）
+                if executor is self._executor:
+                    raise
+            return self._executor.submit(_forward, x).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
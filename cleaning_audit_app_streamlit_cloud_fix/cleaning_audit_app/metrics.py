@@ -0,0 +1,258 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# =============================
+# Prometheus テキスト形式のメトリクス（外部ライブラリなし・プロセス内で集計）
+# - Counter / Histogram / Gauge（値は取得時に関数で求める）
+# - Flask: init_app() でルートごとのリクエスト数と処理時間を記録し、/metrics で出力
+# - trace(): 同じスレッドで記録された処理時間を区間ごとに集める（Streamlit の再実行ごとの内訳表示用）
+# ※ 値はプロセス（gunicorn のワーカー）ごと。GUNICORN_WORKERS を増やすと /metrics はそのリクエストを受けた
+#   ワーカーの値だけを返すので、全系列に pid ラベルを付ける（合計は sum without (pid) で求める）
+# =============================
+
+# 秒単位のバケット（HTTPの応答時間・推論時間の両方に使う）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+_local = threading.local()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    # fork 後のワーカーで値が変わるので、出力のたびに求める
+    parts.append(f'pid="{os.getpid()}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            # 同じ名前で登録し直した場合（モジュールの再読み込みなど）は新しい方に置き換える
+            _registry[:] = [m for m in _registry if m.name != name]
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # key -> [各バケット..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+                    break
+            v[-2] += value
+            v[-1] += 1
+        tr = getattr(_local, "trace", None)
+        if tr is not None and self.name.endswith("_seconds"):
+            tr.add(self.name, labels, value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """count / sum / mean と、バケットから求めた p50 / p95（上限値で近似）。"""
+        with self._lock:
+            v = list(self._values.get(self._key(labels)) or [0.0] * (len(self.buckets) + 2))
+        count, total = v[-1], v[-2]
+        out = {"count": count, "sum": total, "mean": (total / count) if count else 0.0}
+        for q in (0.5, 0.95):
+            seen, target, value = 0.0, count * q, float("inf")
+            for i, b in enumerate(self.buckets):
+                seen += v[i]
+                if count and seen >= target:
+                    value = b
+                    break
+            out[f"p{int(q * 100)}"] = value if count else 0.0
+        return out
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, v in items:
+            cumulative = 0.0
+            for i, b in enumerate(self.buckets):
+                cumulative += v[i]
+                le = _labels(self.labelnames, key, 'le="%s"' % _fmt(b))
+                lines.append(f"{self.name}_bucket{le} {_fmt(cumulative)}")
+            le = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {_fmt(v[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(v[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_fmt(v[-1])}")
+        return lines
+
+
+class Gauge(_Metric):
+    """値は出力時に fn() で求める（保存件数・送信待ち件数など）。fn が失敗したら出力しない。"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Optional[float]], kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return self.header() + [f"{self.name}{_labels((), ())} {_fmt(value)}"]
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: List[str] = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== 処理時間の内訳（同じスレッドで記録されたものを集める）=====
+class Trace:
+    def __init__(self, parent: Optional["Trace"] = None):
+        self.parent = parent
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, labels: Dict[str, Any], value: float):
+        label = labels.get("stage") or labels.get("route") or ""
+        self.stages.append((f"{name}:{label}" if label else name, value))
+        # 入れ子の trace では外側にも記録する（再実行全体の内訳にタスク分も含める）
+        if self.parent is not None:
+            self.parent.add(name, labels, value)
+
+    def totals_ms(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for name, value in self.stages:
+            out[name] = out.get(name, 0.0) + value * 1000
+        return {k: round(v, 2) for k, v in out.items()}
+
+
+def begin_trace(root: bool = False) -> Trace:
+    """root=True: 外側の trace を引き継がない（途中で中断された前回の trace が残っていても無視する）。"""
+    tr = Trace(None if root else getattr(_local, "trace", None))
+    _local.trace = tr
+    return tr
+
+
+def end_trace(tr: Trace):
+    _local.trace = tr.parent
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    tr = begin_trace()
+    try:
+        yield tr
+    finally:
+        end_trace(tr)
+
+
+# ===== アプリ共通のメトリクス =====
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.",
+                        ("route", "method", "status"))
+HTTP_DURATION = Histogram("http_request_duration_seconds",
+                          "Time spent in the Flask handler (streamed bodies excluded).", ("route", "method"))
+CLASSIFY_STAGE = Histogram("classify_stage_seconds",
+                           "Image classification time by stage (decode, preprocess, inference, wait).", ("stage",))
+CLASSIFY_BATCH_SIZE = Histogram("classify_batch_size", "Images per inference batch.",
+                                buckets=(1, 2, 4, 8, 16, 32, 64))
+FORWARD_REPORTS = Counter("auditor_forward_reports_total", "Reports forwarded to AUDITOR_ENDPOINT by result.",
+                          ("result",))
+FORWARD_DURATION = Histogram("auditor_forward_request_seconds", "Latency of POSTs to AUDITOR_ENDPOINT by result.",
+                             ("result",))
+STREAMLIT_STAGE = Histogram("streamlit_stage_seconds", "Streamlit rerun time by stage.", ("stage",))
+
+
+def init_app(app, endpoint: str = "/metrics", token: str = ""):
+    """Flask アプリにリクエスト計測と /metrics を追加する（token 指定時は Bearer 認証）。"""
+    from flask import Response, abort, g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(resp):
+        t0 = getattr(g, "_metrics_t0", None)
+        if t0 is not None:
+            # ルートはURLのテンプレート（/auditor/reports/<path:filename>）でまとめる
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            HTTP_DURATION.observe(time.perf_counter() - t0, route=route, method=request.method)
+            HTTP_REQUESTS.inc(route=route, method=request.method, status=resp.status_code)
+        return resp
+
+    @app.get(endpoint)
+    def metrics_endpoint():
+        if token and request.headers.get("Authorization", "") != f"Bearer {token}":
+            abort(401)
+        return Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+# =============================
+# モデルファイルの配信用ビルド（内容ハッシュ付きファイル名）
+# - model.json / weights.bin / metadata.json を model.<hash>.json のような名前で書き出す
+# - model.json 内の weightsManifest.paths もハッシュ付きの名前に書き換える
+# - 名前が内容で決まるので、配信側は immutable で長期キャッシュできる
+# =============================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "static", "model")
+
+# 量子化モデル（tools/quantize_model.py で static/model/<variant>/ に生成）を使う場合は
+# TM_MODEL_VARIANT=float16 / int8 を指定する。既定は元の float32。
+MODEL_VARIANT = os.environ.get("TM_MODEL_VARIANT", "float32").strip() or "float32"
+
+MANIFEST_NAME = "asset-manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_HASHED_RE = re.compile(r"^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+_build_lock = threading.Lock()
+
+
+def model_dir_for(variant: str) -> str:
+    if variant in ("", "float32"):
+        return MODEL_DIR
+    return os.path.join(MODEL_DIR, variant)
+
+
+def source_dir(variant: Optional[str] = None) -> str:
+    # 指定された量子化モデルが未生成なら float32 を配信する
+    d = model_dir_for(variant or MODEL_VARIANT)
+    if not os.path.isfile(os.path.join(d, "model.json")):
+        return MODEL_DIR
+    return d
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(filename: str, digest: str) -> str:
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{digest}{ext}"
+
+
+def _write_if_missing(path: str, data: bytes):
+    if os.path.isfile(path):
+        return
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(out_dir: str, src_dir: Optional[str] = None) -> Dict[str, Any]:
+    """src_dir のモデルをハッシュ付きファイル名で out_dir に書き出し、マニフェストを返す。"""
+    src_dir = src_dir or source_dir()
+    with _build_lock:
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(src_dir, "model.json"), "rb") as f:
+            model_json = json.loads(f.read().decode("utf-8"))
+        with open(os.path.join(src_dir, "metadata.json"), "rb") as f:
+            metadata_bytes = f.read()
+
+        files: Dict[str, bytes] = {}
+        for group in model_json.get("weightsManifest") or []:
+            new_paths = []
+            for p in group.get("paths") or []:
+                with open(os.path.join(src_dir, p), "rb") as f:
+                    data = f.read()
+                name = hashed_name(os.path.basename(p), content_hash(data))
+                files[name] = data
+                new_paths.append(name)
+            group["paths"] = new_paths
+
+        model_bytes = json.dumps(model_json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        model_name = hashed_name("model.json", content_hash(model_bytes))
+        metadata_name = hashed_name("metadata.json", content_hash(metadata_bytes))
+        files[model_name] = model_bytes
+        files[metadata_name] = metadata_bytes
+
+        for name, data in files.items():
+            _write_if_missing(os.path.join(out_dir, name), data)
+
+        # 古いハッシュのファイルは削除（現在のビルドに含まれないもの）
+        for fn in os.listdir(out_dir):
+            if _HASHED_RE.match(fn) and fn not in files:
+                try:
+                    os.remove(os.path.join(out_dir, fn))
+                except OSError:
+                    pass
+
+        manifest = {
+            "version": content_hash(model_bytes + metadata_bytes),
+            "model": model_name,
+            "metadata": metadata_name,
+            "weights": [n for n in files if n not in (model_name, metadata_name)],
+        }
+        with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def model_signature(model_dir: Optional[str] = None) -> str:
+    """model.json / weights*.bin / metadata.json の (mtime, size) から作る軽量なバージョン文字列。
+    ファイルの中身は読まないので、キャッシュの無効化チェックとして頻繁に呼んでよい。"""
+    model_dir = model_dir or source_dir()
+    parts = []
+    for fn in sorted(os.listdir(model_dir)):
+        if fn in ("model.json", "metadata.json") or fn.endswith(".bin"):
+            try:
+                st = os.stat(os.path.join(model_dir, fn))
+            except OSError:
+                continue
+            parts.append(f"{fn}:{st.st_mtime_ns}:{st.st_size}")
+    return content_hash("|".join(parts).encode("utf-8"))
@@ -0,0 +1,102 @@
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# =============================
+# 連写・短い動画の判定（フレームを順に判定し、結果が安定したら打ち切る）
+# - 1枚目から順に推論し、最上位クラスが stable_frames 枚続けて threshold 以上になったら残りは判定しない
+#   （ブレた1枚だけで bad になるのを防ぎつつ、はっきり写っていれば数枚で終わる）
+# - 結果は判定したフレームの確率の平均（[{className, probability}] 降順）と、実際に判定した枚数
+# - サーバー側推論（tm_engine）でもブラウザのコンポーネント（index.html の Burst）でも同じ規則
+# =============================
+
+BURST_THRESHOLD = float(os.environ.get("BURST_THRESHOLD", "0.8"))
+BURST_STABLE_FRAMES = int(os.environ.get("BURST_STABLE_FRAMES", "3"))
+BURST_MAX_FRAMES = int(os.environ.get("BURST_MAX_FRAMES", "16"))
+# 動画から取り出すフレームの間隔（1秒あたりの枚数）
+BURST_SAMPLE_FPS = float(os.environ.get("BURST_SAMPLE_FPS", "5"))
+
+
+def burst_settings() -> Dict[str, Any]:
+    """コンポーネントに渡す設定（Python側と同じ値を使わせる）。"""
+    return {"threshold": BURST_THRESHOLD, "stable_frames": BURST_STABLE_FRAMES, "max_frames": BURST_MAX_FRAMES}
+
+
+class StabilityVote:
+    """フレームごとの確率を受け取り、最上位クラスが安定したかを判定する。"""
+
+    def __init__(self, labels: Sequence[str], threshold: float = BURST_THRESHOLD,
+                 stable_frames: int = BURST_STABLE_FRAMES):
+        self.labels = list(labels)
+        self.threshold = float(threshold)
+        self.stable_frames = max(1, int(stable_frames))
+        self.frames = 0
+        self._sums: List[float] = []
+        self._streak_class: Optional[int] = None
+        self._streak = 0
+
+    def add(self, probs: Sequence[float]) -> bool:
+        """1フレーム分の確率を加える。打ち切ってよければ True。"""
+        probs = [float(p) for p in probs]
+        if not self._sums:
+            self._sums = [0.0] * len(probs)
+        for i, p in enumerate(probs):
+            self._sums[i] += p
+        self.frames += 1
+        top = max(range(len(probs)), key=probs.__getitem__) if probs else None
+        if top is not None and probs[top] >= self.threshold:
+            self._streak = self._streak + 1 if top == self._streak_class else 1
+            self._streak_class = top
+        else:
+            self._streak = 0
+            self._streak_class = None
+        return self.stable
+
+    @property
+    def stable(self) -> bool:
+        return self._streak >= self.stable_frames
+
+    def predictions(self) -> List[Dict[str, Any]]:
+        n = max(1, self.frames)
+        results = [
+            {"className": self.labels[i] if i < len(self.labels) else str(i), "probability": s / n}
+            for i, s in enumerate(self._sums)
+        ]
+        results.sort(key=lambda r: r["probability"], reverse=True)
+        return results
+
+    def result(self, frames_total: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "predictions": self.predictions(),
+            "frames_processed": self.frames,
+            "frames_total": frames_total,
+            "stopped_early": self.stable and (frames_total is None or self.frames < frames_total),
+        }
+
+
+def classify_frames(predict: Callable[[Any], Sequence[float]], frames: Iterable[Any], labels: Sequence[str],
+                    frames_total: Optional[int] = None, threshold: float = BURST_THRESHOLD,
+                    stable_frames: int = BURST_STABLE_FRAMES) -> Dict[str, Any]:
+    """frames を1枚ずつ predict（1フレーム → クラスごとの確率）し、安定したところで打ち切る。
+    frames がジェネレータなら、打ち切った後のフレームは取り出さない（デコードもしない）。"""
+    vote = StabilityVote(labels, threshold, stable_frames)
+    it = iter(frames)
+    try:
+        for frame in it:
+            if vote.add(predict(frame)):
+                break
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+    if vote.frames == 0:
+        return {"error": "no_frames"}
+    return vote.result(frames_total)
+
+
+def classify_source(model, source, max_frames: int = BURST_MAX_FRAMES, sample_fps: float = BURST_SAMPLE_FPS,
+                    threshold: float = BURST_THRESHOLD, stable_frames: int = BURST_STABLE_FRAMES) -> Dict[str, Any]:
+    """tm_engine.TMModel で、画像の並び / 複数フレーム画像 / 動画（bytes）を判定する。"""
+    import preprocess
+    frames, total = preprocess.open_frames(source, model.image_size, model.grayscale, max_frames, sample_fps)
+    return classify_frames(lambda img: model.predict_batch(model.preprocess(img))[0], frames, model.labels,
+                           frames_total=total, threshold=threshold, stable_frames=stable_frames)
@@ -0,0 +1,376 @@
+import os
+import json
+import time
+import uuid
+import logging
+import random
+import sqlite3
+import threading
+import http.client
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+# =============================
+# 監査先への転送用アウトボックス（SQLite, WALモード）
+# - api_report は enqueue するだけ（リクエストのスレッドは送信を待たない）
+# - 送信はバックグラウンドのスレッド1本: keep-alive の接続を使い回し、
+#   {"reports": [{filename, content}, ...]} でまとめて POST する
+# - まとめ送信は、1件形式 {filename, content} の応答に accepts_batch: true（または results）が
+#   付いていた受信側にだけ使う。起動直後は1件ずつ送って確かめる
+#   （1件形式しか知らない古い受信側は {"reports": [...]} を空のレポート1件として保存してしまうため）
+# - 通信エラー・5xx は指数バックオフ（上限あり）で再送し続ける。未送信分はディスクに残るので再起動後も送る
+# - 受信側が拒否したもの（4xx, results[i].ok が false）は再送しても通らないので、
+#   4xx はその場で、ok: false は max_rejections 回続いたら failed（送信失敗）にして送るのをやめる
+# - 受信側はファイル名で上書き保存するので、再送で二重に届いても問題ない
+# - 送信済みにするのは、受信側の応答で ok が true だったものだけ
+# - gunicorn のワーカーごとに送信スレッドが動くので、送る行は claimed_by / lease_until で確保してから送る
+#   （確保したワーカーが落ちても lease_until を過ぎれば他のワーカーが送る）
+# =============================
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    filename     TEXT PRIMARY KEY,
+    content      TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error   TEXT NOT NULL DEFAULT '',
+    created_at   REAL NOT NULL,
+    sent_at      REAL,
+    claimed_by   TEXT NOT NULL DEFAULT '',
+    lease_until  REAL NOT NULL DEFAULT 0,
+    rejections   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt);
+"""
+# 後から足した列（古い outbox.sqlite3 には ALTER TABLE で追加する）
+_ADDED_COLUMNS = (
+    ("claimed_by", "TEXT NOT NULL DEFAULT ''"),
+    ("lease_until", "REAL NOT NULL DEFAULT 0"),
+    ("rejections", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# 再送しても結果が変わらない 4xx（408 / 429 は一時的なものとして再送する）
+_RETRYABLE_4XX = (408, 429)
+
+
+class RejectedError(RuntimeError):
+    """受信側が 4xx で拒否した（同じ内容を送り直しても通らない）。"""
+
+
+class Outbox:
+    def __init__(self, db_path: str, endpoint: str, batch_size: int = 20,
+                 timeout: float = 10.0, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 linger: float = 0.2, keep_sent: float = 7 * 86400, lease: Optional[float] = None,
+                 max_rejections: int = 3):
+        self.db_path = db_path
+        self.endpoint = endpoint
+        self.batch_size = max(1, int(batch_size))
+        self.timeout = float(timeout)
+        self.base_backoff = float(base_backoff)
+        self.max_backoff = float(max_backoff)
+        self.linger = float(linger)
+        self.keep_sent = float(keep_sent)
+        self.max_rejections = max(1, int(max_rejections))
+        # 確保した行を他のワーカーが送らない時間（1件ずつ送る場合もバッチ全体が終わる長さ）
+        self.lease = float(lease) if lease is not None else self.timeout * (self.batch_size + 2)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # 受信側が {"reports": [...]} を受け付けると分かったら True（それまでは1件ずつ送る）
+        self.batch_capable = False
+
+        url = urllib.parse.urlsplit(endpoint)
+        self._scheme = url.scheme or "http"
+        self._host = url.hostname or ""
+        self._port = url.port
+        self._path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[http.client.HTTPConnection] = None
+        self.batches_sent = 0
+        self.reports_sent = 0
+        self.failures = 0
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(outbox)")}
+        for name, decl in _ADDED_COLUMNS:
+            if name not in columns:
+                conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {decl}")
+        conn.commit()
+
+    # ===== 接続（スレッドごと）=====
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ===== 登録・状態 =====
+    def enqueue(self, filename: str, content: str):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO outbox (filename, content, status, attempts, next_attempt, last_error, created_at,"
+            " claimed_by, lease_until, rejections) VALUES (?, ?, ?, 0, 0, '', ?, '', 0, 0)",
+            (filename, content, STATUS_PENDING, time.time()),
+        )
+        conn.commit()
+        self._wake.set()
+
+    def status(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT filename, status, attempts, next_attempt, last_error, created_at, sent_at"
+            " FROM outbox WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def statuses(self, filenames: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not filenames:
+            return {}
+        marks = ",".join("?" * len(filenames))
+        rows = self._conn().execute(
+            f"SELECT filename, status, attempts, next_attempt, last_error, created_at, sent_at"
+            f" FROM outbox WHERE filename IN ({marks})", filenames).fetchall()
+        return {r["filename"]: dict(r) for r in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {r["status"]: r["n"] for r in self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM outbox GROUP BY status")}
+        return {
+            "endpoint": self.endpoint,
+            "pending": counts.get(STATUS_PENDING, 0),
+            "sent": counts.get(STATUS_SENT, 0),
+            "failed": counts.get(STATUS_FAILED, 0),
+            "batches_sent": self.batches_sent,
+            "reports_sent": self.reports_sent,
+            "failures": self.failures,
+            "batch_capable": self.batch_capable,
+        }
+
+    # ===== 送信スレッド =====
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_http()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.flush_once()
+            except Exception:
+                sent = 0
+            if sent:
+                continue
+            self._wake.wait(self._idle_wait())
+            self._wake.clear()
+            # 連続して届いたレポートを1回の POST にまとめるため少し待つ
+            if self.linger > 0 and not self._stop.is_set():
+                self._stop.wait(self.linger)
+
+    def _idle_wait(self) -> float:
+        row = self._conn().execute(
+            "SELECT MIN(MAX(next_attempt, lease_until)) AS t FROM outbox WHERE status = ?",
+            (STATUS_PENDING,)).fetchone()
+        if not row or row["t"] is None:
+            return 60.0
+        return min(60.0, max(0.05, row["t"] - time.time()))
+
+    def _claim(self) -> List[sqlite3.Row]:
+        """送信期限が来ていて、他のワーカーが確保していない行を確保する（1トランザクション）。"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT filename, content, attempts FROM outbox"
+                " WHERE status = ? AND next_attempt <= ? AND lease_until <= ?"
+                " ORDER BY created_at LIMIT ?",
+                (STATUS_PENDING, now, now, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET claimed_by = ?, lease_until = ? WHERE filename = ?",
+                [(self.owner, now + self.lease, r["filename"]) for r in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return rows
+
+    def flush_once(self) -> int:
+        """送信期限の来たレポートを1バッチ送る。送れた件数を返す。"""
+        rows = self._claim()
+        if not rows:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            outcomes = self._send_batch(rows) if self.batch_capable else self._send_single(rows)
+        except Exception as e:
+            self._close_http()
+            self.failures += 1
+            metrics.FORWARD_DURATION.observe(time.perf_counter() - t0, result="error")
+            metrics.FORWARD_REPORTS.inc(len(rows), result="error")
+            self._mark_failed(rows, str(e) or e.__class__.__name__)
+            return 0
+
+        metrics.FORWARD_DURATION.observe(time.perf_counter() - t0, result="ok")
+        ok_names = [r["filename"] for r, error in zip(rows, outcomes) if error is None]
+        rejected = [(r, error) for r, error in zip(rows, outcomes) if error is not None]
+        metrics.FORWARD_REPORTS.inc(len(ok_names), result="sent")
+        if rejected:
+            metrics.FORWARD_REPORTS.inc(len(rejected), result="rejected")
+        self._mark_sent(ok_names)
+        self._mark_rejected(rejected)
+        self.batches_sent += 1
+        self.reports_sent += len(ok_names)
+        return len(ok_names)
+
+    def _send_batch(self, rows: List[sqlite3.Row]) -> List[Optional[Tuple[str, bool]]]:
+        """{"reports": [...]} で送り、行ごとの結果を返す（None = 送れた、(理由, 再送しても無駄か) = 拒否）。"""
+        body = json.dumps({"reports": [{"filename": r["filename"], "content": r["content"]} for r in rows]},
+                          ensure_ascii=False).encode("utf-8")
+        try:
+            payload = self._post(body)
+        except RejectedError:
+            # まとめた本文ごと拒否された（大きすぎる・1件だけ不正など）: 1件ずつ送り直して拒否された行を特定する
+            return self._send_single(rows, upgrade=False)
+        results = payload.get("results")
+        if not isinstance(results, list) or len(results) != len(rows):
+            # 受信側が1件形式のみに戻った（まとめた本文は空のレポート1件として保存されている）: 以後1件ずつ送る
+            log.warning("auditor endpoint %s did not return per-report results; sending reports one by one",
+                        self.endpoint)
+            self.batch_capable = False
+            return self._send_single(rows)
+        outcomes = []
+        for r, result in zip(rows, results):
+            name = result.get("filename") if isinstance(result, dict) else None
+            if isinstance(result, dict) and result.get("ok") is True and name in (None, r["filename"]):
+                outcomes.append(None)
+            else:
+                error = result.get("error") if isinstance(result, dict) else None
+                outcomes.append((f"rejected by receiver: {error}" if error else "rejected by receiver", False))
+        return outcomes
+
+    def _send_single(self, rows: List[sqlite3.Row], upgrade: bool = True) -> List[Optional[Tuple[str, bool]]]:
+        """1件ずつ {filename, content} で送る。まとめ送信を受け付ける受信側と分かったら残りはまとめて送る。"""
+        outcomes: List[Optional[Tuple[str, bool]]] = []
+        for i, r in enumerate(rows):
+            if upgrade and self.batch_capable:
+                return outcomes + self._send_batch(rows[i:])
+            body = json.dumps({"filename": r["filename"], "content": r["content"]}, ensure_ascii=False).encode("utf-8")
+            try:
+                payload = self._post(body)
+            except RejectedError as e:
+                outcomes.append((f"rejected by receiver: {e}", True))
+                continue
+            if payload.get("accepts_batch") is True or isinstance(payload.get("results"), list):
+                self.batch_capable = True
+            outcomes.append(None if payload.get("ok") is True else ("rejected by receiver", False))
+        return outcomes
+
+    def _post(self, body: bytes) -> Dict[str, Any]:
+        """POST して応答のJSONを返す。2xx 以外は例外。"""
+        for attempt in range(2):
+            conn = self._http_conn()
+            try:
+                conn.request("POST", self._path, body=body, headers={
+                    "Content-Type": "application/json",
+                    "Connection": "keep-alive",
+                })
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # keep-alive が相手側で切られていた場合は1回だけ張り直す
+                self._close_http()
+                if attempt:
+                    raise
+                continue
+            if resp.getheader("Connection", "").lower() == "close":
+                self._close_http()
+            if 400 <= resp.status < 500 and resp.status not in _RETRYABLE_4XX:
+                raise RejectedError(f"HTTP {resp.status}")
+            if not 200 <= resp.status < 300:
+                raise RuntimeError(f"HTTP {resp.status}")
+            try:
+                payload = json.loads(data.decode("utf-8") or "{}")
+            except ValueError:
+                payload = {}
+            return payload if isinstance(payload, dict) else {}
+        return {}
+
+    def _http_conn(self) -> http.client.HTTPConnection:
+        if self._http is None:
+            cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            self._http = cls(self._host, self._port, timeout=self.timeout)
+        return self._http
+
+    def _close_http(self):
+        if self._http is not None:
+            try:
+                self._http.close()
+            except Exception:
+                pass
+            self._http = None
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _mark_sent(self, filenames: List[str]):
+        if not filenames:
+            return
+        now = time.time()
+        conn = self._conn()
+        # 送信済みの本文は不要なので消しておく（状態だけ残す）
+        # claimed_by が自分のものだけ（送信中に同じファイル名で積み直された行は送り直す）
+        conn.executemany(
+            "UPDATE outbox SET status = ?, content = '', last_error = '', sent_at = ?, attempts = attempts + 1,"
+            " claimed_by = '', lease_until = 0 WHERE filename = ? AND claimed_by = ?",
+            [(STATUS_SENT, now, fn, self.owner) for fn in filenames])
+        conn.execute("DELETE FROM outbox WHERE status = ? AND sent_at < ?", (STATUS_SENT, now - self.keep_sent))
+        conn.commit()
+
+    def _mark_failed(self, rows: List[sqlite3.Row], error: str):
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ?, claimed_by = '', lease_until = 0"
+            " WHERE filename = ? AND status = ? AND claimed_by = ?",
+            [(r["attempts"] + 1, now + self._backoff(r["attempts"] + 1), error[:500], r["filename"], STATUS_PENDING,
+              self.owner) for r in rows])
+        conn.commit()
+
+    def _mark_rejected(self, rejected: List[Tuple[sqlite3.Row, Tuple[str, bool]]]):
+        """受信側が拒否した行: 4xx はすぐ、ok: false は max_rejections 回目で failed にする（以後は送らない）。"""
+        if not rejected:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "UPDATE outbox SET"
+            " status = CASE WHEN ? OR rejections + 1 >= ? THEN ? ELSE status END,"
+            " attempts = attempts + 1, rejections = rejections + 1, next_attempt = ?, last_error = ?,"
+            " claimed_by = '', lease_until = 0"
+            " WHERE filename = ? AND status = ? AND claimed_by = ?",
+            [(int(terminal), self.max_rejections, STATUS_FAILED, now + self._backoff(r["attempts"] + 1), error[:500],
+              r["filename"], STATUS_PENDING, self.owner) for r, (error, terminal) in rejected])
+        conn.commit()
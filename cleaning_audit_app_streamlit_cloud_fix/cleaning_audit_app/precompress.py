@@ -0,0 +1,318 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli  # 任意（pip install brotli）。無ければ gzip のみ
+except ImportError:
+    brotli = None
+
+# =============================
+# 圧縮済みコピー（.br / .gz）と条件付きリクエスト（ETag / Last-Modified → 304）
+# - 静的ファイル・モデル（model.json など）: 起動時に1回だけ圧縮して build/precompressed/ に置く
+# - レポート: 初回のダウンロード時に圧縮（一括受信の速度を落とさないため保存時には作らない）
+#   ファイル名は内容のハッシュ（上書きされたレポートに古いコピーを返さない・同じ内容は1つ）。
+#   ディレクトリの合計が上限を超えたら古いものから消す（消したものは次のダウンロードで作り直す）
+# - ETag は内容の SHA-256 から作る強いETag（圧縮形式ごとに別の値: "<hash>-br" / "<hash>-gz"）
+# - 圧縮しても 10% 以上小さくならないもの（画像・重みの大半）は元のまま配信する
+# =============================
+
+COMPRESSIBLE_EXTS = (".json", ".txt", ".js", ".css", ".html", ".svg", ".bin")
+MIN_SIZE = 256
+MIN_SAVING = 0.10
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# 動的なHTMLは毎回圧縮するので軽めの設定
+DYNAMIC_GZIP_LEVEL = 6
+DYNAMIC_BROTLI_QUALITY = 5
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+_HASH_CACHE_MAX = 4096
+
+# prune_dir で1ファイルに数える最小の大きさ（.skip などの空ファイルもディスクのブロックは使う）
+_MIN_FILE_BYTES = 4096
+# 前回の整理から、上限のこの割合を書き足したら次の整理をする（毎回ディレクトリを数えない）
+_PRUNE_EVERY = 0.1
+_written: Dict[str, int] = {}
+_prune_lock = threading.Lock()
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def file_digest(path: str, st: Optional[os.stat_result] = None) -> str:
+    """内容の SHA-256（先頭16桁）。(パス, mtime, サイズ) が同じ間は読み直さない。"""
+    st = st or os.stat(path)
+
+    def read():
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                h.update(chunk)
+        return h
+
+    return _cached_digest((path, st.st_mtime_ns, st.st_size), read)
+
+
+def data_digest(key: str, mtime_ns: int, size: int, read: Callable[[], bytes]) -> str:
+    """ファイル以外（SQLite に保存したレポートなど）の内容の SHA-256。(key, mtime, サイズ) でキャッシュする。"""
+    return _cached_digest((key, mtime_ns, size), lambda: hashlib.sha256(read()))
+
+
+def _cached_digest(key: Tuple[str, int, int], compute) -> str:
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+    if digest is not None:
+        return digest
+    digest = compute().hexdigest()[:16]
+    with _hash_lock:
+        if len(_hash_cache) >= _HASH_CACHE_MAX:
+            _hash_cache.clear()
+        _hash_cache[key] = digest
+    return digest
+
+
+def _compress(data: bytes, encoding: str, dynamic: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=DYNAMIC_BROTLI_QUALITY if dynamic else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=DYNAMIC_GZIP_LEVEL if dynamic else GZIP_LEVEL, mtime=0)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_variants(src: str, out_dir: str, name: Optional[str] = None) -> Dict[str, str]:
+    """src の .br / .gz を out_dir/name に作る（元より新しいものがあれば作り直さない）。
+    {encoding: パス} を返す。小さくならない場合は作らない。"""
+    name = name or os.path.basename(src)
+    st = os.stat(src)
+
+    def read():
+        with open(src, "rb") as f:
+            return f.read()
+
+    return build_variants_from(read, st.st_mtime_ns, st.st_size, out_dir, name)
+
+
+def build_variants_from(read: Callable[[], bytes], mtime_ns: int, size: int, out_dir: str,
+                        name: str, max_dir_bytes: Optional[int] = None) -> Dict[str, str]:
+    """build_variants の本体。内容は read() で必要なときだけ読む。
+    max_dir_bytes を指定すると、書き足した量に応じて out_dir を prune_dir で整理する。"""
+    if not name.endswith(COMPRESSIBLE_EXTS) or size < MIN_SIZE:
+        return {}
+    os.makedirs(out_dir, exist_ok=True)
+    out: Dict[str, str] = {}
+    data = None
+    written = 0
+    for encoding, ext in ENCODINGS:
+        if encoding not in available_encodings():
+            continue
+        dst = os.path.join(out_dir, name + ext)
+        skip = dst + ".skip"  # 圧縮しても小さくならなかった印
+        if os.path.exists(skip) and os.stat(skip).st_mtime_ns >= mtime_ns:
+            continue
+        if os.path.exists(dst) and os.stat(dst).st_mtime_ns >= mtime_ns:
+            out[encoding] = dst
+            continue
+        if data is None:
+            data = read()
+        packed = _compress(data, encoding)
+        if len(packed) > len(data) * (1 - MIN_SAVING):
+            _write_atomic(skip, b"")
+            written += _MIN_FILE_BYTES
+            continue
+        _write_atomic(dst, packed)
+        written += max(len(packed), _MIN_FILE_BYTES)
+        out[encoding] = dst
+    if written and max_dir_bytes is not None:
+        with _prune_lock:
+            _written[out_dir] = _written.get(out_dir, 0) + written
+            due = _written[out_dir] >= max_dir_bytes * _PRUNE_EVERY
+            if due:
+                _written[out_dir] = 0
+        if due:
+            prune_dir(out_dir, max_dir_bytes, keep=tuple(out.values()))
+    return out
+
+
+def prune_dir(out_dir: str, max_bytes: int, keep: Tuple[str, ...] = ()) -> int:
+    """out_dir の合計が max_bytes を超えていたら、更新時刻の古いファイルから上限の9割まで消す。消した件数を返す。"""
+    entries = []
+    try:
+        with os.scandir(out_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.path not in keep:
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, max(st.st_size, _MIN_FILE_BYTES), entry.path))
+    except OSError:
+        return 0
+    total = sum(size for _, size, _ in entries) + len(keep) * _MIN_FILE_BYTES
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def build_dir(src_dir: str, out_dir: str) -> int:
+    """src_dir 以下（サブディレクトリ含む）の圧縮済みコピーを out_dir に作る。作った/既存の件数を返す。"""
+    n = 0
+    for root, _dirs, files in os.walk(src_dir):
+        rel = os.path.relpath(root, src_dir)
+        for fn in files:
+            if fn.endswith(COMPRESSIBLE_EXTS):
+                n += len(build_variants(os.path.join(root, fn), os.path.normpath(os.path.join(out_dir, rel)), fn))
+    return n
+
+
+def choose_encoding(accept_encoding: str, offered: Tuple[str, ...]) -> str:
+    """Accept-Encoding から使う圧縮形式を選ぶ（br を優先、q=0 は除外）。無ければ ""。"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    for encoding in ("br", "gzip"):
+        if encoding in offered and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return ""
+
+
+def is_not_modified(request, etag: str, mtime: Optional[float]) -> bool:
+    inm = request.headers.get("If-None-Match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    ims = request.headers.get("If-Modified-Since")
+    if ims and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def send_file(request, path: str, variants_dir: Optional[str] = None, *, name: Optional[str] = None,
+              cache_control: str = "no-cache", as_attachment: bool = False, mimetype: Optional[str] = None,
+              build: bool = True):
+    """path を配信する。Accept-Encoding に合う圧縮済みコピーがあればそれを返す（無ければ build=True で作る）。
+    強いETag と Last-Modified を付け、条件付きリクエストには 304 を返す。"""
+    from flask import abort
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        abort(404)
+
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+
+    return send_data(request, name or os.path.basename(path), st.st_mtime, st.st_mtime_ns, st.st_size, read,
+                     variants_dir, digest=file_digest(path, st), cache_control=cache_control,
+                     as_attachment=as_attachment, mimetype=mimetype, build=build)
+
+
+def send_data(request, name: str, mtime: float, mtime_ns: int, size: int, read: Callable[[], bytes],
+              variants_dir: Optional[str] = None, *, digest: Optional[str] = None, cache_control: str = "no-cache",
+              as_attachment: bool = False, mimetype: Optional[str] = None, build: bool = True,
+              content_addressed: bool = False, max_variants_bytes: Optional[int] = None):
+    """send_file の本体。ファイル以外（SQLite の本文など）も read() で渡せる。
+    content_addressed=True なら圧縮済みコピーを内容のハッシュの名前（<hash>.txt.gz など）で持ち、
+    max_variants_bytes で variants_dir の合計の上限を決める。"""
+    from flask import Response
+
+    digest = digest or data_digest(name, mtime_ns, size, read)
+
+    variants: Dict[str, str] = {}
+    if variants_dir:
+        # 内容で決まる名前なら、あるものはそのまま使える（更新時刻で新しさを比べない）
+        variant_name = digest + os.path.splitext(name)[1] if content_addressed else name
+        for encoding, ext in ENCODINGS:
+            p = os.path.join(variants_dir, variant_name + ext)
+            if os.path.exists(p) and (content_addressed or os.stat(p).st_mtime_ns >= mtime_ns):
+                variants[encoding] = p
+        if not variants and build:
+            variants = build_variants_from(read, 0 if content_addressed else mtime_ns, size, variants_dir,
+                                           variant_name, max_dir_bytes=max_variants_bytes)
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), tuple(variants))
+    etag = f'"{digest}-{"gz" if encoding == "gzip" else encoding}"' if encoding else f'"{digest}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if variants_dir and name.endswith(COMPRESSIBLE_EXTS):
+        headers["Vary"] = "Accept-Encoding"
+    if as_attachment:
+        headers["Content-Disposition"] = f'attachment; filename="{name}"'
+
+    if is_not_modified(request, etag, mtime):
+        return Response(status=304, headers=headers)
+
+    if encoding:
+        with open(variants[encoding], "rb") as f:
+            data = f.read()
+        headers["Content-Encoding"] = encoding
+    else:
+        data = read()
+    # mimetype= に渡すと werkzeug が text/* に charset を足すので、完成した値を content_type= で渡す
+    content_type = mimetype or mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") and "charset" not in content_type:
+        content_type += "; charset=utf-8"
+    return Response(data, content_type=content_type, headers=headers)
+
+
+def compress_response(request, resp, min_size: int = 1024):
+    """動的なレスポンス（監査画面のHTMLなど）に強いETagを付けて 304 を返し、必要なら圧縮する。"""
+    if (request.method != "GET" or resp.status_code != 200 or resp.direct_passthrough
+            or resp.is_streamed or "Content-Encoding" in resp.headers):
+        return resp
+    data = resp.get_data()
+    etag_base = hashlib.sha256(data).hexdigest()[:16]
+    encoding = ""
+    if len(data) >= min_size:
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), available_encodings())
+    etag = f'"{etag_base}-{"gz" if encoding == "gzip" else encoding}"' if encoding else f'"{etag_base}"'
+    resp.headers["ETag"] = etag
+    resp.headers.add("Vary", "Accept-Encoding")
+    if is_not_modified(request, etag, None):
+        resp.status_code = 304
+        resp.set_data(b"")
+        resp.headers.pop("Content-Length", None)
+        return resp
+    if encoding:
+        resp.set_data(_compress(data, encoding, dynamic=True))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
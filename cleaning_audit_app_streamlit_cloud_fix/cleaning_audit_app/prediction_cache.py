@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import model_assets
+
+# =============================
+# 判定結果のプロセス共有キャッシュ（画像のSHA-256 + モデルのバージョンがキー）
+# - 件数上限を超えたら古い順（LRU）に削除、TTLを過ぎたものは読むときに削除
+# - model.json / weights.bin が変わったら全件破棄（check_interval 秒ごとにstatで確認）
+# - Streamlitの再実行・再判定ボタン・別セッションでも同じ画像は推論し直さない
+# =============================
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "2048"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "86400"))
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 2048, ttl: float = 86400.0,
+                 version_fn: Callable[[], str] = model_assets.model_signature,
+                 check_interval: float = 2.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.version_fn = version_fn
+        self.check_interval = float(check_interval)
+
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = version_fn()
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> str:
+        self._check_version()
+        return self._version
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        version = self.version_fn()
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                self._version = version
+                self._data.clear()
+                self.invalidations += 1
+
+    def _key(self, digest: str) -> str:
+        return f"{self._version}:{digest}"
+
+    def get(self, digest: str) -> Optional[Any]:
+        self._check_version()
+        with self._lock:
+            key = self._key(digest)
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, digest: str, value: Any, version: Optional[str] = None):
+        """version: 推論を始める前に読んだ self.version。推論中にモデルが変わっていたら保存しない
+        （古いモデルの結果を新しいバージョンのキーで返さないように）。"""
+        self._check_version()
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            key = self._key(digest)
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, digest: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(digest)
+        if value is not None:
+            return value
+        version = self.version
+        value = compute()
+        # エラー（dict）は保存しない（再判定できるようにする）
+        if isinstance(value, list):
+            self.put(digest, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_version": self._version,
+            }
+
+
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> PredictionCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+    return _cache
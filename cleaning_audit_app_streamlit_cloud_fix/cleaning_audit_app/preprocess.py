@@ -0,0 +1,161 @@
+import io
+import os
+import json
+import base64
+from functools import lru_cache
+from typing import Iterator, Optional, Sequence, Tuple, Union
+
+from PIL import Image, ImageOps, ImageSequence
+
+import model_assets
+
+# =============================
+# 判定用の画像前処理（PILのみ / NumPy不要）
+# - JPEGは draft モードで縮小デコード（12MPでもフル解像度には展開しない）
+# - 中央を正方形に切り抜き、モデルの imageSize（metadata.json）まで一気に縮小
+# - グレースケールモデルなら最初から "L" でデコード
+# 結果は imageSize x imageSize の小さな画像（サーバー推論にも、コンポーネントへのサムネイルにも使う）
+# =============================
+
+
+@lru_cache(maxsize=8)
+def model_input_spec(model_dir: Optional[str] = None) -> Tuple[int, bool]:
+    """metadata.json から (imageSize, grayscale) を返す。"""
+    model_dir = model_dir or model_assets.source_dir()
+    with open(os.path.join(model_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return int(meta.get("imageSize") or 224), bool(meta.get("grayscale"))
+
+
+def fit_to_model(img: Image.Image, image_size: int, grayscale: bool) -> Image.Image:
+    mode = "L" if grayscale else "RGB"
+    if img.mode != mode:
+        img = img.convert(mode)
+    w, h = img.size
+    if (w, h) == (image_size, image_size):
+        return img
+    side = min(w, h)
+    left = (w - side) // 2
+    top = (h - side) // 2
+    return img.resize((image_size, image_size), Image.BILINEAR, box=(left, top, left + side, top + side))
+
+
+def load_model_image(image_bytes: bytes, image_size: int, grayscale: bool) -> Image.Image:
+    """画像バイト列 → imageSize x imageSize（L または RGB）の画像。"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # JPEGのみ有効（1/2, 1/4, 1/8 のDCTスケーリングで、要求サイズ以上の最小解像度にデコード）
+        img.draft("L" if grayscale else "RGB", (image_size, image_size))
+        # スマホ写真の回転情報（EXIF Orientation）をブラウザ表示と同じ向きに反映
+        img = ImageOps.exif_transpose(img)
+        return fit_to_model(img, image_size, grayscale)
+
+
+def load_for_model(image_bytes: bytes, model_dir: Optional[str] = None) -> Image.Image:
+    image_size, grayscale = model_input_spec(model_dir)
+    return load_model_image(image_bytes, image_size, grayscale)
+
+
+def thumbnail_data_url(img: Image.Image) -> str:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=False)
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+# ===== 連写・短い動画（複数フレーム）=====
+# - 複数の画像（連写）、アニメーションGIF/WebPなどの複数フレーム画像、短い動画（mp4 / mov / webm / avi）を扱う
+# - フレームは1枚ずつ取り出す（判定側が途中で打ち切れば、残りはデコードしない）
+# - 動画は PyAV（pip install av）がある場合のみ。sample_fps ごとに1フレームを使う
+try:
+    import av  # type: ignore
+except ImportError:
+    av = None
+
+# 動画ではなく画像として扱う ISO BMFF のブランド（HEIC/AVIF の写真）
+_IMAGE_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1", b"avif", b"avis"}
+
+
+class VideoUnsupported(ValueError):
+    """動画が渡されたが PyAV が無い。"""
+
+
+def is_video(data: bytes) -> bool:
+    if len(data) >= 12 and data[4:8] == b"ftyp":
+        return data[8:12] not in _IMAGE_BRANDS
+    if data[:4] == b"\x1a\x45\xdf\xa3":  # WebM / Matroska
+        return True
+    return data[:4] == b"RIFF" and data[8:12] == b"AVI "
+
+
+def _n_frames(img: Image.Image) -> int:
+    # MPO（スマホ・デジカメの JPEG に深度マップや別レンズの画像が付いたもの）は n_frames=2 以上になるが、
+    # 連写ではないので先頭の1枚だけを写真として扱う
+    if img.format == "MPO":
+        return 1
+    return int(getattr(img, "n_frames", 1) or 1)
+
+
+def frame_count(data: bytes) -> int:
+    """画像のフレーム数（動画は 0 = 開くまで分からない）。読めない画像は 1（単体の判定に任せる）。"""
+    if is_video(data):
+        return 0
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return _n_frames(img)
+    except Exception:
+        return 1
+
+
+def is_multi_frame(data: bytes) -> bool:
+    return frame_count(data) != 1
+
+
+def _image_frames(data: bytes, image_size: int, grayscale: bool, max_frames: int) -> Iterator[Image.Image]:
+    with Image.open(io.BytesIO(data)) as img:
+        limit = min(max_frames, _n_frames(img))
+        for i, frame in enumerate(ImageSequence.Iterator(img)):
+            if i >= limit:
+                break
+            yield fit_to_model(ImageOps.exif_transpose(frame.copy()), image_size, grayscale)
+
+
+def _video_frames(data: bytes, image_size: int, grayscale: bool, max_frames: int,
+                  sample_fps: float) -> Tuple[Iterator[Image.Image], Optional[int]]:
+    if av is None:
+        raise VideoUnsupported("video input requires PyAV (pip install av)")
+    container = av.open(io.BytesIO(data))
+    try:
+        stream = container.streams.video[0]
+    except IndexError:
+        container.close()
+        raise ValueError("no video stream")
+    stream.thread_type = "AUTO"
+    rate = float(stream.average_rate or 0) or 30.0
+    step = max(1, round(rate / sample_fps)) if sample_fps > 0 else 1
+    total = min(max_frames, -(-stream.frames // step)) if stream.frames else None
+
+    def frames():
+        try:
+            n = 0
+            for i, frame in enumerate(container.decode(stream)):
+                if i % step:
+                    continue
+                yield fit_to_model(frame.to_image(), image_size, grayscale)
+                n += 1
+                if n >= max_frames:
+                    break
+        finally:
+            container.close()
+
+    return frames(), total
+
+
+def open_frames(source: Union[bytes, Sequence[bytes]], image_size: int, grayscale: bool,
+                max_frames: int = 16, sample_fps: float = 5.0) -> Tuple[Iterator[Image.Image], Optional[int]]:
+    """source（画像の並び / 複数フレーム画像 / 動画）→ (imageSize の画像を1枚ずつ返すイテレータ, フレーム数)。
+    フレーム数は分からなければ None。"""
+    if not isinstance(source, (bytes, bytearray)):
+        items = list(source)[:max_frames]
+        return (load_model_image(b, image_size, grayscale) for b in items), len(items)
+    if is_video(source):
+        return _video_frames(bytes(source), image_size, grayscale, max_frames, sample_fps)
+    return _image_frames(bytes(source), image_size, grayscale, max_frames), min(max_frames, frame_count(source))
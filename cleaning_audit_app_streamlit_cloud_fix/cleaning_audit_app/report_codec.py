@@ -0,0 +1,284 @@
+import re
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+# =============================
+# CLEANING_REPORT_V1（清掃レポートのテキスト形式）の読み書き
+# - Flask（api_report / 監査画面 / 索引 / エクスポート）と Streamlit の両方がここで組み立て・解析する
+# - Report / TaskEntry は __slots__ の軽いレコード。値は書かれていた文字列のまま持つ（数値は *_value で取得）
+# - encode(decode(text)) == text（バイト単位で一致）:
+#   - 標準の形（encode が書く形）はそのまま解析する（高速）
+#   - それ以外（CRLF、余分な空白や行、行の欠け）は元の行の並びを覚えておき、値だけ差し替えて書き戻す
+# =============================
+
+MAGIC = "CLEANING_REPORT_V1"
+# (ファイル上の項目名, 属性名)
+HEADER_KEYS = (
+    ("report_id", "report_id"),
+    ("roomId", "room_id"),
+    ("cleanerId", "cleaner_id"),
+    ("startedAt", "started_at"),
+    ("finishedAt", "finished_at"),
+    ("durationSeconds", "duration_seconds"),
+    ("totalScore", "total_score"),
+)
+TASK_KEYS = (
+    ("status", "status"),
+    ("score", "score"),
+    ("checkedAt", "checked_at"),
+    ("notes", "notes"),
+)
+HEADER_FIELDS = [k for k, _ in HEADER_KEYS]
+TASK_FIELDS = [k for k, _ in TASK_KEYS]
+
+_HEADER_ATTR = dict(HEADER_KEYS)
+_TASK_ATTR = dict(TASK_KEYS)
+_HEADER_PREFIXES = tuple((f"{k}: ", a) for k, a in HEADER_KEYS)
+_TASK_PREFIXES = tuple((f"  {k}: ", a) for k, a in TASK_KEYS)
+_TASK_ID_PREFIX = "- id: "
+# 標準の形: MAGIC + ヘッダー7行 + 空行 + "tasks:" + タスクごとに5行（各行 "\n" 終わり）
+# 値は1行で、前後に空白が無いもの（空でもよい）
+_VALUE = r"((?:\S(?:[^\n]*\S)?)?)"
+_CANONICAL_HEADER = re.compile(
+    re.escape(MAGIC) + r"\n" + "".join(f"{k}: {_VALUE}\\n" for k, _ in HEADER_KEYS) + r"\ntasks:\n")
+_CANONICAL_TASK = re.compile(
+    re.escape(_TASK_ID_PREFIX) + _VALUE + r"\n" + "".join(f"  {k}: {_VALUE}\\n" for k, _ in TASK_KEYS))
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TaskEntry:
+    __slots__ = ("id", "status", "score", "checked_at", "notes")
+
+    def __init__(self, id: str = "", status: str = "", score: str = "", checked_at: str = "", notes: str = ""):
+        self.id = id
+        self.status = status
+        self.score = score
+        self.checked_at = checked_at
+        self.notes = notes
+
+    @property
+    def score_value(self) -> Optional[float]:
+        return _number(self.score)
+
+    def fields(self) -> Dict[str, str]:
+        """{"status": ..., "score": ..., "checkedAt": ..., "notes": ...}（ファイル上の項目名）。"""
+        return {k: getattr(self, a) for k, a in TASK_KEYS}
+
+    def __eq__(self, other):
+        return isinstance(other, TaskEntry) and all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self):
+        return f"TaskEntry(id={self.id!r}, status={self.status!r}, score={self.score!r})"
+
+
+class Report:
+    __slots__ = ("report_id", "room_id", "cleaner_id", "started_at", "finished_at",
+                 "duration_seconds", "total_score", "tasks", "layout")
+
+    def __init__(self, report_id: str = "", room_id: str = "", cleaner_id: str = "", started_at: str = "",
+                 finished_at: str = "", duration_seconds: str = "", total_score: str = "",
+                 tasks: Optional[List[TaskEntry]] = None):
+        self.report_id = report_id
+        self.room_id = room_id
+        self.cleaner_id = cleaner_id
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.duration_seconds = duration_seconds
+        self.total_score = total_score
+        self.tasks: List[TaskEntry] = tasks if tasks is not None else []
+        # 標準の形でなかった場合の元の行の並び（encode がそのまま書き戻す）。None なら標準の形で書く
+        self.layout: Optional[Tuple[int, Tuple[Any, ...]]] = None
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any], report_id: str) -> "Report":
+        """/api/report の JSON（{roomId, ..., tasks: {id: {status, ...}}}）から作る。"""
+        tasks = []
+        for tid, info in (data.get("tasks") or {}).items():
+            info = info or {}
+            tasks.append(TaskEntry(str(tid), *(str(info.get(k, "")) for k, _ in TASK_KEYS)))
+        return cls(str(report_id), *(str(data.get(k, "")) for k, _ in HEADER_KEYS[1:]), tasks=tasks)
+
+    @property
+    def duration_value(self) -> Optional[float]:
+        return _number(self.duration_seconds)
+
+    @property
+    def total_score_value(self) -> Optional[float]:
+        return _number(self.total_score)
+
+    def header(self) -> Dict[str, str]:
+        """ヘッダー項目（ファイル上の項目名 → 値）。"""
+        return {k: getattr(self, a) for k, a in HEADER_KEYS}
+
+    def summary(self) -> Dict[str, Any]:
+        """索引・集計用: ヘッダー項目 + タスクごとの status（{"tasks": {id: status}}）。"""
+        meta: Dict[str, Any] = self.header()
+        meta["tasks"] = {t.id: t.status for t in self.tasks}
+        return meta
+
+    def __eq__(self, other):
+        return isinstance(other, Report) and all(
+            getattr(self, a) == getattr(other, a) for a in self.__slots__ if a != "layout")
+
+    def __repr__(self):
+        return f"Report(report_id={self.report_id!r}, room_id={self.room_id!r}, tasks={len(self.tasks)})"
+
+
+# ===== 書き出し =====
+def _encode_canonical(report: Report) -> str:
+    lines = [MAGIC]
+    for prefix, attr in _HEADER_PREFIXES:
+        lines.append(f"{prefix}{getattr(report, attr)}")
+    lines.append("")
+    lines.append("tasks:")
+    for task in report.tasks:
+        lines.append(f"{_TASK_ID_PREFIX}{task.id}")
+        for prefix, attr in _TASK_PREFIXES:
+            lines.append(f"{prefix}{getattr(task, attr)}")
+    return "\n".join(lines) + "\n"
+
+
+def _encode_layout(report: Report, items: Tuple[Any, ...]) -> str:
+    out = []
+    for item in items:
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        prefix, slot, suffix = item
+        if isinstance(slot, str):
+            value = getattr(report, slot)
+        else:
+            value = getattr(report.tasks[slot[0]], slot[1])
+        out.append(f"{prefix}{value}{suffix}")
+    return "".join(out)
+
+
+def encode(report: Report) -> str:
+    """レポートをテキストにする。decode したものはタスクの数が同じ限り元の行の並びで書き戻す
+    （その場合、元の行に無かった項目は書かれない。report.layout = None にすると標準の形で書く）。"""
+    if report.layout is not None and report.layout[0] == len(report.tasks):
+        return _encode_layout(report, report.layout[1])
+    return _encode_canonical(report)
+
+
+def encode_bytes(report: Report) -> bytes:
+    return encode(report).encode("utf-8")
+
+
+# ===== 解析 =====
+def _decode_canonical(text: str) -> Optional[Report]:
+    # 標準の形なら正規表現1回でヘッダー、タスクごとに1回で決まる。少しでも違えば None（行ごとの解析に回す）
+    m = _CANONICAL_HEADER.match(text)
+    if m is None:
+        return None
+    report = Report(*m.groups())
+    tasks = report.tasks
+    match = _CANONICAL_TASK.match
+    pos, n = m.end(), len(text)
+    while pos < n:
+        m = match(text, pos)
+        if m is None:
+            return None
+        tasks.append(TaskEntry(*m.groups()))
+        pos = m.end()
+    return report
+
+
+def _split_value(line: str) -> Tuple[int, int]:
+    # "  key:  value  \r\n" の value（前後の空白を除いた部分）の開始・終了位置
+    colon = line.index(":")
+    end = len(line.rstrip())
+    start = colon + 1
+    while start < end and line[start].isspace():
+        start += 1
+    return start, end
+
+
+def decode_lines(lines: Iterable[str]) -> Report:
+    """行（改行付き。ファイルオブジェクトをそのまま渡してよい）を1行ずつ読んでレポートにする。
+
+    どんな形でも読める（知らない行は読み飛ばす）。値は前後の空白を除いたもの。同じ項目が2回あれば最初のもの。
+    """
+    report = Report()
+    items: List[Any] = []
+    header_seen = set()
+    task: Optional[TaskEntry] = None
+    task_seen = set()
+    for line in lines:
+        stripped = line.strip()
+        slot = None
+        if stripped.startswith("- id:"):
+            task = TaskEntry()
+            report.tasks.append(task)
+            task_seen = {"id"}
+            slot = (len(report.tasks) - 1, "id")
+        elif ":" in stripped:
+            key = stripped.split(":", 1)[0].strip()
+            if task is not None:
+                attr = _TASK_ATTR.get(key)
+                if attr is not None and attr not in task_seen:
+                    task_seen.add(attr)
+                    slot = (len(report.tasks) - 1, attr)
+            else:
+                attr = _HEADER_ATTR.get(key)
+                if attr is not None and attr not in header_seen:
+                    header_seen.add(attr)
+                    slot = attr
+        if slot is None:
+            items.append(line)
+            continue
+        start, end = _split_value(line)
+        if isinstance(slot, str):
+            setattr(report, slot, line[start:end])
+        else:
+            setattr(task, slot[1], line[start:end])
+        items.append((line[:start], slot, line[end:]))
+    report.layout = (len(report.tasks), tuple(items))
+    # 書き戻しても標準の形と同じなら、元の並びは覚えておかなくてよい
+    if _encode_layout(report, report.layout[1]) == _encode_canonical(report):
+        report.layout = None
+    return report
+
+
+def _lines(text: str) -> List[str]:
+    # "\n" だけで区切る（str.splitlines は \x1c や \u2028 でも区切ってしまう）。"\r" は行に残る
+    parts = text.split("\n")
+    lines = [p + "\n" for p in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def decode(text: str) -> Report:
+    """テキスト全体からレポートを読む。encode(decode(text)) == text。"""
+    report = _decode_canonical(text)
+    if report is None:
+        report = decode_lines(_lines(text))
+    return report
+
+
+def decode_bytes(data: bytes) -> Report:
+    return decode(data.decode("utf-8"))
+
+
+def read(fp: IO[str]) -> Report:
+    """テキストモードで開いたファイルから読む（newline="" で開けば改行もそのまま書き戻せる）。"""
+    return decode_lines(fp)
+
+
+def decode_many(store, filenames: Iterable[str]) -> Iterator[Tuple[str, Report]]:
+    """保存先（report_store）の複数のレポートを順に読む。無くなっていたものは飛ばす。"""
+    for filename in filenames:
+        text = store.read(filename)
+        if text is None:
+            continue
+        yield filename, decode(text)
+
+
+def decode_all(texts: Iterable[str]) -> List[Report]:
+    return [decode(text) for text in texts]
@@ -0,0 +1,151 @@
+import io
+import csv
+import json
+import time
+import zlib
+import struct
+import zipfile
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import report_codec
+from report_codec import HEADER_FIELDS, TASK_FIELDS
+
+# =============================
+# 監査用の一括エクスポート（ZIP / CSV / NDJSON）
+# - どれもジェネレータで少しずつ返すので、期間が長くてもメモリ使用量は一定
+# - ZIP は元の .txt をそのまま格納（先頭から順に書き出すので data descriptor 形式）
+# - CSV / NDJSON はタスク1件につき1行に展開（タスクのないレポートは1行）
+# =============================
+
+EXPORT_FORMATS = ("zip", "csv", "ndjson")
+CSV_COLUMNS = ["filename"] + HEADER_FIELDS + ["task_id"] + TASK_FIELDS
+COPY_CHUNK = 64 * 1024
+
+
+# ===== ZIP（ストリーム出力）=====
+# zipfile.ZipFile は書いた全エントリの ZipInfo をメモリに持ち続ける（1件あたり約1KB）ので、
+# ローカルヘッダー + deflate + data descriptor を自前で書き、中央ディレクトリは一時ファイルにためる。
+# 65535件または4GBを超える場合は ZIP64 の終端レコードを付ける。
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_MAX_ENTRIES = 0xFFFF  # これを超える件数は ZIP64 の終端レコードに書く
+_ZIP_UTF8_DESCRIPTOR = 0x0808  # bit3: data descriptor, bit11: ファイル名がUTF-8
+
+
+def _dos_time(ts: float) -> Tuple[int, int]:
+    t = time.localtime(ts)
+    year = max(1980, t.tm_year)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def iter_zip(store, filenames: Iterable[str]) -> Iterator[bytes]:
+    offset = 0
+    count = 0
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as central:
+        for filename in filenames:
+            st = store.stat(filename)
+            body = store.read_bytes(filename) if st is not None else None
+            if body is None:
+                continue
+            name = filename.encode("utf-8")
+            dos_time, dos_date = _dos_time(st.mtime)
+            header = struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, _ZIP_UTF8_DESCRIPTOR, zipfile.ZIP_DEFLATED,
+                                 dos_time, dos_date, 0, 0, 0, len(name), 0) + name
+            yield header
+
+            crc = 0
+            usize = csize = 0
+            comp = zlib.compressobj(6, zlib.DEFLATED, -15)
+            for i in range(0, len(body), COPY_CHUNK):
+                chunk = body[i:i + COPY_CHUNK]
+                crc = zlib.crc32(chunk, crc)
+                usize += len(chunk)
+                data = comp.compress(chunk)
+                if data:
+                    csize += len(data)
+                    yield data
+            data = comp.flush()
+            csize += len(data)
+            if usize > _ZIP64_LIMIT or csize > _ZIP64_LIMIT:
+                raise ValueError(f"report too large for export: {filename}")
+            yield data + struct.pack("<IIII", 0x08074B50, crc, csize, usize)
+
+            # 中央ディレクトリ（オフセットが4GBを超えたら ZIP64 拡張フィールドで持つ）
+            extra = b""
+            local_offset = offset
+            if offset > _ZIP64_LIMIT:
+                extra = struct.pack("<HHQ", 0x0001, 8, offset)
+                local_offset = _ZIP64_LIMIT
+            central.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, 45 if extra else 20,
+                                      _ZIP_UTF8_DESCRIPTOR, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                                      crc, csize, usize, len(name), len(extra), 0, 0, 0,
+                                      (0o100644 << 16), local_offset) + name + extra)
+            offset += len(header) + csize + 16
+            count += 1
+
+        cd_offset = offset
+        cd_size = central.tell()
+        central.seek(0)
+        while True:
+            chunk = central.read(COPY_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+    tail = b""
+    if count > _ZIP64_MAX_ENTRIES or cd_offset > _ZIP64_LIMIT or cd_size > _ZIP64_LIMIT:
+        zip64_eocd = cd_offset + cd_size
+        tail += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+        tail += struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd, 1)
+    tail += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                        min(cd_size, _ZIP64_LIMIT), min(cd_offset, _ZIP64_LIMIT), 0)
+    yield tail
+
+
+def iter_rows(store, filenames: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for filename, report in report_codec.decode_many(store, filenames):
+        base = {"filename": filename, **report.header()}
+        if not report.tasks:
+            yield {**base, "task_id": "", **{k: "" for k in TASK_FIELDS}}
+        for task in report.tasks:
+            yield {**base, "task_id": task.id, **task.fields()}
+
+
+def iter_csv(store, filenames: Iterable[str], batch_rows: int = 200) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_COLUMNS, lineterminator="\r\n")
+    # Excel で文字化けしないよう BOM 付き UTF-8
+    buf.write("\ufeff")
+    writer.writeheader()
+    n = 0
+    for row in iter_rows(store, filenames):
+        writer.writerow(row)
+        n += 1
+        if n % batch_rows == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def iter_ndjson(store, filenames: Iterable[str], batch_rows: int = 200) -> Iterator[bytes]:
+    lines: List[str] = []
+    for row in iter_rows(store, filenames):
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= batch_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def stream(fmt: str, store, filenames: Iterable[str]) -> Tuple[Iterator[bytes], str]:
+    """(本文のジェネレータ, Content-Type) を返す。store は report_store の保存先。"""
+    if fmt == "zip":
+        return iter_zip(store, filenames), "application/zip"
+    if fmt == "csv":
+        return iter_csv(store, filenames), "text/csv; charset=utf-8"
+    if fmt == "ndjson":
+        return iter_ndjson(store, filenames), "application/x-ndjson; charset=utf-8"
+    raise ValueError(f"unknown export format: {fmt}")
@@ -0,0 +1,405 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from report_store import StoredStat
+
+# =============================
+# 監査一覧用のレポートメタデータ索引（SQLite）
+# - 1レポート1行: roomId / cleanerId / totalScore / finishedAt / mtime
+# - 保存時（api_report / receive_report）は upsert で1件ずつ更新
+# - 起動時や保存先（report_store.py）の version が変わったとき（外部・他ワーカーからの追加/削除）は
+#   (mtime, size) だけで差分を取り、変わったレポートだけ読み直す
+# - 一覧は SQL で絞り込み・並べ替え・ページ分割（毎回全ファイルを開かない）
+# - 集計（analytics.py）用に durationSeconds とタスクごとの status も保持し、
+#   追加/削除を subscribe したリスナーへ通知する
+# - 他のワーカーの追加も集計に反映できるよう、行の rowid を追加順の通し番号として使う（changes_since）。
+#   上書き・削除は index_state の removals を1つ進める（集計側は作り直す）
+# - 完了日（finishedDate: 絞り込み・日別集計に使う）はサーバーの現地時刻の日付
+#   （finishedAt は端末の toISOString() = UTC なので、日本時間の朝9時前の完了が前日にならないよう変換する）
+# =============================
+
+SCHEMA_VERSION = "3"
+
+SORT_COLUMNS = {
+    "mtime": "mtime",
+    "roomId": "roomId",
+    "cleanerId": "cleanerId",
+    "totalScore": "totalScoreNum",
+    "finishedAt": "finishedAt",
+    "filename": "filename",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename TEXT PRIMARY KEY,
+    roomId TEXT NOT NULL DEFAULT '',
+    cleanerId TEXT NOT NULL DEFAULT '',
+    totalScore TEXT NOT NULL DEFAULT '',
+    totalScoreNum REAL,
+    finishedAt TEXT NOT NULL DEFAULT '',
+    finishedDate TEXT NOT NULL DEFAULT '',
+    mtime REAL NOT NULL DEFAULT 0,
+    mtime_ns INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    durationSeconds REAL,
+    tasks TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_reports_mtime ON reports(mtime);
+CREATE INDEX IF NOT EXISTS idx_reports_room ON reports(roomId, mtime);
+CREATE INDEX IF NOT EXISTS idx_reports_cleaner ON reports(cleanerId, mtime);
+CREATE INDEX IF NOT EXISTS idx_reports_finished ON reports(finishedDate);
+CREATE INDEX IF NOT EXISTS idx_reports_score ON reports(totalScoreNum);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _score_num(v: str) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _local_date(finished_at: str) -> str:
+    """ISO 8601 の時刻 -> 現地時刻の YYYY-MM-DD。時差の無い時刻はそのまま、読めなければ先頭10文字。"""
+    try:
+        dt = datetime.fromisoformat(finished_at.strip())
+    except ValueError:
+        return finished_at[:10]
+    if dt.tzinfo is not None:
+        dt = dt.astimezone()
+    return dt.strftime("%Y-%m-%d")
+
+
+def _format_mtime(ts: float) -> str:
+    try:
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return ""
+
+
+class ReportIndex:
+    def __init__(self, store, db_path: str, parse_meta: Callable[[str], Dict[str, Any]]):
+        """store: report_store の保存先、parse_meta: レポート本文 -> メタデータ。"""
+        self.store = store
+        self.db_path = db_path
+        self.parse_meta = parse_meta
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._listeners: List[Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]] = []
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._write_lock:
+            conn = self._conn()
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            conn.commit()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        row = conn.execute("SELECT value FROM index_state WHERE key = 'schema_version'").fetchone()
+        if row and row["value"] == SCHEMA_VERSION:
+            return
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(reports)")}
+        if "durationSeconds" not in columns:
+            conn.execute("ALTER TABLE reports ADD COLUMN durationSeconds REAL")
+        if "tasks" not in columns:
+            conn.execute("ALTER TABLE reports ADD COLUMN tasks TEXT NOT NULL DEFAULT '{}'")
+        # 旧形式の行は次回の同期ですべて読み直す
+        conn.execute("UPDATE reports SET mtime_ns = -1")
+        conn.execute("DELETE FROM index_state WHERE key = 'store_version'")
+        self._set_state(conn, "schema_version", SCHEMA_VERSION)
+
+    def subscribe(self, listener: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]):
+        """listener(added_rows, removed_rows) を登録する（置き換えは removed + added で通知）。"""
+        self._listeners.append(listener)
+
+    def _notify(self, added: List[Dict[str, Any]], removed: List[Dict[str, Any]]):
+        if not added and not removed:
+            return
+        for listener in self._listeners:
+            try:
+                listener(added, removed)
+            except Exception:
+                pass
+
+    # ===== 接続（スレッドごと）=====
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _store_version(self) -> str:
+        try:
+            return self.store.version()
+        except Exception:
+            return ""
+
+    def _get_state(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM index_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_state(self, conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO index_state(key, value) VALUES(?, ?)", (key, value))
+
+    # ===== 1件の行データ =====
+    def _row_for(self, filename: str, st: StoredStat) -> Tuple:
+        meta = self.parse_meta(self.store.read(filename) or "")
+        finished = meta.get("finishedAt", "")
+        return (
+            filename,
+            meta.get("roomId", ""),
+            meta.get("cleanerId", ""),
+            meta.get("totalScore", ""),
+            _score_num(meta.get("totalScore", "")),
+            finished,
+            _local_date(finished),
+            st.mtime,
+            st.mtime_ns,
+            st.size,
+            _score_num(meta.get("durationSeconds", "")),
+            json.dumps(meta.get("tasks") or {}, ensure_ascii=False),
+        )
+
+    def _existing(self, conn: sqlite3.Connection, filenames: List[str]) -> List[Dict[str, Any]]:
+        out = []
+        for i in range(0, len(filenames), 500):
+            chunk = filenames[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            out.extend(self._to_record(r) for r in conn.execute(
+                f"SELECT rowid AS seq, * FROM reports WHERE filename IN ({marks})", chunk))
+        return out
+
+    def _bump_removals(self, conn: sqlite3.Connection):
+        conn.execute("INSERT INTO index_state(key, value) VALUES('removals', '1')"
+                     " ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    def _upsert_rows(self, conn: sqlite3.Connection, rows: List[Tuple]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        # 上書き（INSERT OR REPLACE は古い行を消して新しい rowid で入れ直す）も removals に数える
+        removed = self._existing(conn, [r[0] for r in rows])
+        if removed:
+            self._bump_removals(conn)
+        conn.executemany(
+            "INSERT OR REPLACE INTO reports(filename, roomId, cleanerId, totalScore, totalScoreNum,"
+            " finishedAt, finishedDate, mtime, mtime_ns, size, durationSeconds, tasks)"
+            " VALUES(?,?,?,?,?,?,?,?,?,?,?,?)",
+            rows,
+        )
+        # 通知には rowid（seq）を付ける（集計側はこれで取り込み済みかを判断する）
+        added = self._existing(conn, [r[0] for r in rows]) if self._listeners else []
+        added.sort(key=lambda rec: rec["seq"])
+        return added, removed
+
+    # ===== 更新 =====
+    def upsert(self, filename: str):
+        self.upsert_many([filename])
+
+    def upsert_many(self, filenames: List[str]):
+        """保存したレポートをまとめて索引に反映する（1トランザクション）。"""
+        rows = []
+        for fn in filenames:
+            st = self.store.stat(fn)
+            if st is not None:
+                rows.append(self._row_for(fn, st))
+        with self._write_lock:
+            conn = self._conn()
+            was_fresh = self._get_state("store_version") is not None
+            added, removed = self._upsert_rows(conn, rows)
+            # 自分で書いた分で保存先の version が変わっても、全体の再走査はしない
+            if was_fresh:
+                self._set_state(conn, "store_version", self._store_version())
+            conn.commit()
+        self._notify(added, removed)
+
+    def remove(self, filename: str):
+        with self._write_lock:
+            conn = self._conn()
+            removed = self._existing(conn, [filename])
+            conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+            if removed:
+                self._bump_removals(conn)
+            conn.commit()
+        self._notify([], removed)
+
+    def ensure_fresh(self) -> bool:
+        """保存先の version が前回の同期から変わっていれば差分同期する。同期したら True。"""
+        current = self._store_version()
+        if self._get_state("store_version") == current:
+            return False
+        self.sync()
+        return True
+
+    def sync(self):
+        version = self._store_version()
+        on_disk: Dict[str, StoredStat] = dict(self.store.scan())
+
+        known = {r["filename"]: (r["mtime_ns"], r["size"])
+                 for r in self._conn().execute("SELECT filename, mtime_ns, size FROM reports")}
+        changed = [fn for fn, st in on_disk.items() if known.get(fn) != (st.mtime_ns, st.size)]
+        removed = [fn for fn in known if fn not in on_disk]
+
+        all_added: List[Dict[str, Any]] = []
+        all_removed: List[Dict[str, Any]] = []
+        with self._write_lock:
+            conn = self._conn()
+            for i in range(0, len(changed), 500):
+                added, replaced = self._upsert_rows(conn, [self._row_for(fn, on_disk[fn]) for fn in changed[i:i + 500]])
+                all_added.extend(added)
+                all_removed.extend(replaced)
+            if self._listeners:
+                all_removed.extend(self._existing(conn, removed))
+            conn.executemany("DELETE FROM reports WHERE filename = ?", [(fn,) for fn in removed])
+            if removed:
+                self._bump_removals(conn)
+            self._set_state(conn, "store_version", version)
+            conn.commit()
+        self._notify(all_added, all_removed)
+
+    # ===== 検索 =====
+    @staticmethod
+    def _where(room: str = "", cleaner: str = "", date_from: str = "", date_to: str = "",
+               min_score: Optional[float] = None, max_score: Optional[float] = None) -> Tuple[str, List[Any]]:
+        where, params = [], []
+        if room:
+            where.append("roomId = ?")
+            params.append(room)
+        if cleaner:
+            where.append("cleanerId = ?")
+            params.append(cleaner)
+        if date_from:
+            where.append("finishedDate >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("finishedDate <= ?")
+            params.append(date_to)
+        if min_score is not None:
+            where.append("totalScoreNum >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            where.append("totalScoreNum <= ?")
+            params.append(max_score)
+        return ((" WHERE " + " AND ".join(where)) if where else ""), params
+
+    def query(self, room: str = "", cleaner: str = "", date_from: str = "", date_to: str = "",
+              min_score: Optional[float] = None, max_score: Optional[float] = None,
+              sort: str = "mtime", order: str = "desc", page: int = 1, per_page: int = 50) -> Dict[str, Any]:
+        where_sql, params = self._where(room, cleaner, date_from, date_to, min_score, max_score)
+
+        column = SORT_COLUMNS.get(sort, "mtime")
+        direction = "ASC" if order == "asc" else "DESC"
+        per_page = max(1, min(int(per_page), 500))
+        page = max(1, int(page))
+
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM reports{where_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM reports{where_sql} ORDER BY {column} {direction}, filename {direction} LIMIT ? OFFSET ?",
+            params + [per_page, (page - 1) * per_page],
+        ).fetchall()
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": max(1, -(-total // per_page)),
+            "reports": [self._to_dict(r) for r in rows],
+        }
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM reports WHERE filename = ?", (filename,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM reports").fetchone()[0]
+
+    def iter_filenames(self, batch_size: int = 1000, **filters) -> Iterator[str]:
+        """条件に合うファイル名を受信日時の古い順に返す（エクスポート用）。
+        全件をリストにしないよう、(mtime, filename) のキーで batch_size 件ずつ読む。"""
+        where_sql, params = self._where(**filters)
+        joiner = " AND " if where_sql else " WHERE "
+        last: Optional[Tuple[float, str]] = None
+        conn = self._conn()
+        while True:
+            sql, args = f"SELECT filename, mtime FROM reports{where_sql}", list(params)
+            if last is not None:
+                sql += joiner + "(mtime > ? OR (mtime = ? AND filename > ?))"
+                args += [last[0], last[0], last[1]]
+            rows = conn.execute(sql + " ORDER BY mtime, filename LIMIT ?", args + [batch_size]).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield r["filename"]
+            last = (rows[-1]["mtime"], rows[-1]["filename"])
+
+    def high_water(self) -> Tuple[int, int]:
+        """(最後に追加された行の rowid, 上書き・削除の回数)。集計の取り込み位置として使う。"""
+        conn = self._conn()
+        row = conn.execute("SELECT COALESCE(MAX(rowid), 0) AS hwm FROM reports").fetchone()
+        return row["hwm"], int(self._get_state("removals") or 0)
+
+    def changes_since(self, after: int, removals: int, batch_size: int = 1000) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """rowid が after より後の行（他のワーカーが追加したものを含む）と、新しい取り込み位置。
+        removals（high_water の2つ目）から上書き・削除があった場合は None（作り直しが必要）。"""
+        if int(self._get_state("removals") or 0) != removals:
+            return None
+        records = []
+        cur = self._conn().execute("SELECT rowid AS seq, * FROM reports WHERE rowid > ? ORDER BY rowid", (after,))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for r in rows:
+                records.append(self._to_record(r))
+                after = r["seq"]
+        return records, after
+
+    def iter_records(self, batch_size: int = 1000):
+        """全行を集計用の辞書として返す（起動時の集計の再構築用）。"""
+        cur = self._conn().execute("SELECT rowid AS seq, * FROM reports")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for r in rows:
+                yield self._to_record(r)
+
+    @staticmethod
+    def _to_record(row) -> Dict[str, Any]:
+        try:
+            tasks = json.loads(row["tasks"] or "{}")
+        except ValueError:
+            tasks = {}
+        return {
+            "seq": row["seq"],
+            "filename": row["filename"],
+            "roomId": row["roomId"],
+            "cleanerId": row["cleanerId"],
+            "totalScore": row["totalScoreNum"],
+            "durationSeconds": row["durationSeconds"],
+            "day": row["finishedDate"] or _format_mtime(row["mtime"])[:10],
+            "tasks": tasks,
+        }
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "filename": row["filename"],
+            "roomId": row["roomId"],
+            "cleanerId": row["cleanerId"],
+            "totalScore": row["totalScore"],
+            "finishedAt": row["finishedAt"],
+            "mtime": _format_mtime(row["mtime"]),
+            "mtime_ts": row["mtime"],
+        }
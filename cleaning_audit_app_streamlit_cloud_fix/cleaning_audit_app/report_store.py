@@ -0,0 +1,462 @@
+import os
+import time
+import hashlib
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+# =============================
+# レポートの保存先（REPORT_STORE で切り替え）
+# - fs（既定）: reports/YYYY/MM/DD/<filename> に日付で分けて保存
+#   一時ファイルに書いてから os.replace するので、読み手が書きかけのファイルを見ることはない
+#   旧形式（reports/ 直下）のファイルもそのまま読める（tools/migrate_reports.py で日付別に移せる）
+# - create / create_many は「まだ無ければ保存」を排他的に行う（同じ clientReportId の同時再送で二重に書かない）
+#   fs は一時ファイルを os.link で置く（既にあれば FileExistsError）、sqlite は INSERT OR IGNORE
+# - sqlite: 1つの SQLite（WALモード）に本文ごと保存。gunicorn の複数ワーカーから同時に書き込み・一覧できる
+# どちらも filename で読み書きし、索引（report_index.py）は scan() / version() で差分を取る
+# =============================
+
+STORE_KINDS = ("fs", "sqlite")
+
+
+class StoredStat(NamedTuple):
+    mtime: float
+    mtime_ns: int
+    size: int
+
+
+def valid_filename(filename: str) -> bool:
+    # 保存先の外を指す名前（パス区切り・隠しファイル）は扱わない
+    return (bool(filename) and "/" not in filename and "\\" not in filename
+            and not filename.startswith(".") and filename.endswith(".txt"))
+
+
+class FileReportStore:
+    kind = "fs"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # filename -> 保存先のディレクトリ（root からの相対パス、旧形式は ""）
+        self._locations: Dict[str, str] = {}
+        # ディレクトリごとの、前回読んだ時点の更新時刻とファイル名
+        self._dir_mtimes_seen: Dict[str, int] = {}
+        self._dir_files: Dict[str, Set[str]] = {}
+
+    # ===== 場所 =====
+    @staticmethod
+    def shard_for(ts: float) -> str:
+        return time.strftime("%Y/%m/%d", time.localtime(ts))
+
+    def _shard_dirs(self) -> Iterator[str]:
+        # root/YYYY/MM/DD（数字のディレクトリだけ）
+        for depth_1 in _digit_dirs(self.root):
+            for depth_2 in _digit_dirs(os.path.join(self.root, depth_1)):
+                for depth_3 in _digit_dirs(os.path.join(self.root, depth_1, depth_2)):
+                    yield f"{depth_1}/{depth_2}/{depth_3}"
+
+    def _dir_mtimes(self) -> Dict[str, int]:
+        out = {}
+        for rel in ["", *self._shard_dirs()]:
+            try:
+                out[rel] = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+            except OSError:
+                continue
+        return out
+
+    def version(self) -> str:
+        """root と日付ディレクトリの更新時刻から作る値。外部からの追加・削除があれば変わる。"""
+        text = "|".join(f"{rel}:{m}" for rel, m in sorted(self._dir_mtimes().items()))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    def _scan_dir(self, rel: str) -> Dict[str, StoredStat]:
+        found: Dict[str, StoredStat] = {}
+        try:
+            with os.scandir(os.path.join(self.root, rel)) as it:
+                for entry in it:
+                    if valid_filename(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        found[entry.name] = StoredStat(st.st_mtime, st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return found
+
+    def _apply_dir(self, rel: str, mtime_ns: Optional[int], files: Dict[str, StoredStat]):
+        # self._lock を持って呼ぶ
+        for fn in self._dir_files.pop(rel, set()) - files.keys():
+            if self._locations.get(fn) == rel:
+                del self._locations[fn]
+        if mtime_ns is None:
+            self._dir_mtimes_seen.pop(rel, None)
+            return
+        self._dir_files[rel] = set(files)
+        self._dir_mtimes_seen[rel] = mtime_ns
+        for fn in files:
+            self._locations[fn] = rel
+
+    def _refresh(self) -> bool:
+        """更新時刻が変わったディレクトリだけ読み直す（他のワーカー・外部からの追加/削除）。"""
+        current = self._dir_mtimes()
+        with self._lock:
+            seen = dict(self._dir_mtimes_seen)
+        changed = [rel for rel, m in current.items() if seen.get(rel) != m]
+        gone = [rel for rel in seen if rel not in current]
+        if not changed and not gone:
+            return False
+        scanned = {rel: self._scan_dir(rel) for rel in changed}
+        with self._lock:
+            for rel in gone:
+                self._apply_dir(rel, None, {})
+            for rel, files in scanned.items():
+                self._apply_dir(rel, current[rel], files)
+        return True
+
+    def _cached_path(self, filename: str) -> Optional[str]:
+        rel = self._locations.get(filename)
+        if rel is not None:
+            p = os.path.join(self.root, rel, filename)
+            if os.path.isfile(p):
+                return p
+        p = os.path.join(self.root, filename)
+        return p if os.path.isfile(p) else None
+
+    def _locate(self, filename: str) -> Optional[str]:
+        """書き込み先を決める用: 既知の場所に無ければ root 直下と全ての日付ディレクトリを確かめる。
+        他のワーカーが古い日付のディレクトリに書いた同じ名前を見落として、今日のディレクトリに2つ目を作らない。"""
+        p = self._cached_path(filename)
+        if p is not None:
+            return p
+        for rel in self._shard_dirs():
+            p = os.path.join(self.root, rel, filename)
+            if os.path.isfile(p):
+                with self._lock:
+                    self._locations[filename] = rel
+                return p
+        return None
+
+    def path(self, filename: str) -> Optional[str]:
+        """保存されていればファイルのパス、無ければ None。"""
+        if not valid_filename(filename):
+            return None
+        p = self._cached_path(filename)
+        if p is None and self._refresh():
+            p = self._cached_path(filename)
+        return p
+
+    # ===== 読み込み =====
+    def stat(self, filename: str) -> Optional[StoredStat]:
+        p = self.path(filename)
+        if p is None:
+            return None
+        try:
+            st = os.stat(p)
+        except OSError:
+            return None
+        return StoredStat(st.st_mtime, st.st_mtime_ns, st.st_size)
+
+    def exists(self, filename: str) -> bool:
+        return self.path(filename) is not None
+
+    def read_bytes(self, filename: str) -> Optional[bytes]:
+        p = self.path(filename)
+        if p is None:
+            return None
+        try:
+            with open(p, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def read(self, filename: str) -> Optional[str]:
+        data = self.read_bytes(filename)
+        return None if data is None else data.decode("utf-8", errors="replace")
+
+    def scan(self) -> Iterator[Tuple[str, StoredStat]]:
+        """全レポートを (filename, StoredStat) で返す（索引の同期用）。同じ名前が2か所にあれば新しい方。"""
+        current = self._dir_mtimes()
+        found: Dict[str, StoredStat] = {}
+        with self._lock:
+            for rel in set(self._dir_mtimes_seen) - current.keys():
+                self._apply_dir(rel, None, {})
+        for rel, mtime_ns in current.items():
+            files = self._scan_dir(rel)
+            with self._lock:
+                self._apply_dir(rel, mtime_ns, files)
+            for fn, st in files.items():
+                prev = found.get(fn)
+                if prev is None or st.mtime_ns >= prev.mtime_ns:
+                    found[fn] = st
+        return iter(found.items())
+
+    # ===== 書き込み =====
+    def write(self, filename: str, text: str, mtime: Optional[float] = None):
+        """一時ファイルに書いてから置き換える。既にあれば同じ場所、無ければ日付のディレクトリに置く。"""
+        if not valid_filename(filename):
+            raise ValueError(f"invalid report filename: {filename!r}")
+        # 全体を読み直さず、既知の場所 → 各ディレクトリにその名前があるかだけを見る
+        current = self._locate(filename)
+        if current is not None:
+            directory = os.path.dirname(current)
+        else:
+            directory = os.path.join(self.root, self.shard_for(time.time() if mtime is None else mtime))
+            os.makedirs(directory, exist_ok=True)
+        rel = os.path.relpath(directory, self.root)
+        rel = "" if rel == "." else rel.replace(os.sep, "/")
+        before = os.stat(directory).st_mtime_ns
+        tmp = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            if mtime is not None:
+                os.utime(tmp, (mtime, mtime))
+            os.replace(tmp, os.path.join(directory, filename))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        after = os.stat(directory).st_mtime_ns
+        with self._lock:
+            self._locations[filename] = rel
+            self._dir_files.setdefault(rel, set()).add(filename)
+            # 自分の書き込みでディレクトリの更新時刻が変わっても読み直さない（その間に他から変更が無かった場合）
+            if self._dir_mtimes_seen.get(rel) == before:
+                self._dir_mtimes_seen[rel] = after
+
+    def write_many(self, items: Iterable[Tuple]) -> int:
+        """items: (filename, text) または (filename, text, mtime)。"""
+        n = 0
+        for item in items:
+            self.write(*item)
+            n += 1
+        return n
+
+    def create(self, filename: str, text: str, mtime: Optional[float] = None) -> bool:
+        """まだ無ければ保存して True、既にあれば（他のワーカーが先に書いた場合も）何もせず False。"""
+        if not valid_filename(filename):
+            raise ValueError(f"invalid report filename: {filename!r}")
+        if self._locate(filename) is not None:
+            return False
+        rel = self.shard_for(time.time() if mtime is None else mtime)
+        directory = os.path.join(self.root, rel)
+        os.makedirs(directory, exist_ok=True)
+        before = os.stat(directory).st_mtime_ns
+        tmp = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            if mtime is not None:
+                os.utime(tmp, (mtime, mtime))
+            # link は置き換えずに失敗するので、書き終えた内容が1回だけ現れる
+            os.link(tmp, os.path.join(directory, filename))
+        except FileExistsError:
+            return False
+        finally:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        after = os.stat(directory).st_mtime_ns
+        with self._lock:
+            self._locations[filename] = rel
+            self._dir_files.setdefault(rel, set()).add(filename)
+            if self._dir_mtimes_seen.get(rel) == before:
+                self._dir_mtimes_seen[rel] = after
+        return True
+
+    def create_many(self, items: Iterable[Tuple]) -> List[str]:
+        """items: (filename, text) または (filename, text, mtime)。新しく保存したファイル名を返す。"""
+        return [item[0] for item in items if self.create(*item)]
+
+    def delete(self, filename: str) -> bool:
+        p = self.path(filename)
+        if p is None:
+            return False
+        try:
+            os.remove(p)
+        except OSError:
+            return False
+        with self._lock:
+            rel = self._locations.pop(filename, None)
+            if rel is not None:
+                self._dir_files.get(rel, set()).discard(filename)
+        return True
+
+    def close(self):
+        pass
+
+
+def _digit_dirs(path: str) -> List[str]:
+    try:
+        with os.scandir(path) as it:
+            return sorted(e.name for e in it if e.name.isdigit() and e.is_dir())
+    except OSError:
+        return []
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename TEXT PRIMARY KEY,
+    content  BLOB NOT NULL,
+    mtime    REAL NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS store_state (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteReportStore:
+    kind = "sqlite"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SQLITE_SCHEMA)
+
+    # ===== 接続（スレッドごと）=====
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: 書き込みは BEGIN IMMEDIATE で明示的に始める（ワーカー間のロック待ちを先に取る）
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self) -> str:
+        """書き込みのたびに増える番号（他のワーカー・プロセスの書き込みも含む）。"""
+        row = self._conn().execute("SELECT value FROM store_state WHERE key = 'generation'").fetchone()
+        return str(row["value"] if row else 0)
+
+    # ===== 読み込み =====
+    def path(self, filename: str) -> Optional[str]:
+        return None
+
+    def stat(self, filename: str) -> Optional[StoredStat]:
+        row = self._conn().execute(
+            "SELECT mtime, mtime_ns, size FROM reports WHERE filename = ?", (filename,)).fetchone()
+        return StoredStat(row["mtime"], row["mtime_ns"], row["size"]) if row else None
+
+    def exists(self, filename: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM reports WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def read_bytes(self, filename: str) -> Optional[bytes]:
+        row = self._conn().execute("SELECT content FROM reports WHERE filename = ?", (filename,)).fetchone()
+        return bytes(row["content"]) if row else None
+
+    def read(self, filename: str) -> Optional[str]:
+        data = self.read_bytes(filename)
+        return None if data is None else data.decode("utf-8", errors="replace")
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Tuple[str, StoredStat]]:
+        cur = self._conn().execute("SELECT filename, mtime, mtime_ns, size FROM reports")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for r in rows:
+                yield r["filename"], StoredStat(r["mtime"], r["mtime_ns"], r["size"])
+
+    # ===== 書き込み =====
+    def write(self, filename: str, text: str, mtime: Optional[float] = None):
+        self._write_rows([(filename, text, mtime)])
+
+    def write_many(self, items: Iterable[Tuple]) -> int:
+        """items: (filename, text) または (filename, text, mtime)。1トランザクションで書く。"""
+        return self._write_rows([(item[0], item[1], item[2] if len(item) > 2 else None) for item in items])
+
+    def create(self, filename: str, text: str, mtime: Optional[float] = None) -> bool:
+        return bool(self.create_many([(filename, text, mtime)]))
+
+    def create_many(self, items: Iterable[Tuple]) -> List[str]:
+        """まだ無いものだけ保存し（INSERT OR IGNORE, 1トランザクション）、新しく保存したファイル名を返す。"""
+        rows = self._rows([(item[0], item[1], item[2] if len(item) > 2 else None) for item in items])
+        if not rows:
+            return []
+        created = []
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                if conn.execute("INSERT OR IGNORE INTO reports(filename, content, mtime, mtime_ns, size)"
+                                " VALUES(?,?,?,?,?)", row).rowcount:
+                    created.append(row[0])
+            if created:
+                self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return created
+
+    @staticmethod
+    def _rows(items: List[Tuple[str, str, Optional[float]]]) -> List[Tuple]:
+        rows = []
+        for filename, text, mtime in items:
+            if not valid_filename(filename):
+                raise ValueError(f"invalid report filename: {filename!r}")
+            data = text.encode("utf-8")
+            mtime_ns = time.time_ns() if mtime is None else int(mtime * 1e9)
+            rows.append((filename, data, mtime_ns / 1e9, mtime_ns, len(data)))
+        return rows
+
+    def _write_rows(self, items: List[Tuple[str, str, Optional[float]]]) -> int:
+        rows = self._rows(items)
+        if not rows:
+            return 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reports(filename, content, mtime, mtime_ns, size) VALUES(?,?,?,?,?)", rows)
+            self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def delete(self, filename: str) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute("DELETE FROM reports WHERE filename = ?", (filename,)).rowcount
+            if deleted:
+                self._bump(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return bool(deleted)
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection):
+        conn.execute("INSERT INTO store_state(key, value) VALUES('generation', 1)"
+                     " ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_store(kind: str, reports_dir: str, db_path: str):
+    """REPORT_STORE の値から保存先を作る（fs: reports_dir, sqlite: db_path）。"""
+    kind = (kind or "fs").strip().lower()
+    if kind == "fs":
+        return FileReportStore(reports_dir)
+    if kind == "sqlite":
+        return SQLiteReportStore(db_path)
+    raise ValueError(f"unknown REPORT_STORE: {kind!r} (expected one of {', '.join(STORE_KINDS)})")
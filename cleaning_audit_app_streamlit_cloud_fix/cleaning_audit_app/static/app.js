@@ -15,9 +15,10 @@ const OK_CLASSES = new Set(["perfect", "good"]);
 const FIX_CLASS = "bad";
 const STORAGE_KEY = "ai_clean_nav_v2";
 
-// モデル設定
-const MODEL_URL = "/static/model/model.json";
-const METADATA_URL = "/static/model/metadata.json";
+// モデル設定（サーバーが内容ハッシュ付きURLを渡す。無ければ従来のパス）
+const MODEL_ASSETS = window.MODEL_ASSETS || {};
+const MODEL_URL = MODEL_ASSETS.model_url || "/static/model/model.json";
+const METADATA_URL = MODEL_ASSETS.metadata_url || "/static/model/metadata.json";
 
 // ===== 状態管理 =====
 let model = null;
@@ -52,6 +53,11 @@ window.addEventListener("DOMContentLoaded", async () => {
   document.getElementById("resetBtn").addEventListener("click", resetAll);
   document.getElementById("finishBtn").addEventListener("click", finishJob);
 
+  // オフライン対応: Service Worker（画面とモデルの事前キャッシュ）と送信待ちレポートの再送
+  registerServiceWorker();
+  window.addEventListener("online", flushReportQueue);
+  flushReportQueue();
+
   await loadModelSafely();
 });
 
@@ -308,8 +314,16 @@ async function runPrediction(taskId, imgEl) {
 }
 
 // ===== 業務完了・レポート =====
+// レポートはまず端末内の送信キュー（IndexedDB）に保存し、そこから送る。
+// 電波が無くても失われず、戻ったとき（online / Background Sync / 次回起動時）に自動で送信される。
 async function finishJob() {
+  // 完了ボタンを押し直しても同じレポートとして扱われるよう、IDは状態に保存しておく
+  if (!state.clientReportId) {
+    state.clientReportId = ReportQueue.newId();
+    saveState();
+  }
   const report = {
+    clientReportId: state.clientReportId,
     roomId: "101",
     cleanerId: "USER_01",
     startedAt: new Date(state.startTime).toISOString(),
@@ -324,36 +338,97 @@ async function finishJob() {
   modal.setAttribute("aria-hidden", "false");
   modal.style.display = "flex";
   
-  // ===== サーバーへ送信しつつ、テキストファイルを生成 =====
   try {
-    const resp = await fetch("/api/report", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(report),
-    });
-    const result = await resp.json();
+    await ReportQueue.enqueue(report);
+  } catch (e) {
+    // IndexedDB が使えない（プライベートモード等）: 直接送信し、失敗したら端末の状態は残す
+    await sendReportDirectly(report);
+    return;
+  }
+  // キューに入った時点で端末内に残るので、業務の状態はクリアしてよい
+  localStorage.removeItem(STORAGE_KEY);
 
-    // 送信結果 + ダウンロードURLをレポート欄に追記
-    report._server = result;
+  const { results, pending } = await ReportQueue.flush();
+  const mine = results.find(r => r.clientReportId === report.clientReportId);
+  if (mine && mine.ok) {
+    showReportResult(report, mine);
+  } else if (mine) {
+    // サーバーが受け付けなかった（再送しても通らないので、キューからは外れている）
+    report._server = mine;
     document.getElementById("reportData").textContent = JSON.stringify(report, null, 2);
+    document.getElementById("reportStatus").textContent =
+      `サーバーがレポートを受け付けませんでした（${mine.error || "不明なエラー"}）。管理者に連絡してください。`;
+  } else {
+    document.getElementById("reportStatus").textContent =
+      "オフラインのため端末に保存しました。電波が戻ると自動で送信します。";
+    ReportQueue.requestSync();
+  }
+  renderQueueStatus(pending);
+}
 
-    // ダウンロードリンクを追加（既にあれば作り直し）
-    let dl = document.getElementById("reportDownloadLink");
-    if (!dl) {
-      dl = document.createElement("a");
-      dl.id = "reportDownloadLink";
-      dl.className = "btn btn--primary";
-      dl.style.marginTop = "12px";
-      dl.textContent = "テキストレポートをダウンロード";
-      document.querySelector("#reportModal .modal__body").appendChild(dl);
-    }
-    dl.href = result.download_url;
+async function sendReportDirectly(report) {
+  try {
+    const resp = await fetch("/api/reports/batch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ reports: [report] }),
+    });
+    const result = ((await resp.json()).results || [])[0] || { ok: false };
+    if (!result.ok) throw new Error(result.error || `HTTP ${resp.status}`);
+    showReportResult(report, result);
+    localStorage.removeItem(STORAGE_KEY);
   } catch (e) {
     report._server = { ok:false, error: String(e) };
     document.getElementById("reportData").textContent = JSON.stringify(report, null, 2);
+    document.getElementById("reportStatus").textContent =
+      "送信できませんでした。電波のある場所でもう一度「業務完了」を押してください。";
   }
-  // ローカルデータクリア
-  localStorage.removeItem(STORAGE_KEY);
+}
+
+function showReportResult(report, result) {
+  document.getElementById("reportStatus").textContent = "以下のデータが管理サーバーへ送信されました。";
+
+  // 送信結果 + ダウンロードURLをレポート欄に追記
+  report._server = result;
+  document.getElementById("reportData").textContent = JSON.stringify(report, null, 2);
+
+  // ダウンロードリンクを追加（既にあれば作り直し）
+  let dl = document.getElementById("reportDownloadLink");
+  if (!dl) {
+    dl = document.createElement("a");
+    dl.id = "reportDownloadLink";
+    dl.className = "btn btn--primary";
+    dl.style.marginTop = "12px";
+    dl.textContent = "テキストレポートをダウンロード";
+    document.querySelector("#reportModal .modal__body").appendChild(dl);
+  }
+  dl.href = result.download_url;
+}
+
+async function flushReportQueue() {
+  try {
+    const { rejected, pending } = await ReportQueue.flush();
+    if (rejected.length) console.warn("Reports rejected by server", rejected);
+    renderQueueStatus(pending);
+    if (pending) ReportQueue.requestSync();
+  } catch (e) {
+    console.error("Report queue error", e);
+  }
+}
+
+function renderQueueStatus(pending) {
+  const el = document.getElementById("queueStatus");
+  el.hidden = !pending;
+  el.textContent = pending ? `📡 送信待ちのレポート: ${pending}件（電波が戻ると自動で送信します）` : "";
+}
+
+function registerServiceWorker() {
+  if (!("serviceWorker" in navigator)) return;
+  navigator.serviceWorker.register("/sw.js").catch(e => console.error("Service Worker Error", e));
+  // Background Sync で送信されたときの通知
+  navigator.serviceWorker.addEventListener("message", (event) => {
+    if (event.data && event.data.type === "report-queue-flushed") renderQueueStatus(event.data.pending);
+  });
 }
 
 // ===== ユーティリティ =====
@@ -0,0 +1,104 @@
+// ===== レポート送信キュー（IndexedDB）=====
+// 業務完了時のレポートはまず端末内（IndexedDB）に保存し、電波が戻ったら /api/reports/batch にまとめて送る。
+// - 画面（app.js）と Service Worker（sw.js の Background Sync）の両方から使う
+// - 各レポートの clientReportId でサーバー側が重複を除くので、二重に送っても1件として保存される
+// - サーバーが1件ごとの結果で ok:false を返したもの（不正な clientReportId など）は再送しても通らないので、
+//   キューから外して rejected として返す（送信待ちの件数にもオフライン表示にも含めない）
+(function (global) {
+  const DB_NAME = "ai_clean_nav";
+  const STORE = "reportQueue";
+  const ENDPOINT = "/api/reports/batch";
+  const BATCH_SIZE = 20;
+  const SYNC_TAG = "report-queue";
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, 1);
+      req.onupgradeneeded = () => req.result.createObjectStore(STORE, { keyPath: "clientReportId" });
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  // fn(store) が返した IDBRequest の結果を、トランザクション完了後に返す
+  async function withStore(mode, fn) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(STORE, mode);
+      const req = fn(tx.objectStore(STORE));
+      tx.oncomplete = () => { db.close(); resolve(req ? req.result : undefined); };
+      tx.onerror = tx.onabort = () => { db.close(); reject(tx.error); };
+    });
+  }
+
+  function newId() {
+    if (global.crypto && global.crypto.randomUUID) return global.crypto.randomUUID();
+    return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2, 12);
+  }
+
+  function enqueue(report) {
+    return withStore("readwrite", (store) =>
+      store.put({ clientReportId: report.clientReportId, report, queuedAt: Date.now() }));
+  }
+
+  function count() {
+    return withStore("readonly", (store) => store.count());
+  }
+
+  function remove(ids) {
+    return withStore("readwrite", (store) => { ids.forEach((id) => store.delete(id)); return null; });
+  }
+
+  async function pending() {
+    const items = (await withStore("readonly", (store) => store.getAll())) || [];
+    return items.sort((a, b) => a.queuedAt - b.queuedAt);
+  }
+
+  // 送信中にもう一度呼ばれたら同じ Promise を返す（同じタブ内での二重送信を防ぐ）
+  let flushing = null;
+
+  function flush() {
+    if (!flushing) flushing = doFlush().finally(() => { flushing = null; });
+    return flushing;
+  }
+
+  async function doFlush() {
+    const results = [];
+    const rejected = [];
+    const items = await pending();
+    for (let i = 0; i < items.length; i += BATCH_SIZE) {
+      const chunk = items.slice(i, i + BATCH_SIZE);
+      let body;
+      try {
+        const resp = await fetch(ENDPOINT, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ reports: chunk.map((item) => item.report) }),
+        });
+        if (!resp.ok) break;
+        body = await resp.json();
+      } catch (e) {
+        break; // オフライン: 残りは次の機会に送る
+      }
+      const chunkResults = body.results || [];
+      const failed = chunkResults.filter((r) => !r.ok);
+      await remove(chunkResults.map((r) => r.clientReportId));
+      results.push(...chunkResults);
+      rejected.push(...failed);
+    }
+    return { results, rejected, pending: await count() };
+  }
+
+  // Background Sync に対応していれば、タブを閉じても電波が戻ったときに Service Worker が送る
+  async function requestSync() {
+    try {
+      if (!global.navigator || !navigator.serviceWorker) return;
+      const reg = await navigator.serviceWorker.ready;
+      if (reg.sync) await reg.sync.register(SYNC_TAG);
+    } catch (e) {
+      // 非対応・拒否時は online イベントと次回起動時の送信に任せる
+    }
+  }
+
+  global.ReportQueue = { SYNC_TAG, newId, enqueue, count, flush, requestSync };
+})(self);
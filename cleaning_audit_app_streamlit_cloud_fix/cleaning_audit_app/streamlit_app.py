@@ -3,11 +3,15 @@ import time
 import hashlib
 import uuid
 from datetime import datetime, timezone
+from types import SimpleNamespace
 from typing import Dict, Any, List, Optional
 
 import streamlit as st
 import streamlit.components.v1 as components
 
+import metrics
+import report_codec
+
 # =============================
 # 目的:
 # - 既存Flask版（static/app.js）の機能を「縮小しすぎない」範囲でStreamlitに移植
@@ -30,6 +34,13 @@ FIX_CLASS = "bad"
 
 st.set_page_config(page_title="清掃・監査 統合（Streamlit）", page_icon="🧹", layout="wide")
 
+# ===== 部分再描画（st.fragment）=====
+# タスクごとのパネル・レポート欄を fragment にして、操作したパネルだけを再実行する。
+# 古いStreamlitでは experimental_fragment、それも無ければ通常の関数（全体が再実行される）。
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+# Streamlit 1.52 以降は download_button の data に関数を渡せる（押されたときに内容を作る）
+DEFERRED_DOWNLOAD = tuple(int(x) for x in st.__version__.split(".")[:2] if x.isdigit()) >= (1, 52)
+
 # ===== 管理者パスワード（直書き禁止）=====
 # Streamlit Community Cloud では Secrets に ADMIN_PASSWORD を設定してください。
 # ローカル開発時に限り、未設定なら暫定で 1111 を許可（UIには表示しない）
@@ -47,31 +58,185 @@ def get_admin_password() -> Optional[str]:
 ADMIN_PASSWORD = get_admin_password()
 
 # ===== 判定コンポーネント（tm_classifier_component/index.html）=====
-_tm = components.declare_component("tm_classifier", path=os.path.join(os.path.dirname(__file__), "tm_classifier_component"))
+_TM_COMPONENT_DIR = os.path.join(os.path.dirname(__file__), "tm_classifier_component")
+_tm = components.declare_component("tm_classifier", path=_TM_COMPONENT_DIR)
+
+@st.cache_resource
+def component_model_assets() -> Dict[str, str]:
+    # モデルは内容ハッシュ付きファイルとしてコンポーネント配下に1回だけ書き出す（HTMLには埋め込まない）
+    import model_assets
+    m = model_assets.build(os.path.join(_TM_COMPONENT_DIR, "assets"))
+    return {
+        "version": m["version"],
+        "model_url": f"assets/{m['model']}",
+        "metadata_url": f"assets/{m['metadata']}",
+    }
 
-def classify_image(image_bytes: bytes, key: str) -> Optional[List[Dict[str, Any]]]:
-    """Browser-side TFJS component classification.
-    Streamlit Cloud安定動作のため、入力はPNG DataURLに正規化して渡す。
-    """
-    if not image_bytes:
+# ===== サーバー側推論（tm_engine）=====
+# NumPyが使える環境ではブラウザに画像を送らずサーバーで判定する（タイムアウト/CDNブロック対策）。
+# 使えない場合は従来どおり tm_classifier コンポーネントで判定する。
+try:
+    import tm_engine
+except ImportError:
+    tm_engine = None
+
+# 判定結果はプロセス共有のキャッシュに保存（画像のSHA-256 + モデルのバージョン）。
+# 再実行・再判定・別セッションでも同じ画像は推論し直さない。
+from prediction_cache import get_cache
+
+def classify_image_server(image_bytes: bytes) -> Optional[List[Dict[str, Any]]]:
+    if tm_engine is None:
         return None
+    try:
+        return tm_engine.get_model().predict_bytes(image_bytes)
+    except Exception:
+        return {"error": "invalid_image"}
 
-    # 拡張子/実体の違いに強くするため、PILで開ける場合はPNGへ正規化
-    data_url = None
+def classify_burst_server(source) -> Optional[Dict[str, Any]]:
+    if tm_engine is None:
+        return None
+    import multi_frame
+    import preprocess
     try:
-        from PIL import Image
-        import io, base64
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        data_url = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+        return multi_frame.classify_source(tm_engine.get_model(), source)
+    except preprocess.VideoUnsupported:
+        return {"error": "video_unsupported"}
     except Exception:
-        # 最終フォールバック（元バイトをそのままjpeg扱いにしない）
         return {"error": "invalid_image"}
 
-    result = _tm(image_data_url=data_url, key=key)
+def classify_burst(source, key: str, digest: str,
+                   media: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """連写（画像の並び）・複数フレーム画像・短い動画の判定（multi_frame.py）。
+    返り値: {predictions, frames_processed, frames_total, stopped_early} または {"error": ...}"""
+    import multi_frame
+    cache = get_cache()
+    cache_key = f"burst:{digest}"
+    result = cache.get(cache_key)
+    if result is None:
+        version = cache.version
+        result = classify_burst_server(source)
+        if result is None:
+            version = None
+            # ブラウザで判定: フレームごとの縮小PNGを渡し、コンポーネント側で安定したら打ち切る
+            import preprocess
+            data_urls = media.get("data_urls") if media is not None else None
+            if data_urls is None:
+                try:
+                    image_size, grayscale = preprocess.model_input_spec()
+                    with metrics.STREAMLIT_STAGE.time(stage="thumbnail"):
+                        frames, _total = preprocess.open_frames(source, image_size, grayscale,
+                                                                multi_frame.BURST_MAX_FRAMES,
+                                                                multi_frame.BURST_SAMPLE_FPS)
+                        data_urls = [preprocess.thumbnail_data_url(img) for img in frames]
+                except preprocess.VideoUnsupported:
+                    return {"error": "video_unsupported"}
+                except Exception:
+                    return {"error": "invalid_image"}
+                if media is not None:
+                    media["data_urls"] = data_urls
+            result = _tm(image_data_urls=data_urls, burst=multi_frame.burst_settings(),
+                         model=component_model_assets(), key=key)
+        if isinstance(result, dict) and result.get("predictions"):
+            cache.put(cache_key, result, version)
     return result
 
+def classify_image(image_bytes, key: str, digest: Optional[str] = None,
+                   media: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Classify with the server-side engine, or the browser-side TFJS component.
+    コンポーネントへはモデル入力サイズ（metadata.json の imageSize）まで縮小したPNGだけを渡す。
+    media（タスクごとの状態）を渡すと、縮小PNGと判定結果をそこに保存して再実行時に使い回す。
+    image_bytes に画像の並び（連写）・複数フレーム画像・短い動画を渡すと、フレームを順に判定して
+    結果が安定したところで打ち切る（classify_burst）。返り値は判定したフレームの平均で、
+    判定した枚数などは media["burst"] に入る。
+    """
+    if not image_bytes:
+        return None
+
+    if isinstance(image_bytes, (list, tuple)) and len(image_bytes) == 1:
+        image_bytes = image_bytes[0]
+    if isinstance(image_bytes, (list, tuple)) or _is_multi_frame(image_bytes):
+        if digest is None:
+            digest = _frames_digest(image_bytes)
+        burst = classify_burst(image_bytes, key, digest, media)
+        if not isinstance(burst, dict) or burst.get("error") or not burst.get("predictions"):
+            return burst
+        if media is not None:
+            media["burst"] = burst
+            media["pred"] = burst["predictions"]
+        return burst["predictions"]
+
+    cache = get_cache()
+    digest = digest or hashlib.sha256(image_bytes).hexdigest()
+    result = cache.get(digest)
+    if result is None:
+        # 推論前のモデルのバージョンで保存する（推論中にモデルが変わったら保存しない）
+        version = cache.version
+        result = classify_image_server(image_bytes)
+        if isinstance(result, list):
+            cache.put(digest, result, version)
+
+    if result is None:
+        # JPEGはdraftモードで縮小デコードし、imageSize x imageSize のサムネイルにする
+        data_url = media.get("data_url") if media is not None else None
+        if data_url is None:
+            try:
+                import preprocess
+                with metrics.STREAMLIT_STAGE.time(stage="thumbnail"):
+                    data_url = preprocess.thumbnail_data_url(preprocess.load_for_model(image_bytes))
+            except Exception:
+                # 最終フォールバック（元バイトをそのままjpeg扱いにしない）
+                return {"error": "invalid_image"}
+            if media is not None:
+                media["data_url"] = data_url
+
+        result = _tm(image_data_url=data_url, model=component_model_assets(), key=key)
+        if isinstance(result, list) and result:
+            cache.put(digest, result)
+
+    if media is not None and isinstance(result, list) and result:
+        media["pred"] = result
+    return result
+
+def _is_multi_frame(image_bytes: bytes) -> bool:
+    try:
+        import preprocess
+        return preprocess.is_multi_frame(image_bytes)
+    except Exception:
+        return False
+
+def _frames_digest(frames) -> str:
+    # 連写はフレームごとの SHA-256 を順に並べたもののハッシュ（1枚の場合はその画像の SHA-256）
+    if isinstance(frames, (bytes, bytearray)):
+        return hashlib.sha256(frames).hexdigest()
+    if len(frames) == 1:
+        return hashlib.sha256(frames[0]).hexdigest()
+    h = hashlib.sha256(b"frames")
+    for f in frames:
+        h.update(hashlib.sha256(f).digest())
+    return h.hexdigest()
+
+def uploaded_bytes(uploaded):
+    """アップロード（1つ、または連写として複数）の中身。複数なら bytes のリスト。"""
+    if isinstance(uploaded, (list, tuple)):
+        return [u.getvalue() for u in uploaded] if len(uploaded) > 1 else uploaded[0].getvalue()
+    return uploaded.getvalue()
+
+def task_media(tid: str, uploaded) -> Optional[Dict[str, Any]]:
+    """タスクの画像ごとの派生データ（digest / 縮小PNG / 判定結果）。
+    同じファイル（file_id）のあいだは画像を読み直さず、SHA-256も計算し直さない。
+    uploaded は1つのファイルか、連写として選ばれた複数のファイル（リスト）。"""
+    if not uploaded:
+        return None
+    files = uploaded if isinstance(uploaded, (list, tuple)) else [uploaded]
+    file_id = "|".join(getattr(u, "file_id", None) or f"{u.name}:{u.size}" for u in files)
+    media = st.session_state.task_media.get(tid)
+    if media is None or media["file_id"] != file_id:
+        with metrics.STREAMLIT_STAGE.time(stage="image_hash"):
+            digest = _frames_digest(uploaded_bytes(uploaded))
+        media = {"file_id": file_id, "digest": digest, "data_url": None, "pred": None, "applied": False}
+        st.session_state.task_media[tid] = media
+    return media
+
 # ===== 状態初期化 =====
 def init_state():
     st.session_state.setdefault("roomId", "")
@@ -83,11 +248,18 @@ def init_state():
         for t in TASKS
     })
     st.session_state.setdefault("pred_nonce", {t["id"]: 0 for t in TASKS})
+    st.session_state.setdefault("task_media", {})
+    st.session_state.setdefault("report_cache", None)
+    st.session_state.setdefault("rerun_timings", {})  # "app" / "task:<id>" -> 直近の再実行の内訳（ms）
     st.session_state.setdefault("admin_authed", False)
     st.session_state.setdefault("reports", [])  # メモリ内保存（Cloudでも動く）
 
 init_state()
 
+# 再実行ごとの処理時間（サイドバーの「⏱ 処理時間」に表示）
+_run_started = time.perf_counter()
+_run_trace = metrics.begin_trace(root=True)
+
 # ===== 共通ユーティリティ =====
 def now_iso() -> str:
     return datetime.now(timezone.utc).astimezone().isoformat(timespec="seconds")
@@ -98,36 +270,67 @@ def total_score(tasks_state: Dict[str, Any]) -> int:
         s += int(tasks_state.get(t["id"], {}).get("score", 0) or 0)
     return s
 
-def duration_seconds() -> int:
-    if not st.session_state.startedAt or not st.session_state.finishedAt:
+def duration_seconds(ss=None) -> int:
+    ss = ss or st.session_state
+    if not ss.startedAt or not ss.finishedAt:
         return 0
-    return int((st.session_state.finishedAt - st.session_state.startedAt).total_seconds())
-
-def build_report_text() -> str:
-    report_id = uuid.uuid4().hex[:12]
-    started = st.session_state.startedAt.isoformat(timespec="seconds") if st.session_state.startedAt else ""
-    finished = st.session_state.finishedAt.isoformat(timespec="seconds") if st.session_state.finishedAt else ""
-
-    lines = []
-    lines.append("CLEANING_REPORT_V1")
-    lines.append(f"report_id: {report_id}")
-    lines.append(f"roomId: {st.session_state.roomId}")
-    lines.append(f"cleanerId: {st.session_state.cleanerId}")
-    lines.append(f"startedAt: {started}")
-    lines.append(f"finishedAt: {finished}")
-    lines.append(f"durationSeconds: {duration_seconds()}")
-    lines.append(f"totalScore: {total_score(st.session_state.tasks_state)}")
-    lines.append("")
-    lines.append("tasks:")
+    return int((ss.finishedAt - ss.startedAt).total_seconds())
+
+def report_signature(ss=None) -> str:
+    # レポートに載る項目だけから作る（これが変わらない限り report_id / 本文を使い回す）
+    ss = ss or st.session_state
+    parts = [str(ss.roomId), str(ss.cleanerId), str(ss.startedAt), str(ss.finishedAt)]
+    for t in TASKS:
+        info = ss.tasks_state.get(t["id"], {})
+        parts += [str(info.get(k, "")) for k in ("status", "score", "checkedAt", "notes")]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def current_report() -> Dict[str, str]:
+    sig = report_signature()
+    cached = st.session_state.report_cache
+    if cached is None or cached["sig"] != sig:
+        report_id = uuid.uuid4().hex[:12]
+        with metrics.STREAMLIT_STAGE.time(stage="report_build"):
+            text = build_report_text(report_id)
+        cached = {"sig": sig, "report_id": report_id, "text": text}
+        st.session_state.report_cache = cached
+    return cached
+
+def build_report_text(report_id: Optional[str] = None, ss=None) -> str:
+    ss = ss or st.session_state
+    report_id = report_id or uuid.uuid4().hex[:12]
+    started = ss.startedAt.isoformat(timespec="seconds") if ss.startedAt else ""
+    finished = ss.finishedAt.isoformat(timespec="seconds") if ss.finishedAt else ""
+    tasks = []
     for t in TASKS:
-        tid = t["id"]
-        info = st.session_state.tasks_state.get(tid, {})
-        lines.append(f"- id: {tid}")
-        lines.append(f"  status: {info.get('status','')}")
-        lines.append(f"  score: {info.get('score','')}")
-        lines.append(f"  checkedAt: {info.get('checkedAt','')}")
-        lines.append(f"  notes: {info.get('notes','')}")
-    return "\n".join(lines) + "\n"
+        info = ss.tasks_state.get(t["id"], {})
+        tasks.append(report_codec.TaskEntry(
+            t["id"], str(info.get("status", "")), str(info.get("score", "")),
+            str(info.get("checkedAt", "")), str(info.get("notes", "")),
+        ))
+    report = report_codec.Report(
+        report_id, str(ss.roomId), str(ss.cleanerId), started, finished,
+        str(duration_seconds(ss)), str(total_score(ss.tasks_state)), tasks=tasks,
+    )
+    return report_codec.encode(report)
+
+def report_download_data(report: Dict[str, str]):
+    """ダウンロードの data。メモの編集はタスクのパネルだけを再実行する（レポート欄は描き直さない）ので、
+    DEFERRED_DOWNLOAD なら押されたときのメモで本文を作る関数を返す。"""
+    if not DEFERRED_DOWNLOAD:
+        return report["text"].encode("utf-8")
+    ss = st.session_state
+    # 別スレッドで呼ばれるので st.session_state ではなく値を持っておく。
+    # tasks_state はメモの編集でその場で書き換わる dict なので、押されたときの内容が読める
+    snapshot = SimpleNamespace(roomId=ss.roomId, cleanerId=ss.cleanerId, startedAt=ss.startedAt,
+                               finishedAt=ss.finishedAt, tasks_state=ss.tasks_state)
+
+    def data() -> bytes:
+        if report_signature(snapshot) == report["sig"]:
+            return report["text"].encode("utf-8")
+        return build_report_text(report["report_id"], snapshot).encode("utf-8")
+
+    return data
 
 def reset_cleaning_state():
     st.session_state.startedAt = None
@@ -137,6 +340,7 @@ def reset_cleaning_state():
         for t in TASKS
     }
     st.session_state.pred_nonce = {t["id"]: 0 for t in TASKS}
+    st.session_state.task_media = {}
 
 # ===== UI =====
 st.title("🧹 清掃・監査（Streamlit移行版）")
@@ -156,6 +360,147 @@ with st.sidebar:
     done = sum(1 for t in TASKS if st.session_state.tasks_state[t["id"]]["status"] == "done")
     st.metric("完了タスク数", f"{done}/{len(TASKS)}")
 
+# =============================
+# タスクのパネル（fragment: 写真・メモの操作はこのタスクだけ再実行）
+# =============================
+@fragment
+def render_task(t: Dict[str, Any]):
+    # このタスクの再実行で掛かった時間（判定の decode / preprocess / inference を含む）を記録
+    with metrics.trace() as tr:
+        try:
+            _render_task(t)
+        finally:
+            st.session_state.rerun_timings[f"task:{t['id']}"] = tr.totals_ms()
+
+def _render_task(t: Dict[str, Any]):
+    tid = t["id"]
+    info = st.session_state.tasks_state[tid]
+    before = (info["status"], info["score"])
+
+    with st.expander(f"{t['order']}. {t['label']}  （配点 {t['weight']}）", expanded=False):
+        st.write(t["advice"])
+
+        colA, colB = st.columns([1, 1], gap="large")
+        with colA:
+            img = st.camera_input("写真を撮る", key=f"cam_{tid}")
+            if img is None:
+                # 複数選択（連写）や短い動画も可。ブレた1枚で bad にならないよう、安定するまで順に判定する
+                img = st.file_uploader("または画像・連写（複数選択）・短い動画をアップロード（拡張子不問）",
+                                       type=None, accept_multiple_files=True, key=f"up_{tid}") or None
+            media = task_media(tid, img)
+
+        with colB:
+            # 判定（画像がある時だけ実行）
+            pred = None
+            if media is not None:
+                img_hash = media["digest"][:8]
+                nonce = st.session_state.pred_nonce.get(tid, 0)
+                pred = media["pred"]
+                if pred is None:
+                    pred = classify_image(uploaded_bytes(img), key=f"pred_{tid}_{img_hash}_{nonce}",
+                                          digest=media["digest"], media=media)
+            info["last_pred"] = pred
+
+            # 返り値がまだ来ていない場合（コンポーネント処理中/ネットワーク制限など）
+            if media is not None and pred is None:
+                # 4秒以上返ってこない場合はエラー扱い（Streamlit Cloudの遅延/ブロック対策）
+                now_ts = time.time()
+                if "pred_pending" not in st.session_state:
+                    st.session_state.pred_pending = {}
+                pend = st.session_state.pred_pending.get(tid)
+                if (not pend) or (pend.get("hash") != img_hash):
+                    st.session_state.pred_pending[tid] = {"hash": img_hash, "since": now_ts}
+                    pend = st.session_state.pred_pending[tid]
+                elapsed = now_ts - float(pend.get("since", now_ts))
+
+                if elapsed >= 4.0:
+                    pred = {"error": "timeout"}
+                    st.session_state.pred_pending.pop(tid, None)
+                    st.error("判定が4秒以上続いたためタイムアウトしました。通信制限やCDNブロックの可能性があります。")
+                else:
+                    st.info("判定中です（最大4秒）。反映されない場合は「再判定」を押してください。")
+                    if st.button("🔄 再判定", key=f"retry_{tid}", use_container_width=True):
+                        st.session_state.pred_nonce[tid] = st.session_state.pred_nonce.get(tid, 0) + 1
+                        st.session_state.pred_pending[tid] = {"hash": img_hash, "since": time.time()}
+                        st.rerun()
+
+            # 判定結果表示＆状態更新
+            if isinstance(pred, dict) and pred.get("error") == "video_unsupported":
+                st.error("この環境では動画を判定できません。連写（複数の画像）でアップロードしてください。")
+                info["status"] = "todo"
+                info["score"] = 0
+            elif isinstance(pred, dict) and pred.get("error"):
+                st.error("判定に失敗しました。別の画像で再試行してください。")
+                info["status"] = "todo"
+                info["score"] = 0
+            elif isinstance(pred, list) and len(pred) > 0:
+                top = pred[0]
+                cls = str(top.get("className", ""))
+                p = float(top.get("probability", 0.0))
+
+                st.write(f"**判定:** `{cls}`  /  **信頼度:** {round(p*100)}%")
+                burst = media.get("burst") if media is not None else None
+                if burst:
+                    total = burst.get("frames_total")
+                    frames = f"{burst['frames_processed']}/{total}" if total else str(burst["frames_processed"])
+                    st.caption(f"{frames} フレームで判定" + ("（結果が安定したので残りは省略）" if burst.get("stopped_early") else ""))
+
+                # 状態の更新は判定結果が出た最初の1回だけ（再実行のたびに checkedAt を変えない）
+                if not media["applied"]:
+                    if cls in OK_CLASSES:
+                        info["status"] = "done"
+                        info["score"] = t["weight"]
+                    else:
+                        info["status"] = "fix"
+                        info["score"] = 0
+                    info["checkedAt"] = now_iso()
+                    media["applied"] = True
+
+            # メモ
+            info["notes"] = st.text_area("メモ（任意）", value=info.get("notes",""), key=f"notes_{tid}")
+
+            # ステータス表示
+            if info["status"] == "done":
+                st.success(f"完了 ✅（+{t['weight']}）")
+            elif info["status"] == "fix":
+                st.warning("要修正 ⚠️（bad判定）")
+            else:
+                st.info("未判定 / 未完了")
+
+    # 反映
+    st.session_state.tasks_state[tid] = info
+    # 完了/要修正が変わったときだけ全体を再実行（サイドバーの進捗・レポート欄を更新）。
+    # メモはレポート欄のダウンロードが押されたときに読む（report_download_data）
+    if (info["status"], info["score"]) != before:
+        st.rerun()
+
+# =============================
+# レポート出力（fragment: 本文と report_id は状態が変わるまで同じものを使う）
+# =============================
+@fragment
+def render_report_panel():
+    st.subheader("レポート出力")
+    disabled_export = not st.session_state.roomId or not st.session_state.cleanerId
+    if disabled_export:
+        st.warning("部屋IDと作業者IDを入力すると、レポート出力できます。")
+
+    report = current_report()
+    st.download_button(
+        "⬇ レポートをダウンロード（txt）",
+        data=report_download_data(report),
+        file_name=f"cleaning_report_{report['report_id']}.txt",
+        mime="text/plain",
+        use_container_width=True,
+        disabled=disabled_export,
+    )
+
+    if st.button("📌 レポートを保存（監査で閲覧）", use_container_width=True, disabled=disabled_export):
+        st.session_state.reports.insert(0, {"savedAt": now_iso(), "content": report["text"]})
+        st.success("保存しました（監査メニューで確認できます）。")
+    if not DEFERRED_DOWNLOAD:
+        # 古い Streamlit ではダウンロード内容が描画時に決まるので、メモの変更はここで反映する
+        st.button("↻ 更新", use_container_width=True, help="メモの変更をダウンロード内容に反映します")
+
 # =============================
 # 清掃
 # =============================
@@ -183,114 +528,14 @@ if mode == "清掃":
         st.caption("各タスクで写真を撮影/アップロード → AIが perfect/good/bad を判定し、完了/要修正を自動更新します。")
 
         for t in sorted(TASKS, key=lambda x: x["order"]):
-            tid = t["id"]
-            info = st.session_state.tasks_state[tid]
-
-            with st.expander(f"{t['order']}. {t['label']}  （配点 {t['weight']}）", expanded=False):
-                st.write(t["advice"])
-
-                colA, colB = st.columns([1, 1], gap="large")
-                with colA:
-                    img = st.camera_input("写真を撮る", key=f"cam_{tid}")
-                    if img is None:
-                        up = st.file_uploader("または画像をアップロード（拡張子不問）", type=None, key=f"up_{tid}")
-                        if up is not None:
-                            img_bytes = up.read()
-                        else:
-                            img_bytes = b""
-                    else:
-                        img_bytes = img.getvalue()
-
-                with colB:
-                    # 判定（画像がある時だけ実行）
-                    pred = None
-                    if img_bytes:
-                        img_hash = hashlib.sha256(img_bytes).hexdigest()[:8]
-                        nonce = st.session_state.pred_nonce.get(tid, 0)
-                        pred = classify_image(img_bytes, key=f"pred_{tid}_{img_hash}_{nonce}")
-                    info["last_pred"] = pred
-
-                    # 返り値がまだ来ていない場合（コンポーネント処理中/ネットワーク制限など）
-                    if img_bytes and pred is None:
-                        # 4秒以上返ってこない場合はエラー扱い（Streamlit Cloudの遅延/ブロック対策）
-                        now_ts = time.time()
-                        if "pred_pending" not in st.session_state:
-                            st.session_state.pred_pending = {}
-                        pend = st.session_state.pred_pending.get(tid)
-                        if (not pend) or (pend.get("hash") != img_hash):
-                            st.session_state.pred_pending[tid] = {"hash": img_hash, "since": now_ts}
-                            pend = st.session_state.pred_pending[tid]
-                        elapsed = now_ts - float(pend.get("since", now_ts))
-
-                        if elapsed >= 4.0:
-                            pred = {"error": "timeout"}
-                            st.session_state.pred_pending.pop(tid, None)
-                            st.error("判定が4秒以上続いたためタイムアウトしました。通信制限やCDNブロックの可能性があります。")
-                        else:
-                            st.info("判定中です（最大4秒）。反映されない場合は「再判定」を押してください。")
-                            if st.button("🔄 再判定", key=f"retry_{tid}", use_container_width=True):
-                                st.session_state.pred_nonce[tid] = st.session_state.pred_nonce.get(tid, 0) + 1
-                                st.session_state.pred_pending[tid] = {"hash": img_hash, "since": time.time()}
-                                st.rerun()
-
-                    # 判定結果表示＆状態更新
-                    if isinstance(pred, dict) and pred.get("error"):
-                        st.error("判定に失敗しました。別の画像で再試行してください。")
-                        info["status"] = "todo"
-                        info["score"] = 0
-                    elif isinstance(pred, list) and len(pred) > 0:
-                        top = pred[0]
-                        cls = str(top.get("className", ""))
-                        p = float(top.get("probability", 0.0))
-
-                        st.write(f"**判定:** `{cls}`  /  **信頼度:** {round(p*100)}%")
-
-                        if cls in OK_CLASSES:
-                            info["status"] = "done"
-                            info["score"] = t["weight"]
-                        else:
-                            info["status"] = "fix"
-                            info["score"] = 0
-
-                        info["checkedAt"] = now_iso()
-
-                    # メモ
-                    info["notes"] = st.text_area("メモ（任意）", value=info.get("notes",""), key=f"notes_{tid}")
-
-                    # ステータス表示
-                    if info["status"] == "done":
-                        st.success(f"完了 ✅（+{t['weight']}）")
-                    elif info["status"] == "fix":
-                        st.warning("要修正 ⚠️（bad判定）")
-                    else:
-                        st.info("未判定 / 未完了")
-
-                # 反映
-                st.session_state.tasks_state[tid] = info
+            render_task(t)
 
     with right:
         st.subheader("マップ（参照）")
         st.image(os.path.join(os.path.dirname(__file__), "static", "room_map.png"), caption="※ピン操作UIは次段階（最小改修のため参照のみ）", use_container_width=True)
 
         st.divider()
-        st.subheader("レポート出力")
-        disabled_export = not st.session_state.roomId or not st.session_state.cleanerId
-        if disabled_export:
-            st.warning("部屋IDと作業者IDを入力すると、レポート出力できます。")
-
-        report_text = build_report_text()
-        st.download_button(
-            "⬇ レポートをダウンロード（txt）",
-            data=report_text.encode("utf-8"),
-            file_name=f"cleaning_report_{uuid.uuid4().hex[:8]}.txt",
-            mime="text/plain",
-            use_container_width=True,
-            disabled=disabled_export,
-        )
-
-        if st.button("📌 レポートを保存（監査で閲覧）", use_container_width=True, disabled=disabled_export):
-            st.session_state.reports.insert(0, {"savedAt": now_iso(), "content": report_text})
-            st.success("保存しました（監査メニューで確認できます）。")
+        render_report_panel()
 
 # =============================
 # 監査（管理者）
@@ -339,3 +584,30 @@ else:
             for i, r in enumerate(reports):
                 with st.expander(f"{i+1}. 保存日時: {r.get('savedAt','')}"):
                     st.code(r.get("content",""), language="text")
+
+# =============================
+# 処理時間（再実行ごとの内訳 + プロセス全体の集計）
+# =============================
+metrics.STREAMLIT_STAGE.observe(time.perf_counter() - _run_started, stage="script")
+metrics.end_trace(_run_trace)
+st.session_state.rerun_timings["app"] = _run_trace.totals_ms()
+
+with st.sidebar.expander("⏱ 処理時間（再実行ごと）", expanded=False):
+    st.caption("直近の再実行で掛かった時間（ms）。task:<id> はそのタスクだけの再実行（fragment）の分です。")
+    rows = []
+    for scope, stages in sorted(st.session_state.rerun_timings.items()):
+        for stage, ms in stages.items():
+            rows.append({"範囲": scope, "区間": stage, "ms": ms})
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
+    st.caption("プロセス全体（起動から）の平均 / p95（ms）")
+    summary = []
+    for hist in (metrics.STREAMLIT_STAGE, metrics.CLASSIFY_STAGE):
+        for stage in ("script", "image_hash", "thumbnail", "report_build", "decode", "preprocess", "inference"):
+            snap = hist.snapshot(stage=stage)
+            if snap["count"]:
+                summary.append({"区間": f"{hist.name}:{stage}", "回数": int(snap["count"]),
+                                "平均": round(snap["mean"] * 1000, 2), "p95以下": round(snap["p95"] * 1000, 2)})
+    if summary:
+        st.dataframe(summary, hide_index=True, use_container_width=True)
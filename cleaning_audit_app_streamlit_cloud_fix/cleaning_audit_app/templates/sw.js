@@ -0,0 +1,74 @@
+// ===== Service Worker（/sw.js, app.py がキャッシュ対象のURLを埋め込んで生成）=====
+// - 画面（/）・JS/CSS・地図画像・tfjs・モデルをインストール時に事前キャッシュし、電波が無くても起動できるようにする
+// - 事前キャッシュのURLは内容ハッシュ付きなので、内容が変わればキャッシュ名（CACHE_NAME）も変わって入れ替わる
+// - 「/」だけはネットワーク優先（繋がらなければキャッシュ）。それ以外の事前キャッシュ対象はキャッシュ優先
+// - Background Sync: 送信待ちのレポート（IndexedDB）を電波が戻ったときに送る
+const CACHE_NAME = "ai-clean-nav-{{ version }}";
+const SHELL_URL = "/";
+const PRECACHE = {{ precache|tojson }};
+const PRECACHE_SET = new Set(PRECACHE.map((u) => new URL(u, self.location.origin).href));
+
+importScripts({{ report_queue_url|tojson }});
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(CACHE_NAME)
+      .then((cache) => cache.addAll([SHELL_URL, ...PRECACHE]))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(
+        keys.filter((k) => k.startsWith("ai-clean-nav-") && k !== CACHE_NAME).map((k) => caches.delete(k))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener("fetch", (event) => {
+  const req = event.request;
+  if (req.method !== "GET") return;
+  const url = new URL(req.url);
+
+  if (req.mode === "navigate" && url.origin === self.location.origin && url.pathname === SHELL_URL) {
+    event.respondWith(networkFirst(req));
+    return;
+  }
+  if (PRECACHE_SET.has(url.href)) {
+    event.respondWith(cacheFirst(req));
+  }
+});
+
+async function networkFirst(req) {
+  const cache = await caches.open(CACHE_NAME);
+  try {
+    const resp = await fetch(req);
+    if (resp.ok) cache.put(SHELL_URL, resp.clone());
+    return resp;
+  } catch (e) {
+    const cached = await cache.match(SHELL_URL);
+    if (cached) return cached;
+    throw e;
+  }
+}
+
+async function cacheFirst(req) {
+  const cache = await caches.open(CACHE_NAME);
+  const cached = await cache.match(req);
+  if (cached) return cached;
+  const resp = await fetch(req);
+  if (resp.ok) cache.put(req, resp.clone());
+  return resp;
+}
+
+self.addEventListener("sync", (event) => {
+  if (event.tag !== ReportQueue.SYNC_TAG) return;
+  event.waitUntil(ReportQueue.flush().then(async (res) => {
+    // 開いている画面に送信結果を知らせる（ダウンロードリンクの表示用）
+    const clients = await self.clients.matchAll({ type: "window" });
+    clients.forEach((c) => c.postMessage({ type: "report-queue-flushed", ...res }));
+    if (res.pending) throw new Error("reports still pending"); // 残っていればブラウザが再試行する
+  }));
+});
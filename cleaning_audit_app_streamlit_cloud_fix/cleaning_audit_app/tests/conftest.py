@@ -0,0 +1,23 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+# テストはアプリのディレクトリ（app.py と同じ階層）のモジュールを直接 import する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """保存先を tmp_path にした app を読み込む関数（env で環境変数を足す。読み込むたびに新しい Flask アプリ）。"""
+    def load(**env):
+        monkeypatch.setenv("REPORTS_DIR", str(tmp_path / "reports"))
+        monkeypatch.setenv("DATA_DIR", str(tmp_path / "var"))
+        monkeypatch.setenv("REPORT_STORE", "fs")
+        monkeypatch.delenv("AUDITOR_ENDPOINT", raising=False)
+        for k, v in env.items():
+            monkeypatch.setenv(k, str(v))
+        import app
+        return importlib.reload(app)
+    return load
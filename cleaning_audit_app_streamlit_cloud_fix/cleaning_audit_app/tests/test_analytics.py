@@ -0,0 +1,91 @@
+import os
+
+import report_codec
+import report_store
+from analytics import Analytics
+from report_index import ReportIndex
+
+
+def _parse(text):
+    return report_codec.decode(text).summary()
+
+
+def _report(report_id, room, score):
+    return report_codec.encode(report_codec.Report.from_payload(
+        {"roomId": room, "cleanerId": "c1", "totalScore": score, "durationSeconds": 600,
+         "finishedAt": "2026-01-01T10:00:00", "tasks": {"bed": {"status": "done"}}}, report_id))
+
+
+def _worker(tmp_path):
+    # gunicorn のワーカー1つ分: 保存先と索引（SQLite）は共有、集計はプロセスごと
+    store = report_store.FileReportStore(str(tmp_path / "reports"))
+    index = ReportIndex(store, os.path.join(str(tmp_path), "var", "report_index.sqlite3"), _parse)
+    return store, index, Analytics(index)
+
+
+def _save(store, index, filename, text):
+    store.write(filename, text)
+    index.upsert(filename)
+
+
+def test_reports_saved_by_another_worker_are_counted(tmp_path):
+    store_a, index_a, analytics_a = _worker(tmp_path)
+    store_b, index_b, analytics_b = _worker(tmp_path)
+
+    _save(store_a, index_a, "cleaning_report_a.txt", _report("a", "201", 80))
+    _save(store_b, index_b, "cleaning_report_b.txt", _report("b", "202", 100))
+    index_a.ensure_fresh()
+
+    for analytics in (analytics_a, analytics_b):
+        assert analytics.summary()["count"] == 2
+        assert analytics.keys("room") == ["201", "202"]
+        assert analytics.summary()["totalScore"]["mean"] == 90
+
+
+def test_overwrite_by_another_worker_rebuilds(tmp_path):
+    store_a, index_a, analytics_a = _worker(tmp_path)
+    store_b, index_b, _ = _worker(tmp_path)
+
+    _save(store_a, index_a, "cleaning_report_a.txt", _report("a", "201", 80))
+    assert analytics_a.summary()["totalScore"]["max"] == 80
+    _save(store_b, index_b, "cleaning_report_a.txt", _report("a", "201", 40))
+
+    summary = analytics_a.summary()
+    assert summary["count"] == 1
+    assert summary["totalScore"]["max"] == 40
+
+
+def test_notifications_are_deduplicated_by_rowid(tmp_path):
+    store_a, index_a, analytics_a = _worker(tmp_path)
+    store_b, index_b, _ = _worker(tmp_path)
+    notified = []
+    index_a.subscribe(lambda added, removed: notified.extend(added))
+
+    _save(store_a, index_a, "cleaning_report_a1.txt", _report("a1", "201", 80))
+    assert analytics_a._hwm == index_a.high_water()[0] == notified[-1]["seq"]  # 通知だけで取り込み済み
+    analytics_a.on_change(list(notified), [])  # 同じ通知が2回届いても数えない
+    assert analytics_a.summary()["count"] == 1
+
+    # 他のワーカーの行を挟んだ通知は取り込まず、参照時に rowid の順で1回ずつ取り込む
+    _save(store_b, index_b, "cleaning_report_b1.txt", _report("b1", "202", 60))
+    _save(store_a, index_a, "cleaning_report_a2.txt", _report("a2", "201", 100))
+    assert analytics_a.summary()["count"] == 3
+    analytics_a.on_change(list(notified), [])
+    assert analytics_a.summary()["count"] == 3
+    assert analytics_a.summary("room", "201")["count"] == 2
+    assert not hasattr(analytics_a, "_seen")
+
+
+def test_rows_added_during_rebuild_are_counted_once(tmp_path, monkeypatch):
+    store, index, analytics = _worker(tmp_path)
+    for i in range(3):
+        _save(store, index, f"cleaning_report_{i}.txt", _report(str(i), "201", 10 * i))
+    hwm, removals = index.high_water()
+    # 作り直しの途中で1件増えた状況: 位置を読んだ時点では2件目までだった
+    monkeypatch.setattr(index, "high_water", lambda: (hwm - 1, removals))
+    analytics.rebuild()
+    assert analytics._hwm == hwm - 1
+    monkeypatch.undo()
+    summary = analytics.summary()
+    assert summary["count"] == 3
+    assert summary["totalScore"]["max"] == 20
@@ -0,0 +1,148 @@
+import io
+import gzip
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+import bulk_ingest
+
+REPORTS = {f"cleaning_report_bulk{i}.txt": f"CLEANING_REPORT_V1\nreport_id: bulk{i}\nroomId: {100 + i}\n"
+           for i in range(5)}
+
+
+def _ndjson(reports=REPORTS):
+    return "".join(json.dumps({"filename": fn, "content": text}) + "\n" for fn, text in reports.items()).encode()
+
+
+def _tar(reports=REPORTS, mode="w"):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as tar:
+        for fn, text in list(reports.items()) + [("notes/readme.md", "skip")]:
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"export/{fn}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def _zip(reports=REPORTS):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("export/", "")
+        zf.writestr("export/readme.md", "skip")
+        for fn, text in reports.items():
+            zf.writestr(f"export/{fn}", text)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(load_app, monkeypatch):
+    app = load_app(RECEIVE_BATCH_SIZE=2)
+    app.write_batches = []
+    write_many = app.REPORT_STORE.write_many
+
+    def spy(items):
+        items = list(items)
+        app.write_batches.append(len(items))
+        return write_many(items)
+
+    monkeypatch.setattr(app.REPORT_STORE, "write_many", spy)
+    return app
+
+
+def _post(app, body, content_type, query="", headers=None):
+    res = app.app.test_client().post(f"/api/receive_report{query}", data=body, content_type=content_type,
+                                     headers=headers or {})
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def _assert_saved(app, body, reports=REPORTS):
+    assert body["saved"] == len(reports)
+    assert [(r["filename"], r["ok"], r["saved_as"]) for r in body["results"] if r["ok"]] == \
+        [(fn, True, fn) for fn in reports]
+    for fn, text in reports.items():
+        assert app.REPORT_STORE.read(fn) == text
+    assert all(app.REPORT_INDEX.get(fn) for fn in reports)  # 索引にも入っている
+
+
+@pytest.mark.parametrize("name, body, content_type, headers", [
+    ("ndjson", _ndjson(), "application/x-ndjson", {}),
+    ("ndjson_gzip_encoding", gzip.compress(_ndjson()), "application/x-ndjson", {"Content-Encoding": "gzip"}),
+    ("ndjson_gzip_type", gzip.compress(_ndjson()), "application/gzip", {}),
+    ("tar", _tar(), "application/x-tar", {}),
+    ("tar_gz", _tar(mode="w:gz"), "application/x-tar", {}),
+    ("tar_gz_encoding", _tar(mode="w:gz"), "application/x-tar", {"Content-Encoding": "gzip"}),
+    ("zip", _zip(), "application/zip", {}),
+    ("zip_gzip_encoding", gzip.compress(_zip()), "application/zip", {"Content-Encoding": "gzip"}),
+])
+def test_bulk_formats_save_every_report_in_batches(app, name, body, content_type, headers):
+    result = _post(app, body, content_type, headers=headers)
+    assert result["ok"] and result["failed"] == 0
+    _assert_saved(app, result)
+    # RECEIVE_BATCH_SIZE=2: 5件は 2 + 2 + 1 回に分けて書き込む
+    assert app.write_batches == [2, 2, 1]
+
+
+def test_format_query_overrides_content_type(app):
+    # ?format= があれば Content-Type より優先する
+    assert _post(app, _zip(), "application/octet-stream", "?format=zip")["saved"] == len(REPORTS)
+    assert _post(app, _tar(), "application/zip", "?format=tar")["saved"] == len(REPORTS)
+    # 一括形式でない Content-Type で ?format= も無ければ、従来の JSON（1件形式）として扱う
+    body = _post(app, json.dumps({"filename": "cleaning_report_single.txt", "content": "x"}), "application/json")
+    assert body["saved_as"] == "cleaning_report_single.txt"
+    assert bulk_ingest.detect_format("application/json", "csv") is None
+    assert bulk_ingest.detect_format("text/plain", " NDJSON ") == "ndjson"
+
+
+def test_json_reports_list_returns_per_item_results(app):
+    items = [{"filename": fn, "content": text} for fn, text in REPORTS.items()] + ["oops"]
+    body = _post(app, json.dumps({"reports": items}), "application/json")
+    assert not body["ok"] and body["failed"] == 1
+    assert body["results"][-1] == {"filename": "", "ok": False, "error": "invalid item"}
+    _assert_saved(app, body)
+
+
+def test_malformed_ndjson_lines_are_reported_and_the_rest_saved(app):
+    lines = _ndjson().split(b"\n")
+    lines.insert(1, b"{not json")
+    lines.insert(3, b'["not", "an", "object"]')
+    body = _post(app, b"\n".join(lines), "application/x-ndjson")
+    assert not body["ok"] and body["failed"] == 2
+    errors = [r for r in body["results"] if not r["ok"]]
+    assert errors[0]["filename"] == "line 2" and errors[0]["error"].startswith("invalid json")
+    assert errors[1]["filename"] == "line 4" and errors[1]["error"] == 'expected {"filename", "content"}'
+    _assert_saved(app, body)
+
+
+def test_truncated_tar_keeps_complete_members(app):
+    data = _tar()
+    body = _post(app, data[:1536], "application/x-tar")  # 1件目（ヘッダー512 + 本文512）の後、2件目の途中で切れる
+    assert not body["ok"]
+    assert body["results"][-1]["ok"] is False and body["results"][-1]["error"].startswith("stream error")
+    first = next(iter(REPORTS))
+    assert body["results"][0] == {"filename": first, "ok": True, "saved_as": first}
+    assert app.REPORT_STORE.read(first) == REPORTS[first]
+
+
+def test_corrupt_zip_member_is_reported(app):
+    data = bytearray(_zip({fn: text * 20 for fn, text in REPORTS.items()}))
+    last = list(REPORTS)[-1]
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as zf:
+        info = zf.getinfo(f"export/{last}")
+    # 最後のメンバーの圧縮データを1バイト壊す（CRC が合わなくなる）
+    pos = info.header_offset + 30 + len(info.filename) + len(info.extra) + info.compress_size // 2
+    data[pos] ^= 0xFF
+    body = _post(app, bytes(data), "application/zip")
+    assert not body["ok"] and body["saved"] == len(REPORTS) - 1
+    assert body["results"][-1]["ok"] is False and body["results"][-1]["error"].startswith("stream error")
+    assert [r["filename"] for r in body["results"] if r["ok"]] == list(REPORTS)[:-1]
+
+
+def test_not_a_zip_is_a_single_error(app):
+    body = _post(app, b"not a zip archive", "application/zip")
+    assert body == {"ok": False, "saved": 0, "failed": 1,
+                    "results": [{"filename": "", "ok": False, "error": body["results"][0]["error"]}]}
+    assert body["results"][0]["error"].startswith("stream error")
@@ -0,0 +1,126 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from classify_queue import MicroBatcher, QueueFull
+
+
+class StubModel:
+    """入力の先頭の値をそのまま確率として返す（呼ばれたバッチの大きさを記録する）。"""
+
+    def __init__(self, gate: threading.Event = None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, x):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(len(x))
+        return np.stack([np.array([row[0], 1 - row[0]]) for row in x])
+
+
+def test_concurrent_submits_share_one_forward_pass():
+    model = StubModel()
+    batcher = MicroBatcher(model, max_batch=8, max_wait=1.0, max_queue=64)
+    barrier = threading.Barrier(8)
+    results = [None] * 8
+
+    def client(i):
+        barrier.wait()
+        fut, = batcher.submit([np.array([i / 10.0])])
+        results[i] = fut.result(timeout=5)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert model.batches == [8]
+    assert time.monotonic() - t0 < 1.0  # max_batch に達したら max_wait を待たない
+    assert [round(float(r[0]), 3) for r in results] == [i / 10.0 for i in range(8)]
+
+
+def test_max_wait_flushes_partial_batch():
+    model = StubModel()
+    batcher = MicroBatcher(model, max_batch=16, max_wait=0.05)
+    t0 = time.monotonic()
+    futures = batcher.submit([np.array([0.1]), np.array([0.2]), np.array([0.3])])
+    assert [round(float(f.result(timeout=5)[0]), 3) for f in futures] == [0.1, 0.2, 0.3]
+    elapsed = time.monotonic() - t0
+    batcher.close()
+    assert model.batches == [3]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_full_queue_raises_without_enqueueing():
+    gate = threading.Event()
+    model = StubModel(gate)
+    batcher = MicroBatcher(model, max_batch=1, max_wait=0.0, max_queue=2)
+    running = batcher.submit([np.array([0.5])])
+    deadline = time.monotonic() + 5
+    while batcher.pending() and time.monotonic() < deadline:  # 1件目が推論中になるまで待つ
+        time.sleep(0.005)
+    queued = batcher.submit([np.array([0.1]), np.array([0.2])])
+    with pytest.raises(QueueFull):
+        batcher.submit([np.array([0.3])])
+    assert batcher.pending() == 2
+    gate.set()
+    assert all(f.result(timeout=5) is not None for f in running + queued)
+    batcher.close()
+    with pytest.raises(QueueFull):
+        MicroBatcher(model, max_queue=2).submit([np.array([0.1])] * 3)
+
+
+def test_predict_error_is_set_on_every_future():
+    def boom(x):
+        raise RuntimeError("model broke")
+
+    batcher = MicroBatcher(boom, max_batch=4, max_wait=0.01)
+    futures = batcher.submit([np.array([0.1]), np.array([0.2])])
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=5)
+    batcher.close()
+
+
+def _stub_classifier(app, batcher):
+    model = SimpleNamespace(
+        preprocess_bytes=lambda raw: np.array([len(raw) / 100.0]),
+        to_results=lambda p: [{"className": "good", "probability": float(p[0])}],
+    )
+    app._classifier = (SimpleNamespace(get_model=lambda: model), batcher, None)
+
+
+def test_api_classify_batches_and_returns_503_when_queue_is_full(load_app):
+    app = load_app(CLASSIFY_QUEUE_SIZE=2)
+    gate = threading.Event()
+    model = StubModel(gate)
+    batcher = MicroBatcher(model, max_batch=4, max_wait=0.0, max_queue=app.CLASSIFY_QUEUE_SIZE)
+    _stub_classifier(app, batcher)
+    client = app.app.test_client()
+
+    # 推論中で詰まっている間にキューを満杯にする
+    busy = batcher.submit([np.array([0.0])])
+    while batcher.pending():
+        time.sleep(0.005)
+    batcher.submit([np.array([0.0]), np.array([0.0])])
+    resp = client.post("/api/classify", json={"images": ["YWJj"]})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.get_json()["error"] == "busy"
+    gate.set()
+    busy[0].result(timeout=5)
+    while batcher.pending():
+        time.sleep(0.005)
+
+    resp = client.post("/api/classify", json={"images": ["YWJjZA==", "YWJjZGU="]})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["ok"] and [r[0]["probability"] for r in body["results"]] == [0.04, 0.05]
+    assert model.batches[-1] == 2  # 1リクエストの画像は1回の推論にまとまる
+    batcher.close()
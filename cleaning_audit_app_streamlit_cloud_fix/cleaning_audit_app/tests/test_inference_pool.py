@@ -0,0 +1,89 @@
+import mmap
+import os
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import inference_pool
+import tm_engine
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    # 推論プロセス（spawn）は環境変数から読むので両方を差し替える
+    d = str(tmp_path / "model_shared")
+    monkeypatch.setenv("MODEL_SHARED_DIR", d)
+    monkeypatch.setattr(tm_engine, "SHARED_DIR", d)
+    return d
+
+
+def _root_buffer(a):
+    while isinstance(a, np.ndarray) and a.base is not None:
+        a = a.base
+    return a.obj if isinstance(a, memoryview) else a  # np.frombuffer(mmap) は memoryview を挟む
+
+
+def _inputs(model, n=4):
+    rng = np.random.default_rng(0)
+    return rng.uniform(-1, 1, (n,) + model.input_shape).astype(np.float32)
+
+
+def test_mmap_shared_weights_match_in_memory_fold(shared_dir):
+    in_memory = tm_engine.TMModel(shared=False)
+    first = tm_engine.TMModel(shared=True)  # 畳み込んで書き出してから mmap
+    assert sorted(f.rsplit(".", 1)[1] for f in os.listdir(shared_dir)) == ["bin", "json"]
+    second = tm_engine.TMModel(shared=True)  # 書き出し済みのファイルを mmap するだけ
+    weights = [v for _, p in second._ops for v in p.values() if isinstance(v, np.ndarray)]
+    assert weights and all(isinstance(_root_buffer(w), mmap.mmap) for w in weights)  # コピーではなく mmap のビュー
+    assert not any(w.flags.writeable for w in weights)
+    x = _inputs(in_memory)
+    expected = in_memory.forward(x)
+    np.testing.assert_array_equal(first.forward(x), expected)
+    np.testing.assert_array_equal(second.forward(x), expected)
+
+
+class FakeExecutor:
+    def __init__(self, name):
+        self.name = name
+        self.shutdown_called = False
+
+    def submit(self, fn, *args):
+        fut = Future()
+        fut.set_result(self.name)
+        return fut
+
+    def shutdown(self, wait=True):
+        self.shutdown_called = True
+
+
+def test_pool_rebuilds_when_model_signature_changes(monkeypatch):
+    signature = ["v1"]
+    started = []
+
+    def start(self):
+        started.append(FakeExecutor(f"pool{len(started)}"))
+        return started[-1]
+
+    monkeypatch.setattr(inference_pool, "model_signature", lambda model_dir=None: signature[0])
+    monkeypatch.setattr(inference_pool, "POOL_RELOAD_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(inference_pool.InferencePool, "_start", start)
+    pool = inference_pool.InferencePool(2)
+    x = np.zeros((1, 4), dtype=np.float32)
+    assert pool.predict_batch(x) == "pool0"
+    assert pool.predict_batch(x) == "pool0" and len(started) == 1
+    signature[0] = "v2"  # model.json / weights.bin が更新された
+    assert pool.predict_batch(x) == "pool1"
+    assert started[0].shutdown_called and not started[1].shutdown_called
+    assert pool.predict_batch(x) == "pool1" and len(started) == 2
+
+
+def test_process_pool_matches_in_process_model(shared_dir):
+    model = tm_engine.TMModel(shared=True)
+    pool = inference_pool.InferencePool(1)
+    try:
+        assert pool.warm_up(timeout=60) == 1
+        x = _inputs(model)
+        np.testing.assert_array_equal(pool.predict_batch(x), model.forward(x))
+    finally:
+        pool.close()
@@ -0,0 +1,28 @@
+import os
+
+import metrics
+
+
+def test_every_series_has_worker_pid_label():
+    c = metrics.Counter("test_pid_total", "test", ("kind",))
+    c.inc(kind="a")
+    h = metrics.Histogram("test_pid_seconds", "test", buckets=(0.1,))
+    h.observe(0.05)
+    metrics.Gauge("test_pid_gauge", "test", lambda: 3)
+    pid = f'pid="{os.getpid()}"'
+    lines = [l for l in metrics.render().splitlines() if l.startswith("test_pid")]
+    assert f'test_pid_total{{kind="a",{pid}}} 1.0' in lines
+    assert f'test_pid_seconds_bucket{{{pid},le="0.1"}} 1.0' in lines
+    assert f"test_pid_gauge{{{pid}}} 3" in lines
+    assert all(pid in l for l in lines)
+
+
+def test_metrics_endpoint_content_type():
+    from flask import Flask
+
+    app = metrics.init_app(Flask(__name__), token="t")
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 401
+    resp = client.get("/metrics", headers={"Authorization": "Bearer t"})
+    assert resp.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert f'pid="{os.getpid()}"' in resp.get_data(as_text=True)
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+import urllib.request
+
+import pytest
+
+from outbox import Outbox, STATUS_FAILED, STATUS_PENDING, STATUS_SENT
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+import stub_receiver  # noqa: E402
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    """tools/stub_receiver.py を別スレッドで起動する。receiver(reject=..., legacy=...) -> (endpoint, 保存先)。"""
+    servers = []
+
+    def start(reject="", legacy=False, status=0):
+        out = tmp_path / f"received{len(servers)}"
+        out.mkdir()
+        server = stub_receiver.ThreadingHTTPServer(
+            ("127.0.0.1", 0), stub_receiver.make_handler(str(out), 0.0, 0.0, True, reject, legacy, status))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/api/receive_report", out
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _outbox(tmp_path, endpoint, **kwargs):
+    return Outbox(str(tmp_path / "outbox.sqlite3"), endpoint, batch_size=10, timeout=5, linger=0, **kwargs)
+
+
+def test_only_reports_acknowledged_per_item_are_marked_sent(tmp_path, receiver):
+    endpoint, out = receiver(reject="bad")
+    box = _outbox(tmp_path, endpoint)
+    for name in ("r1.txt", "bad1.txt", "r2.txt"):
+        box.enqueue(name, f"content of {name}")
+
+    assert box.flush_once() == 2
+    assert box.status("r1.txt")["status"] == STATUS_SENT
+    assert box.status("r2.txt")["status"] == STATUS_SENT
+    bad = box.status("bad1.txt")
+    assert bad["status"] == STATUS_PENDING
+    assert bad["attempts"] == 1
+    assert bad["last_error"] == "rejected by receiver: rejected"
+    assert sorted(os.listdir(out)) == ["r1.txt", "r2.txt"]
+    box.close()
+
+
+def test_legacy_receiver_never_gets_a_batch_post(tmp_path, receiver):
+    endpoint, out = receiver(legacy=True)
+    box = _outbox(tmp_path, endpoint)
+    for name in ("r1.txt", "r2.txt"):
+        box.enqueue(name, f"content of {name}")
+
+    assert box.flush_once() == 2
+    assert not box.batch_capable
+    box.enqueue("r3.txt", "content of r3.txt")
+    assert box.flush_once() == 1
+    # {"reports": [...]} を1件として保存した時刻名の空レポートができていない
+    assert sorted(os.listdir(out)) == ["r1.txt", "r2.txt", "r3.txt"]
+    for name in ("r1.txt", "r2.txt", "r3.txt"):
+        assert box.status(name)["status"] == STATUS_SENT
+        assert (out / name).read_text(encoding="utf-8") == f"content of {name}"
+    box.close()
+
+
+def _posts(endpoint):
+    with urllib.request.urlopen(endpoint) as resp:  # stub の GET は受信の統計を返す
+        return json.loads(resp.read())["posts"]
+
+
+def test_batch_posts_start_after_receiver_reports_capability(tmp_path, receiver):
+    endpoint, out = receiver()
+    box = _outbox(tmp_path, endpoint)
+    for i in range(4):
+        box.enqueue(f"r{i}.txt", "content")
+
+    posts = _posts(endpoint)
+    assert box.flush_once() == 4
+    assert box.batch_capable
+    assert _posts(endpoint) - posts == 2  # 確認用の1件 + 残り3件をまとめて
+    for i in range(4, 9):
+        box.enqueue(f"r{i}.txt", "content")
+    posts = _posts(endpoint)
+    assert box.flush_once() == 5
+    assert _posts(endpoint) - posts == 1
+    assert len(os.listdir(out)) == 9
+    box.close()
+
+
+def test_4xx_marks_report_failed_without_retrying(tmp_path, receiver):
+    endpoint, _ = receiver(status=422)
+    box = _outbox(tmp_path, endpoint, base_backoff=0)
+    box.enqueue("r1.txt", "content")
+
+    assert box.flush_once() == 0
+    row = box.status("r1.txt")
+    assert row["status"] == STATUS_FAILED
+    assert row["last_error"] == "rejected by receiver: HTTP 422"
+    assert box.stats()["failed"] == 1 and box.stats()["pending"] == 0
+    assert box._claim() == []
+    box.close()
+
+
+def test_repeated_per_item_rejection_becomes_failed(tmp_path, receiver):
+    endpoint, _ = receiver(reject="bad")
+    box = _outbox(tmp_path, endpoint, base_backoff=0, max_rejections=2)
+    box.enqueue("bad1.txt", "content")
+
+    box.flush_once()
+    assert box.status("bad1.txt")["status"] == STATUS_PENDING
+    box.flush_once()
+    row = box.status("bad1.txt")
+    assert row["status"] == STATUS_FAILED and row["attempts"] == 2
+    assert box._claim() == []
+
+    # 同じファイル名で積み直せば（内容を直した再送など）また送る
+    box.enqueue("bad1.txt", "fixed")
+    assert box.status("bad1.txt")["status"] == STATUS_PENDING
+    box.close()
+
+
+def test_old_database_gets_new_columns(tmp_path, receiver):
+    endpoint, _ = receiver()
+    conn = sqlite3.connect(str(tmp_path / "outbox.sqlite3"))
+    conn.execute("CREATE TABLE outbox (filename TEXT PRIMARY KEY, content TEXT NOT NULL,"
+                 " status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+                 " next_attempt REAL NOT NULL DEFAULT 0, last_error TEXT NOT NULL DEFAULT '',"
+                 " created_at REAL NOT NULL, sent_at REAL)")
+    conn.execute("INSERT INTO outbox (filename, content, created_at) VALUES ('r1.txt', 'content', 0)")
+    conn.commit()
+    conn.close()
+
+    box = _outbox(tmp_path, endpoint)
+    assert box.flush_once() == 1
+    assert box.status("r1.txt")["status"] == STATUS_SENT
+    box.close()
+
+
+def test_api_report_returns_forward_status(load_app, receiver):
+    endpoint, _ = receiver()
+    app = load_app(AUDITOR_ENDPOINT=endpoint)
+    app.OUTBOX.close()  # 送信スレッドは止めて、積まれた直後の状態を見る
+    try:
+        res = app.app.test_client().post("/api/report", json={"clientReportId": "client-0001", "roomId": "101"})
+        body = res.get_json()
+        assert body["sent_to_auditor"] == body["forward_status"] == "queued"
+        assert app.OUTBOX.flush_once() == 1
+        res = app.app.test_client().post("/api/report", json={"clientReportId": "client-0001", "roomId": "101"})
+        assert res.get_json()["duplicate"] and res.get_json()["sent_to_auditor"] == "sent"
+    finally:
+        app.OUTBOX.close()
+
+
+def test_claimed_reports_are_not_sent_by_another_worker(tmp_path, receiver):
+    endpoint, _ = receiver()
+    worker_a = _outbox(tmp_path, endpoint)
+    worker_b = _outbox(tmp_path, endpoint)
+    worker_a.enqueue("r1.txt", "content")
+
+    claimed = worker_a._claim()
+    assert [r["filename"] for r in claimed] == ["r1.txt"]
+    assert worker_b._claim() == []
+    assert worker_b.flush_once() == 0
+
+    worker_a._mark_sent(["r1.txt"])
+    assert worker_b.status("r1.txt")["status"] == STATUS_SENT
+    worker_a.close()
+    worker_b.close()
+
+
+def test_expired_lease_can_be_taken_over(tmp_path, receiver):
+    endpoint, _ = receiver()
+    crashed = _outbox(tmp_path, endpoint, lease=0)
+    crashed.enqueue("r1.txt", "content")
+    assert crashed._claim()
+
+    other = _outbox(tmp_path, endpoint)
+    assert other.flush_once() == 1
+    assert other.status("r1.txt")["status"] == STATUS_SENT
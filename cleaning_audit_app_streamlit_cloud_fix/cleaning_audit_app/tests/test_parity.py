@@ -0,0 +1,13 @@
+import os
+
+import tm_engine
+
+RECORDED = os.path.join(os.path.dirname(__file__), "fixtures", "parity", "recorded.json")
+
+
+def test_engine_matches_recorded_component_output():
+    # recorded.json は tools/record_parity.py でコンポーネントと同じ画素計算・同じレイヤー構成から記録したもの
+    report = tm_engine.check_parity(RECORDED, tolerance=1e-3)
+    assert report["cases"] >= 5
+    assert report["top1_agreement"] == 1.0
+    assert report["ok"], report["rows"]
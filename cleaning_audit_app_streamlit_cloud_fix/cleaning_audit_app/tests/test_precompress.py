@@ -0,0 +1,108 @@
+import os
+import gzip
+
+from flask import Flask, request
+
+import precompress
+
+
+def make_app(tmp_path):
+    (tmp_path / "report.txt").write_text("CLEANING_REPORT_V1\n" + "x" * 4096, encoding="utf-8")
+    (tmp_path / "app.js").write_text("console.log(1);\n" * 200, encoding="utf-8")
+    app = Flask(__name__)
+
+    @app.get("/f/<name>")
+    def serve(name):
+        mimetype = "text/plain" if name.endswith(".txt") else None
+        return precompress.send_file(request, str(tmp_path / name), str(tmp_path / "variants"), mimetype=mimetype)
+
+    return app.test_client()
+
+
+def test_text_content_type_has_single_charset(tmp_path):
+    client = make_app(tmp_path)
+    for path in ("/f/report.txt", "/f/app.js"):
+        for accept in ("", "gzip"):
+            resp = client.get(path, headers={"Accept-Encoding": accept})
+            assert resp.status_code == 200
+            ctype = resp.headers["Content-Type"]
+            assert ctype.count("charset") == 1, ctype
+    assert client.get("/f/report.txt").headers["Content-Type"] == "text/plain; charset=utf-8"
+
+
+def test_gzip_variant_round_trips(tmp_path):
+    client = make_app(tmp_path)
+    resp = client.get("/f/report.txt", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.data).startswith(b"CLEANING_REPORT_V1")
+    again = client.get("/f/report.txt", headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def make_report_app(tmp_path, reports, max_bytes=None):
+    """レポート（name → (内容, mtime_ns)）を app._send_report と同じ形で配信する。"""
+    app = Flask(__name__)
+
+    @app.get("/r/<name>")
+    def serve(name):
+        data, mtime_ns = reports[name]
+        return precompress.send_data(request, name, mtime_ns / 1e9, mtime_ns, len(data), lambda: data,
+                                     str(tmp_path / "variants"), mimetype="text/plain",
+                                     content_addressed=True, max_variants_bytes=max_bytes)
+
+    return app.test_client()
+
+
+def _report(i, n=2048):
+    return (f"CLEANING_REPORT_V1\nreport_id: r{i}\n" + f"task{i}: done\n" * n).encode("utf-8")
+
+
+def _gunzip(client, name):
+    resp = client.get(f"/r/{name}", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    return gzip.decompress(resp.data)
+
+
+def _variant_files(tmp_path):
+    return sorted(p.name for p in (tmp_path / "variants").iterdir())
+
+
+def test_overwritten_report_gets_a_fresh_variant(tmp_path):
+    reports = {"a.txt": (_report(1), 1_000)}
+    client = make_report_app(tmp_path, reports)
+    assert _gunzip(client, "a.txt") == _report(1)
+    first = _variant_files(tmp_path)
+    assert first == [precompress.data_digest("a.txt", 1_000, len(_report(1)), lambda: _report(1)) + ".txt.gz"]
+    reports["a.txt"] = (_report(2), 2_000)  # 上書き（更新時刻は古いコピーより前でもよい）
+    assert _gunzip(client, "a.txt") == _report(2)
+    assert len(_variant_files(tmp_path)) == 2
+
+
+def test_same_content_shares_one_variant(tmp_path):
+    client = make_report_app(tmp_path, {"a.txt": (_report(1), 1_000), "b.txt": (_report(1), 5_000)})
+    assert _gunzip(client, "a.txt") == _gunzip(client, "b.txt") == _report(1)
+    assert len(_variant_files(tmp_path)) == 1
+
+
+def test_variants_dir_stays_within_cap_and_rebuilds_evicted(tmp_path):
+    cap = 16 * precompress._MIN_FILE_BYTES
+    reports = {f"r{i}.txt": (_report(i), 1_000 + i) for i in range(40)}
+    client = make_report_app(tmp_path, reports, max_bytes=cap)
+    for i in range(40):
+        assert _gunzip(client, f"r{i}.txt") == _report(i)
+        sizes = [max(p.stat().st_size, precompress._MIN_FILE_BYTES) for p in (tmp_path / "variants").iterdir()]
+        assert sum(sizes) <= cap + cap * precompress._PRUNE_EVERY  # 整理の間隔ぶんまでしか超えない
+    assert len(_variant_files(tmp_path)) < 40
+    assert _gunzip(client, "r0.txt") == _report(0)  # 消された古いコピーは作り直す
+
+
+def test_prune_dir_removes_oldest_first(tmp_path):
+    unit = precompress._MIN_FILE_BYTES
+    for i in range(5):
+        p = tmp_path / f"v{i}.gz"
+        p.write_bytes(b"x" * unit)
+        os.utime(p, ns=(i * 10**9, i * 10**9))
+    assert precompress.prune_dir(str(tmp_path), 5 * unit) == 0
+    assert precompress.prune_dir(str(tmp_path), 3 * unit, keep=(str(tmp_path / "v0.gz"),)) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v0.gz", "v4.gz"]
+    assert precompress.prune_dir(str(tmp_path / "missing"), unit) == 0
@@ -0,0 +1,20 @@
+from prediction_cache import PredictionCache
+
+
+def test_result_computed_before_model_change_is_not_cached():
+    version = ["a"]
+    cache = PredictionCache(version_fn=lambda: version[0], check_interval=0)
+
+    def compute():
+        version[0] = "b"  # 推論中にモデルが更新された
+        return [{"className": "good", "probability": 1.0}]
+
+    assert cache.get_or_compute("img", compute)
+    assert cache.get("img") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_put_with_current_version_is_cached():
+    cache = PredictionCache(version_fn=lambda: "a", check_interval=0)
+    cache.put("img", [1], cache.version)
+    assert cache.get("img") == [1]
@@ -0,0 +1,33 @@
+import io
+
+from PIL import Image
+
+import preprocess
+
+
+def _encode(fmt, frames):
+    buf = io.BytesIO()
+    frames[0].save(buf, fmt, save_all=True, append_images=frames[1:])
+    return buf.getvalue()
+
+
+def test_mpo_is_classified_as_a_single_photo():
+    # 深度マップ付きの JPEG（MPO）は n_frames=2 だが連写ではない
+    data = _encode("MPO", [Image.new("RGB", (64, 48), "red"), Image.new("RGB", (32, 24), "blue")])
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.n_frames == 2
+    assert preprocess.frame_count(data) == 1
+    assert not preprocess.is_multi_frame(data)
+    frames, total = preprocess.open_frames(data, 16, False)
+    frames = list(frames)
+    assert total == 1 and len(frames) == 1
+    r, g, b = frames[0].getpixel((8, 8))
+    assert r > 200 and b < 50  # 先頭（赤）の1枚
+
+
+def test_animated_gif_is_multi_frame():
+    data = _encode("GIF", [Image.new("RGB", (32, 32), c) for c in ("red", "green", "blue")])
+    assert preprocess.frame_count(data) == 3
+    assert preprocess.is_multi_frame(data)
+    frames, total = preprocess.open_frames(data, 16, False, max_frames=2)
+    assert total == 2 and len(list(frames)) == 2
@@ -0,0 +1,139 @@
+import os
+import sys
+
+import pytest
+
+import report_codec
+import report_store
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import synth  # noqa: E402
+
+CANONICAL = (
+    "CLEANING_REPORT_V1\n"
+    "report_id: abc123\n"
+    "roomId: 101\n"
+    "cleanerId: USER_01\n"
+    "startedAt: 2026-01-01T00:00:00.000Z\n"
+    "finishedAt: 2026-01-01T00:30:00.000Z\n"
+    "durationSeconds: 1800\n"
+    "totalScore: 40\n"
+    "\n"
+    "tasks:\n"
+    "- id: trash\n"
+    "  status: done\n"
+    "  score: 10\n"
+    "  checkedAt: 2026-01-01T00:10:00.000Z\n"
+    "  notes: \n"
+    "- id: bed\n"
+    "  status: done\n"
+    "  score: 30\n"
+    "  checkedAt: 2026-01-01T00:20:00.000Z\n"
+    "  notes: シーツ交換済み\n"
+)
+
+NON_CANONICAL = {
+    "crlf": CANONICAL.replace("\n", "\r\n"),
+    "extra_lines": CANONICAL.replace("tasks:\n", "# comment\ntasks:\n\n").replace("totalScore: 40\n",
+                                                                                  "totalScore:   40  \nextra: x\n"),
+    "multiline_notes": CANONICAL.replace("  notes: シーツ交換済み\n", "  notes: シーツ交換済み\n  枕カバーも交換\n"),
+    "missing_line": CANONICAL.replace("durationSeconds: 1800\n", ""),
+    "no_trailing_newline": CANONICAL[:-1],
+}
+
+
+def _legacy_report_text(data, report_id):
+    # report_codec 導入前の app._report_text（書き出しがバイト単位で同じことの確認用）
+    lines = ["CLEANING_REPORT_V1", f"report_id: {report_id}"]
+    for k in ("roomId", "cleanerId", "startedAt", "finishedAt", "durationSeconds", "totalScore"):
+        lines.append(f"{k}: {data.get(k, '')}")
+    lines += ["", "tasks:"]
+    for tid, tinfo in (data.get("tasks") or {}).items():
+        lines.append(f"- id: {tid}")
+        for k in ("status", "score", "checkedAt", "notes"):
+            lines.append(f"  {k}: {(tinfo or {}).get(k, '')}")
+    return "\n".join(lines) + "\n"
+
+
+def test_canonical_round_trip_uses_fast_path():
+    assert report_codec._decode_canonical(CANONICAL) is not None
+    report = report_codec.decode(CANONICAL)
+    assert report.layout is None
+    assert report.room_id == "101" and report.total_score_value == 40
+    assert [t.id for t in report.tasks] == ["trash", "bed"]
+    assert report.tasks[1].notes == "シーツ交換済み"
+    assert report_codec.encode(report) == CANONICAL
+
+
+@pytest.mark.parametrize("name", sorted(NON_CANONICAL))
+def test_non_canonical_round_trip_is_byte_identical(name):
+    text = NON_CANONICAL[name]
+    assert report_codec._decode_canonical(text) is None
+    report = report_codec.decode(text)
+    assert report_codec.encode(report) == text
+    assert report_codec.encode_bytes(report) == text.encode("utf-8")
+
+
+def test_non_canonical_values_are_read_and_substituted():
+    report = report_codec.decode(NON_CANONICAL["crlf"])
+    assert report.room_id == "101" and report.tasks[1].notes == "シーツ交換済み"
+    report.tasks[1].notes = "再清掃"
+    assert report_codec.encode(report) == NON_CANONICAL["crlf"].replace("シーツ交換済み", "再清掃")
+
+    report = report_codec.decode(NON_CANONICAL["extra_lines"])
+    assert report.total_score == "40"
+    assert report_codec.encode(report).count("totalScore:   40  \n") == 1
+
+    # 複数行のメモ: 1行目が値、続きの行は知らない行としてそのまま残る
+    report = report_codec.decode(NON_CANONICAL["multiline_notes"])
+    assert report.tasks[1].notes == "シーツ交換済み"
+
+
+def test_layout_is_dropped_when_task_count_changes():
+    report = report_codec.decode(NON_CANONICAL["crlf"])
+    report.tasks.append(report_codec.TaskEntry("sink", "todo", "0"))
+    text = report_codec.encode(report)
+    assert "\r" not in text and report_codec._decode_canonical(text) is not None
+
+
+@pytest.mark.parametrize("text", [CANONICAL] + [NON_CANONICAL[k] for k in sorted(NON_CANONICAL)])
+def test_fast_path_and_decode_lines_agree(text):
+    fast = report_codec.decode(text)
+    slow = report_codec.decode_lines(report_codec._lines(text))
+    assert fast == slow
+    assert report_codec.encode(fast) == report_codec.encode(slow) == text
+
+
+def test_read_from_file_object_keeps_crlf(tmp_path):
+    path = tmp_path / "r.txt"
+    path.write_bytes(NON_CANONICAL["crlf"].encode("utf-8"))
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        report = report_codec.read(f)
+    assert report_codec.encode(report) == NON_CANONICAL["crlf"]
+
+
+def test_writers_match_previous_format():
+    payloads = synth.payloads(20, seed=3)
+    payloads.append({"roomId": "101", "cleanerId": "U", "tasks": {"bed": {"status": "done", "notes": "a\nb"},
+                                                                   "amen": None}})
+    for i, payload in enumerate(payloads):
+        report_id = f"id{i:04d}"
+        expected = _legacy_report_text(payload, report_id)
+        assert report_codec.encode(report_codec.Report.from_payload(payload, report_id)) == expected
+        assert synth.report_text(payload, report_id) == expected
+        assert report_codec.encode(report_codec.decode(expected)) == expected
+
+
+def test_decode_many_matches_decode(tmp_path):
+    store = report_store.FileReportStore(str(tmp_path))
+    texts = {f"cleaning_report_{i:04d}.txt": synth.report_text(p, f"{i:04d}")
+             for i, p in enumerate(synth.payloads(10, seed=5))}
+    texts["cleaning_report_crlf.txt"] = NON_CANONICAL["crlf"]
+    store.write_many(texts.items())
+    names = sorted(texts) + ["cleaning_report_missing.txt"]
+    got = list(report_codec.decode_many(store, names))
+    assert [name for name, _ in got] == sorted(texts)
+    for name, report in got:
+        assert report == report_codec.decode(texts[name])
+        assert report_codec.encode(report) == texts[name]
+    assert report_codec.decode_all(texts[n] for n in sorted(texts)) == [r for _, r in got]
@@ -0,0 +1,119 @@
+import io
+import csv
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+import report_codec
+import report_export
+import report_store
+
+MTIME = time.mktime((2026, 3, 4, 10, 20, 30, 0, 0, -1))
+
+
+def _report(i, room, cleaner, day, score):
+    payload = {"roomId": room, "cleanerId": cleaner, "startedAt": f"{day}T11:00:00.000Z",
+               "finishedAt": f"{day}T12:00:00.000Z", "durationSeconds": 3600, "totalScore": score,
+               "tasks": {"trash": {"status": "done", "score": score, "notes": "メモ"}, "bed": {"status": "todo"}}}
+    return f"cleaning_report_exp{i:03d}.txt", report_codec.encode(report_codec.Report.from_payload(payload, f"exp{i}"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = report_store.FileReportStore(str(tmp_path / "reports"))
+    texts = dict(_report(i, "101", "c1", "2026-03-04", 10 * i) for i in range(3))
+    texts["cleaning_report_empty.txt"] = ""
+    # 圧縮が効かず COPY_CHUNK を何回もまたぐ大きさ
+    texts["cleaning_report_big.txt"] = os.urandom(3 * report_export.COPY_CHUNK // 2).hex()
+    for fn, text in texts.items():
+        store.write(fn, text, mtime=MTIME)
+    return store, texts
+
+
+def _unzip(store, names):
+    data = b"".join(report_export.iter_zip(store, names))
+    return data, zipfile.ZipFile(io.BytesIO(data))
+
+
+def test_zip_export_opens_with_zipfile(store):
+    store, texts = store
+    names = sorted(texts) + ["cleaning_report_missing.txt"]  # 無いものは飛ばす
+    data, zf = _unzip(store, names)
+    assert zf.testzip() is None
+    assert zf.namelist() == sorted(texts)
+    for info in zf.infolist():
+        assert zf.read(info).decode("utf-8") == texts[info.filename]
+        assert info.compress_type == zipfile.ZIP_DEFLATED and info.flag_bits & 0x0808 == 0x0808
+        assert info.date_time == time.localtime(MTIME)[:6]
+    assert b"PK\x06\x06" not in data  # 件数が少なければ ZIP64 の終端レコードは付けない
+
+
+def test_zip_export_with_no_reports_is_an_empty_archive(store):
+    store, _ = store
+    data, zf = _unzip(store, [])
+    assert zf.namelist() == [] and zf.testzip() is None
+    assert data == b"PK\x05\x06" + b"\0" * 18
+
+
+def test_zip64_end_records_when_entry_count_exceeds_limit(store, monkeypatch):
+    store, texts = store
+    monkeypatch.setattr(report_export, "_ZIP64_MAX_ENTRIES", 2)
+    data, zf = _unzip(store, sorted(texts))
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data  # ZIP64 終端レコード + ロケーター
+    assert zf.testzip() is None
+    assert zf.namelist() == sorted(texts)
+    assert [zf.read(n).decode("utf-8") for n in sorted(texts)] == [texts[n] for n in sorted(texts)]
+
+
+@pytest.fixture
+def app(load_app):
+    app = load_app()
+    app._save_reports([
+        _report(0, "101", "c1", "2026-03-01", 40),
+        _report(1, "101", "c2", "2026-03-02", 80),
+        _report(2, "102", "c1", "2026-03-02", 90),
+        _report(3, "101", "c1", "2026-03-05", 95),
+        _report(4, "101", "c1", "2026-03-03", 20),
+    ])
+    return app
+
+
+def _export(app, **args):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session["auditor_ok"] = True
+    res = client.get("/auditor/export", query_string=args)
+    assert res.status_code == 200
+    return res
+
+
+def test_csv_and_ndjson_exports_honour_filters(app):
+    filters = {"room": "101", "cleaner": "c1", "date_from": "2026-03-01", "date_to": "2026-03-04", "min_score": 30}
+    res = _export(app, format="csv", **filters)
+    assert res.content_type == "text/csv; charset=utf-8"
+    assert res.headers["Content-Disposition"] == \
+        'attachment; filename="cleaning_reports_101_c1_2026-03-01_2026-03-04.csv"'
+    text = res.get_data().decode("utf-8")
+    assert text.startswith("\ufeff")
+    rows = list(csv.DictReader(io.StringIO(text[1:])))
+    assert list(rows[0]) == report_export.CSV_COLUMNS
+    # 部屋101・清掃者c1・3/1〜3/4・30点以上 → exp000 のみ（タスク2件で2行）
+    assert [(r["filename"], r["task_id"]) for r in rows] == \
+        [("cleaning_report_exp000.txt", "trash"), ("cleaning_report_exp000.txt", "bed")]
+    assert rows[0]["notes"] == "メモ" and rows[0]["totalScore"] == "40"
+
+    res = _export(app, format="ndjson", room="101", max_score=50)
+    assert res.content_type == "application/x-ndjson; charset=utf-8"
+    records = [json.loads(line) for line in res.get_data().decode("utf-8").splitlines()]
+    assert sorted({r["filename"] for r in records}) == ["cleaning_report_exp000.txt", "cleaning_report_exp004.txt"]
+    assert len(records) == 4 and {r["roomId"] for r in records} == {"101"}
+
+
+def test_zip_export_honours_filters(app):
+    zf = zipfile.ZipFile(io.BytesIO(_export(app, format="zip", date_from="2026-03-02", date_to="2026-03-02").data))
+    assert zf.testzip() is None
+    assert sorted(zf.namelist()) == ["cleaning_report_exp001.txt", "cleaning_report_exp002.txt"]
+    assert zf.read("cleaning_report_exp001.txt").decode("utf-8") == app.REPORT_STORE.read("cleaning_report_exp001.txt")
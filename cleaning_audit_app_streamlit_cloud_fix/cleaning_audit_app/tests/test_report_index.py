@@ -0,0 +1,167 @@
+import os
+import time
+
+import pytest
+
+import report_codec
+import report_index
+import report_store
+
+T0 = time.mktime((2026, 2, 1, 9, 0, 0, 0, 0, -1))
+
+# (roomId, cleanerId, finishedAt, totalScore)
+REPORTS = [
+    ("101", "c1", "2026-02-01T01:00:00.000Z", "9"),
+    ("101", "c2", "2026-02-01T05:00:00.000Z", "10"),
+    ("102", "c1", "2026-02-02T03:00:00.000Z", "75"),
+    ("103", "c1", "2026-02-03T03:00:00.000Z", "100"),
+    ("102", "c2", "2026-02-03T06:00:00.000Z", "55.5"),
+    ("101", "c1", "2026-02-04T02:00:00.000Z", ""),
+    ("104", "c3", "2026-02-05T18:00:00.000Z", "30"),  # 日本時間では 2/6
+]
+
+
+@pytest.fixture
+def local_tz():
+    """サーバーの現地時刻を切り替える（time.tzset のある環境のみ）。"""
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset is not available")
+    saved = os.environ.get("TZ")
+
+    def set_tz(name):
+        os.environ["TZ"] = name
+        time.tzset()
+
+    set_tz("UTC")
+    yield set_tz
+    if saved is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = saved
+    time.tzset()
+
+
+def _text(i, room, cleaner, finished, score):
+    return report_codec.encode(report_codec.Report.from_payload(
+        {"roomId": room, "cleanerId": cleaner, "finishedAt": finished, "totalScore": score,
+         "tasks": {"trash": {"status": "done"}}}, f"idx{i}"))
+
+
+def _name(i):
+    return f"cleaning_report_idx{i}.txt"
+
+
+@pytest.fixture
+def index(tmp_path, local_tz):
+    store = report_store.FileReportStore(str(tmp_path / "reports"))
+    for i, r in enumerate(REPORTS):
+        store.write(_name(i), _text(i, *r), mtime=T0 + i * 60)
+    parsed = []
+
+    def parse(text):
+        meta = report_codec.decode(text).summary()
+        parsed.append(meta.get("report_id"))
+        return meta
+
+    idx = report_index.ReportIndex(store, str(tmp_path / "var" / "report_index.sqlite3"), parse)
+    idx.parsed = parsed
+    assert idx.ensure_fresh()
+    return idx
+
+
+def _names(result):
+    return [r["filename"] for r in result["reports"]]
+
+
+def test_pagination_covers_every_report_once(index):
+    pages = [index.query(page=p, per_page=3) for p in (1, 2, 3)]
+    assert [p["total"] for p in pages] == [7, 7, 7] and pages[0]["pages"] == 3
+    assert [len(p["reports"]) for p in pages] == [3, 3, 1]
+    assert sorted(n for p in pages for n in _names(p)) == sorted(_name(i) for i in range(7))
+    # 既定は更新時刻の新しい順
+    assert _names(pages[0]) == [_name(6), _name(5), _name(4)]
+    assert index.query(page=4, per_page=3)["reports"] == []
+    assert index.query(page=0, per_page=0)["page"] == 1 and index.query(per_page=0)["per_page"] == 1
+    assert index.query(per_page=10_000)["per_page"] == 500
+
+
+def test_sorting(index):
+    # スコアは数値で並べる（"9" < "10" < "55.5"）、スコアの無いもの（NULL）は昇順で先頭
+    by_score = _names(index.query(sort="totalScore", order="asc"))
+    assert by_score == [_name(i) for i in (5, 0, 1, 6, 4, 2, 3)]
+    assert _names(index.query(sort="totalScore", order="desc")) == by_score[::-1]
+    assert _names(index.query(sort="mtime", order="asc")) == [_name(i) for i in range(7)]
+    # 同じ値の中はファイル名で並べる（ページをまたいでも順序が変わらない）
+    assert _names(index.query(sort="roomId", order="asc")) == [_name(i) for i in (0, 1, 5, 2, 4, 3, 6)]
+    # 知らない列名は更新時刻として扱う（SQL に埋め込まない）
+    assert _names(index.query(sort="filename; DROP TABLE reports")) == [_name(i) for i in range(6, -1, -1)]
+
+
+def test_filters(index):
+    assert _names(index.query(room="101", order="asc")) == [_name(i) for i in (0, 1, 5)]
+    assert _names(index.query(cleaner="c2", order="asc")) == [_name(1), _name(4)]
+    assert _names(index.query(date_from="2026-02-02", date_to="2026-02-03", order="asc")) == \
+        [_name(i) for i in (2, 3, 4)]
+    assert _names(index.query(date_from="2026-02-04", order="asc")) == [_name(5), _name(6)]
+    assert _names(index.query(min_score=10, max_score=75, order="asc")) == [_name(i) for i in (1, 2, 4, 6)]
+    assert _names(index.query(room="101", cleaner="c1", max_score=50)) == [_name(0)]
+    assert list(index.iter_filenames(batch_size=2, cleaner="c1")) == [_name(i) for i in (0, 2, 3, 5)]
+
+
+def test_date_filter_uses_server_local_date(tmp_path, local_tz):
+    local_tz("Asia/Tokyo")
+    store = report_store.FileReportStore(str(tmp_path / "reports"))
+    # 日本時間 2/2 08:30 / 2/2 09:30 / 2/2 23:59 の完了（UTC ではそれぞれ 2/1, 2/2, 2/2）
+    for i, finished in enumerate(["2026-02-01T23:30:00.000Z", "2026-02-02T00:30:00.000Z", "2026-02-02T14:59:00Z"]):
+        store.write(_name(i), _text(i, "101", "c1", finished, "1"))
+    store.write(_name(3), _text(3, "101", "c1", "2026-02-03T08:00:00", "1"))  # 時差の無い時刻はそのまま
+    store.write(_name(4), _text(4, "101", "c1", "", "1"))
+    idx = report_index.ReportIndex(store, str(tmp_path / "var" / "idx.sqlite3"),
+                                   lambda t: report_codec.decode(t).summary())
+    idx.sync()
+    assert _names(idx.query(date_from="2026-02-02", date_to="2026-02-02", sort="filename", order="asc")) == \
+        [_name(0), _name(1), _name(2)]
+    assert _names(idx.query(date_from="2026-02-03")) == [_name(3)]
+    days = {r["filename"]: r["day"] for r in idx.iter_records()}
+    assert days[_name(0)] == "2026-02-02" and days[_name(3)] == "2026-02-03"
+    assert days[_name(4)] == time.strftime("%Y-%m-%d")  # 完了時刻の無いものは更新時刻（現地時刻）の日付
+
+
+def test_old_schema_is_reindexed_with_local_dates(tmp_path, index, local_tz):
+    local_tz("Asia/Tokyo")
+    conn = index._conn()
+    conn.execute("UPDATE index_state SET value = '2' WHERE key = 'schema_version'")
+    conn.execute("UPDATE reports SET finishedDate = substr(finishedAt, 1, 10)")  # 以前の UTC の日付
+    conn.commit()
+    del index.parsed[:]
+    assert _names(index.query(date_from="2026-02-06")) == []
+    reopened = report_index.ReportIndex(index.store, index.db_path, index.parse_meta)
+    assert reopened.ensure_fresh()  # 形式が変わったので全件読み直す
+    assert len(index.parsed) == 7
+    assert _names(reopened.query(date_from="2026-02-06")) == [_name(6)]
+    assert _names(reopened.query(date_from="2026-02-05", date_to="2026-02-05")) == []
+
+
+def test_incremental_resync_reads_only_changed_reports(index):
+    del index.parsed[:]
+    assert not index.ensure_fresh()  # 何も変わっていなければ読まない
+    assert index.parsed == []
+
+    other = report_store.FileReportStore(index.store.root)  # 別のワーカー・外部からの変更
+    other.write(_name(2), _text(2, "102", "c1", "2026-02-02T03:00:00.000Z", "80"), mtime=T0 + 2 * 60)  # 同じ大きさ
+    other.write(_name(7), _text(7, "105", "c4", "2026-02-06T03:00:00.000Z", "60"), mtime=T0 + 7 * 60)
+    other.delete(_name(0))
+    assert index.ensure_fresh()
+    # mtime・大きさが同じなら読み直さない（2 は mtime を元に戻して書いたので気づかない）
+    assert index.parsed == ["idx7"]
+    assert index.count() == 7 and index.get(_name(0)) is None
+    assert index.get(_name(2))["totalScore"] == "75"
+
+    # mtime が変われば（大きさが同じでも）読み直す
+    path = index.store.path(_name(2))
+    os.utime(path, (T0 + 3600, T0 + 3600))
+    del index.parsed[:]
+    index.sync()
+    assert index.parsed == ["idx2"]
+    assert index.get(_name(2))["totalScore"] == "80"
+    assert _names(index.query(min_score=80, max_score=90)) == [_name(2)]
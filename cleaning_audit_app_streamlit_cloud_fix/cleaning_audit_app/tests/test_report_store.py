@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import report_store
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+import migrate_reports  # noqa: E402
+
+OLD = time.mktime((2025, 1, 15, 12, 0, 0, 0, 0, -1))
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, fs in os.walk(root) for f in fs)
+
+
+def test_rewrite_from_another_worker_keeps_a_single_copy(tmp_path):
+    root = str(tmp_path)
+    worker_a = report_store.FileReportStore(root)
+    worker_b = report_store.FileReportStore(root)
+    worker_b.scan()  # 書き込み前に一覧済み（古い日付のディレクトリをまだ知らない）
+    worker_a.write("cleaning_report_a.txt", "v1", mtime=OLD)
+    worker_b.write("cleaning_report_a.txt", "v2")
+    assert _files(root) == [os.path.join("2025", "01", "15", "cleaning_report_a.txt")]
+    assert [fn for fn, _ in worker_b.scan()] == ["cleaning_report_a.txt"]
+    assert worker_a.read("cleaning_report_a.txt") == "v2"
+
+
+def test_rewrite_of_legacy_root_file_stays_in_root(tmp_path):
+    (tmp_path / "cleaning_report_old.txt").write_text("v1", encoding="utf-8")
+    store = report_store.FileReportStore(str(tmp_path))
+    store.write("cleaning_report_old.txt", "v2")
+    assert _files(str(tmp_path)) == ["cleaning_report_old.txt"]
+    assert store.read("cleaning_report_old.txt") == "v2"
+
+
+def test_failed_write_leaves_previous_content_and_no_temp_file(tmp_path, monkeypatch):
+    store = report_store.FileReportStore(str(tmp_path))
+    store.write("cleaning_report_a.txt", "v1")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(report_store.os, "replace", fail)
+    with pytest.raises(OSError):
+        store.write("cleaning_report_a.txt", "v2")
+    monkeypatch.undo()
+    assert store.read("cleaning_report_a.txt") == "v1"
+    assert [f for f in _files(str(tmp_path)) if f.endswith(".tmp")] == []
+
+
+def test_readers_never_see_a_partial_file(tmp_path):
+    store = report_store.FileReportStore(str(tmp_path))
+    texts = ["a" * 200_000, "b" * 300_000]
+    store.write("cleaning_report_a.txt", texts[0])
+    seen, stop = set(), threading.Event()
+
+    def reader():
+        other = report_store.FileReportStore(str(tmp_path))
+        while not stop.is_set():
+            seen.add(other.read("cleaning_report_a.txt"))
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for i in range(200):
+        store.write("cleaning_report_a.txt", texts[i % 2])
+    stop.set()
+    t.join()
+    assert seen <= set(texts)
+
+
+def test_sqlite_concurrent_writers(tmp_path):
+    db = str(tmp_path / "reports.sqlite3")
+    errors = []
+
+    def worker(w):
+        store = report_store.SQLiteReportStore(db)  # ワーカーごとに別の接続
+        try:
+            for i in range(25):
+                store.write_many([(f"cleaning_report_{w}_{i}_{j}.txt", f"{w}/{i}/{j}") for j in range(4)])
+                store.write(f"cleaning_report_shared_{i}.txt", f"{w}")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            store.close()
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    store = report_store.SQLiteReportStore(db)
+    names = [fn for fn, _ in store.scan()]
+    assert len(names) == 6 * 25 * 4 + 25
+    assert store.read("cleaning_report_3_7_2.txt") == "3/7/2"
+    assert store.version() == str(6 * 25 * 2)  # 書き込みのたびに1つずつ増える（取りこぼし無し）
+
+
+def test_migrate_preserves_mtimes(tmp_path):
+    src = tmp_path / "reports"
+    src.mkdir()
+    mtimes = {}
+    for i, ts in enumerate([OLD, OLD + 86400 * 40, time.time() - 3600]):
+        p = src / f"cleaning_report_{i}.txt"
+        p.write_text(f"report {i}", encoding="utf-8")
+        os.utime(p, (ts, ts))
+        mtimes[p.name] = os.stat(p).st_mtime_ns
+
+    db = report_store.SQLiteReportStore(str(tmp_path / "reports.sqlite3"))
+    assert migrate_reports.copy_store(str(src), db, batch_size=2, delete_source=False, dry_run=False) == 3
+    copied = dict(db.scan())
+    assert copied.keys() == mtimes.keys()
+    # SQLite には秒（float）から作った値が入るので、1マイクロ秒未満の差は許す
+    assert all(abs(copied[fn].mtime_ns - m) < 1000 for fn, m in mtimes.items())
+
+    assert migrate_reports.shard_in_place(str(src)) == 3
+    fs = report_store.FileReportStore(str(src))
+    assert {fn: st.mtime_ns for fn, st in fs.scan()} == mtimes
+    for fn, m in mtimes.items():
+        shard = report_store.FileReportStore.shard_for(m / 1e9)
+        assert os.path.isfile(os.path.join(str(src), shard, fn))
+    assert not [f for f in os.listdir(src) if f.endswith(".txt")]
+
+
+@pytest.mark.parametrize("kind", report_store.STORE_KINDS)
+def test_concurrent_create_writes_once(tmp_path, kind):
+    def open_store():
+        return report_store.open_store(kind, str(tmp_path / "reports"), str(tmp_path / "reports.sqlite3"))
+
+    barrier = threading.Barrier(8)
+    created = {}
+
+    def worker(w):
+        store = open_store()  # ワーカーごとに別のインスタンス（別プロセス相当）
+        barrier.wait()
+        created[w] = store.create_many([("cleaning_report_same.txt", f"worker {w}"),
+                                         (f"cleaning_report_own{w}.txt", f"worker {w}")])
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    winners = [w for w, names in created.items() if "cleaning_report_same.txt" in names]
+    assert len(winners) == 1
+    assert all(f"cleaning_report_own{w}.txt" in names for w, names in created.items())
+    store = open_store()
+    assert store.read("cleaning_report_same.txt") == f"worker {winners[0]}"  # 後から来たものに上書きされていない
+    assert len([fn for fn, _ in store.scan()]) == 9
+    if kind == "fs":
+        assert [f for f in _files(str(tmp_path / "reports")) if f.endswith(".tmp")] == []
+    assert store.create("cleaning_report_same.txt", "again") is False
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+REPORT = {"clientReportId": "client-report-0001", "roomId": "101", "cleanerId": "c1",
+          "tasks": {"trash": {"status": "done", "score": 10}}}
+
+
+@pytest.fixture(params=["fs", "sqlite"])
+def app(request, load_app, monkeypatch):
+    app = load_app(REPORT_STORE=request.param, AUDITOR_ENDPOINT="http://127.0.0.1:9/api/receive_report")
+    app.OUTBOX.close()  # 送信はしない（積まれた行だけを見る）
+    enqueued = []
+    enqueue = app.OUTBOX.enqueue
+    monkeypatch.setattr(app.OUTBOX, "enqueue", lambda fn, text: (enqueued.append(fn), enqueue(fn, text)))
+    app.enqueued = enqueued
+    yield app
+    app.OUTBOX.close()
+
+
+def _batch(app, *reports):
+    res = app.app.test_client().post("/api/reports/batch", json={"reports": list(reports)})
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def _outbox_rows(app):
+    return app.OUTBOX._conn().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+def test_resend_neither_rewrites_nor_enqueues_again(app):
+    first = _batch(app, REPORT)
+    result = first["results"][0]
+    assert first["saved"] == 1 and not result["duplicate"] and result["forward_status"] == "queued"
+    filename = result["filename"]
+    before = app.REPORT_STORE.stat(filename)
+
+    edited = dict(REPORT, roomId="999")  # 同じIDで中身が違っても最初のものを残す
+    again = _batch(app, edited, REPORT)
+    assert again["saved"] == 0
+    assert [r["duplicate"] for r in again["results"]] == [True, True]
+    assert {r["filename"] for r in again["results"]} == {filename}
+    assert app.REPORT_STORE.stat(filename) == before
+    assert "roomId: 101" in app.REPORT_STORE.read(filename)
+    assert app.enqueued == [filename] and _outbox_rows(app) == 1
+    assert app.REPORT_INDEX.count() == 1
+
+
+def test_race_between_check_and_write_is_a_duplicate(app, monkeypatch):
+    # 別のワーカーが exists() の確認の後に同じIDを保存した状況: 確認は常に「無い」と答えさせる
+    monkeypatch.setattr(app.REPORT_STORE, "exists", lambda filename: False)
+    first = _batch(app, REPORT)["results"][0]
+    second = _batch(app, REPORT)["results"][0]
+    assert not first["duplicate"] and second["duplicate"]
+    assert second["forward_status"] == second["sent_to_auditor"] == "queued"
+    single = app.app.test_client().post("/api/report", json=REPORT).get_json()
+    assert single["duplicate"] and single["filename"] == first["filename"]
+    assert app.enqueued == [first["filename"]] and _outbox_rows(app) == 1
+    if app.REPORT_STORE.kind == "fs":
+        reports_dir = app.REPORT_STORE.root
+        assert [f for _, _, fs in os.walk(reports_dir) for f in fs] == [first["filename"]]
@@ -0,0 +1,533 @@
+import os
+import json
+import mmap
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# =============================
+# Teachable Machine（tfjs-layers）モデルのサーバー側推論エンジン
+# - static/model/model.json + weights.bin をプロセスごとに1回だけ読み込む
+# - Conv2D / DepthwiseConv2D / BatchNormalization / ReLU / Flatten / Dense をNumPyで実行
+# - 返り値は tm_classifier コンポーネントと同じ [{className, probability}]（確率の降順）
+# - BatchNormを畳み込んだ後の重みは build/model_shared/ に書き出し、各プロセスは mmap で読むだけ
+#   （gunicornのワーカーや推論プロセスを増やしても重みはOSのページキャッシュ上の1つを共有する）
+# =============================
+
+from model_assets import (  # noqa: F401
+    BASE_DIR, MODEL_DIR, MODEL_VARIANT, model_dir_for, source_dir, model_signature, content_hash,
+)
+from preprocess import fit_to_model, load_model_image
+import metrics
+
+
+# ===== 重みの読み込み =====
+def _read_weight_group(model_dir: str, group: Dict[str, Any]) -> bytes:
+    # 複数シャード（weights.bin, weights2.bin ...）は連結して1つのバッファとして扱う
+    chunks = []
+    for p in group.get("paths") or []:
+        with open(os.path.join(model_dir, p), "rb") as f:
+            chunks.append(f.read())
+    return b"".join(chunks)
+
+
+_QUANT_DTYPES = {"float16": "<f2", "uint8": "u1", "uint16": "<u2", "int8": "i1"}
+
+
+def _decode_weight(buf: bytes, offset: int, spec: Dict[str, Any]) -> Tuple[np.ndarray, int]:
+    # 量子化の種類:
+    # - float16             : tfjs標準（そのままfloat32へ）
+    # - uint8/uint16 + scale/min : tfjs標準のテンソル単位アフィン量子化
+    # - int8 + axis/scales  : 本リポジトリ独自のチャネル単位対称量子化（tools/quantize_model.py）
+    shape = tuple(spec.get("shape") or ())
+    count = int(np.prod(shape)) if shape else 1
+    dtype = spec.get("dtype", "float32")
+    if dtype != "float32":
+        raise ValueError(f"unsupported weight dtype: {spec.get('name')} {dtype}")
+    quant = spec.get("quantization")
+    if not quant:
+        arr = np.frombuffer(buf, dtype="<f4", count=count, offset=offset)
+        return arr.reshape(shape), count * 4
+
+    qdtype = quant.get("dtype")
+    if qdtype not in _QUANT_DTYPES:
+        raise ValueError(f"unsupported quantization: {spec.get('name')} {qdtype}")
+    q = np.frombuffer(buf, dtype=_QUANT_DTYPES[qdtype], count=count, offset=offset)
+    nbytes = q.nbytes
+    if qdtype == "float16":
+        arr = q.astype(np.float32)
+    elif qdtype == "int8":
+        scales = np.asarray(quant["scales"], dtype=np.float32)
+        axis = int(quant.get("axis", -1)) % max(len(shape), 1)
+        bshape = [1] * len(shape)
+        bshape[axis] = -1
+        arr = q.reshape(shape).astype(np.float32) * scales.reshape(bshape)
+    else:
+        arr = q.astype(np.float32) * float(quant["scale"]) + float(quant["min"])
+    return arr.reshape(shape), nbytes
+
+
+def load_weights(model_dir: str, manifest: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    weights: Dict[str, np.ndarray] = {}
+    for group in manifest:
+        buf = _read_weight_group(model_dir, group)
+        offset = 0
+        for spec in group.get("weights") or []:
+            arr, nbytes = _decode_weight(buf, offset, spec)
+            weights[spec["name"]] = arr
+            offset += nbytes
+        if offset != len(buf):
+            raise ValueError(f"weight size mismatch: expected {offset} bytes, got {len(buf)}")
+    return weights
+
+
+# ===== レイヤー演算 =====
+def _same_padding(size: int, k: int, s: int) -> Tuple[int, int, int]:
+    # TensorFlowの"same"と同じ（余りは後ろ側にパディング）
+    out = -(-size // s)
+    total = max((out - 1) * s + k - size, 0)
+    return out, total // 2, total - total // 2
+
+
+def _pad_input(x: np.ndarray, k: Tuple[int, int], s: Tuple[int, int], padding: str):
+    _, h, w, _ = x.shape
+    if padding == "same":
+        ho, top, bottom = _same_padding(h, k[0], s[0])
+        wo, left, right = _same_padding(w, k[1], s[1])
+        if top or bottom or left or right:
+            x = np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+    elif padding == "valid":
+        ho = (h - k[0]) // s[0] + 1
+        wo = (w - k[1]) // s[1] + 1
+    else:
+        raise ValueError(f"unsupported padding: {padding}")
+    return x, ho, wo
+
+
+def _conv2d(x: np.ndarray, kernel: np.ndarray, strides, padding: str) -> np.ndarray:
+    kh, kw, cin, cout = kernel.shape
+    if kh == 1 and kw == 1 and tuple(strides) == (1, 1):
+        n, h, w, _ = x.shape
+        return (x.reshape(-1, cin) @ kernel.reshape(cin, cout)).reshape(n, h, w, cout)
+    xp, ho, wo = _pad_input(x, (kh, kw), strides, padding)
+    sh, sw = strides
+    out = np.zeros((x.shape[0], ho, wo, cout), dtype=np.float32)
+    for dy in range(kh):
+        for dx in range(kw):
+            patch = xp[:, dy:dy + sh * ho:sh, dx:dx + sw * wo:sw, :]
+            out += patch @ kernel[dy, dx]
+    return out
+
+
+def _depthwise_conv2d(x: np.ndarray, kernel: np.ndarray, strides, padding: str) -> np.ndarray:
+    kh, kw, c, mult = kernel.shape
+    if mult != 1:
+        raise ValueError("depth_multiplier != 1 is not supported")
+    xp, ho, wo = _pad_input(x, (kh, kw), strides, padding)
+    sh, sw = strides
+    out = np.zeros((x.shape[0], ho, wo, c), dtype=np.float32)
+    for dy in range(kh):
+        for dx in range(kw):
+            out += xp[:, dy:dy + sh * ho:sh, dx:dx + sw * wo:sw, :] * kernel[dy, dx, :, 0]
+    return out
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _activation(x: np.ndarray, name: Optional[str]) -> np.ndarray:
+    if not name or name == "linear":
+        return x
+    if name == "relu":
+        return np.maximum(x, 0)
+    if name == "relu6":
+        return np.clip(x, 0, 6)
+    if name == "softmax":
+        return _softmax(x)
+    if name == "sigmoid":
+        return 1.0 / (1.0 + np.exp(-x))
+    raise ValueError(f"unsupported activation: {name}")
+
+
+# ===== トポロジー → 演算リスト =====
+def _flatten_layers(layers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Sequential/Modelの入れ子を一直線に展開（TMの画像モデルは直列構造のみ）
+    out = []
+    for layer in layers:
+        cls = layer.get("class_name")
+        if cls in ("Sequential", "Model", "Functional"):
+            out.extend(_flatten_layers(layer["config"]["layers"]))
+        else:
+            out.append(layer)
+    return out
+
+
+def build_ops(topology: Dict[str, Any], weights: Dict[str, np.ndarray]) -> List[Tuple[str, Dict[str, Any]]]:
+    ops: List[Tuple[str, Dict[str, Any]]] = []
+    for layer in _flatten_layers([topology]):
+        cls = layer.get("class_name")
+        cfg = layer.get("config") or {}
+        name = cfg.get("name") or layer.get("name")
+        if cls == "InputLayer":
+            continue
+        if cls == "Conv2D":
+            ops.append(("conv", {
+                "kernel": weights[f"{name}/kernel"].astype(np.float32),
+                "bias": weights.get(f"{name}/bias") if cfg.get("use_bias") else None,
+                "strides": tuple(cfg.get("strides") or (1, 1)),
+                "padding": cfg.get("padding", "valid"),
+                "activation": cfg.get("activation"),
+            }))
+        elif cls == "DepthwiseConv2D":
+            ops.append(("depthwise", {
+                "kernel": weights[f"{name}/depthwise_kernel"].astype(np.float32),
+                "bias": weights.get(f"{name}/bias") if cfg.get("use_bias") else None,
+                "strides": tuple(cfg.get("strides") or (1, 1)),
+                "padding": cfg.get("padding", "valid"),
+                "activation": cfg.get("activation"),
+            }))
+        elif cls == "BatchNormalization":
+            eps = float(cfg.get("epsilon", 1e-3))
+            mean = weights[f"{name}/moving_mean"]
+            var = weights[f"{name}/moving_variance"]
+            gamma = weights.get(f"{name}/gamma") if cfg.get("scale", True) else None
+            beta = weights.get(f"{name}/beta") if cfg.get("center", True) else None
+            scale = 1.0 / np.sqrt(var + eps)
+            if gamma is not None:
+                scale = scale * gamma
+            shift = -mean * scale
+            if beta is not None:
+                shift = shift + beta
+            ops.append(("affine", {"scale": scale.astype(np.float32), "shift": shift.astype(np.float32)}))
+        elif cls == "ReLU":
+            max_value = cfg.get("max_value")
+            ops.append(("relu", {"max_value": None if max_value is None else float(max_value)}))
+        elif cls == "Activation":
+            ops.append(("activation", {"activation": cfg.get("activation")}))
+        elif cls == "Flatten":
+            ops.append(("flatten", {}))
+        elif cls == "Dense":
+            ops.append(("dense", {
+                "kernel": weights[f"{name}/kernel"].astype(np.float32),
+                "bias": weights.get(f"{name}/bias") if cfg.get("use_bias", True) else None,
+                "activation": cfg.get("activation"),
+            }))
+        elif cls in ("Dropout", "GlobalAveragePooling2D"):
+            ops.append((cls, {}))
+        else:
+            raise ValueError(f"unsupported layer: {cls} ({name})")
+    return _fold_batchnorm(ops)
+
+
+def _fold_batchnorm(ops: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+    # 畳み込み直後のBatchNormは、カーネルとバイアスに畳み込んで演算を1つ減らす
+    folded: List[Tuple[str, Dict[str, Any]]] = []
+    for kind, p in ops:
+        if kind == "affine" and folded:
+            prev_kind, prev = folded[-1]
+            if prev_kind in ("conv", "depthwise") and (prev.get("activation") in (None, "linear")):
+                scale, shift = p["scale"], p["shift"]
+                if prev_kind == "conv":
+                    kernel = prev["kernel"] * scale
+                else:
+                    kernel = prev["kernel"] * scale[:, None]
+                bias = shift if prev["bias"] is None else prev["bias"] * scale + shift
+                folded[-1] = (prev_kind, {**prev, "kernel": kernel.astype(np.float32), "bias": bias.astype(np.float32)})
+                continue
+        folded.append((kind, p))
+    return folded
+
+
+def run_ops(ops: List[Tuple[str, Dict[str, Any]]], x: np.ndarray) -> np.ndarray:
+    for kind, p in ops:
+        if kind == "conv":
+            x = _conv2d(x, p["kernel"], p["strides"], p["padding"])
+        elif kind == "depthwise":
+            x = _depthwise_conv2d(x, p["kernel"], p["strides"], p["padding"])
+        elif kind == "affine":
+            x = x * p["scale"] + p["shift"]
+        elif kind == "relu":
+            x = np.maximum(x, 0) if p["max_value"] is None else np.clip(x, 0, p["max_value"])
+            continue
+        elif kind == "activation":
+            x = _activation(x, p["activation"])
+            continue
+        elif kind == "flatten":
+            x = x.reshape(x.shape[0], -1)
+            continue
+        elif kind == "dense":
+            x = x @ p["kernel"]
+        elif kind == "GlobalAveragePooling2D":
+            x = x.mean(axis=(1, 2))
+            continue
+        else:
+            continue
+        if p.get("bias") is not None:
+            x = x + p["bias"]
+        x = _activation(x, p.get("activation"))
+    return x
+
+
+# ===== 畳み込み済みの重み（プロセス間で共有するファイル）=====
+# ops.<dir>.<sig>.bin : 全ての重み（float32, 64バイト境界に並べる）
+# ops.<dir>.<sig>.json: 演算リストと、各重みの (offset, shape)。bin を書き終えてから置くので、json があれば完成している
+# ファイル名はモデルのディレクトリと model_signature から作る（モデルが更新されれば別のファイルになる）
+# MODEL_SHARED_DIR=/dev/shm/... のようにtmpfsを指定してもよい。MODEL_SHARED=0 で従来どおりプロセスごとに読む
+SHARED_DIR = os.environ.get("MODEL_SHARED_DIR", os.path.join(BASE_DIR, "build", "model_shared"))
+SHARED_ENABLED = os.environ.get("MODEL_SHARED", "1") != "0"
+_SHARED_FORMAT = 1
+_SHARED_ALIGN = 64
+
+
+def shared_prefix(model_dir: str) -> str:
+    # ops.<ディレクトリのハッシュ>.<model_signature>
+    dir_key = content_hash(os.path.abspath(model_dir).encode("utf-8"))
+    return os.path.join(SHARED_DIR, f"ops.{dir_key}.{model_signature(model_dir)}")
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def export_ops(ops: List[Tuple[str, Dict[str, Any]]], prefix: str):
+    """ops の重みを prefix.bin、構成を prefix.json に書き出す（同時に書いても中身は同じなので安全）。"""
+    chunks: List[bytes] = []
+    offset = 0
+    layout = []
+    for kind, p in ops:
+        params: Dict[str, Any] = {}
+        for k, v in p.items():
+            if isinstance(v, np.ndarray):
+                data = np.ascontiguousarray(v, dtype="<f4").tobytes()
+                params[k] = {"offset": offset, "shape": list(v.shape)}
+                pad = -len(data) % _SHARED_ALIGN
+                chunks.append(data + b"\0" * pad)
+                offset += len(data) + pad
+            else:
+                params[k] = list(v) if isinstance(v, tuple) else v
+        layout.append([kind, params])
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    _write_atomic(prefix + ".bin", b"".join(chunks))
+    meta = {"format": _SHARED_FORMAT, "nbytes": offset, "ops": layout}
+    _write_atomic(prefix + ".json", json.dumps(meta, separators=(",", ":")).encode("utf-8"))
+
+
+def load_shared_ops(prefix: str) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """prefix.bin を読み取り専用で mmap し、重みをそのビューとして返す（コピーしない）。無い・壊れていれば None。"""
+    try:
+        with open(prefix + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != _SHARED_FORMAT:
+            return None
+        with open(prefix + ".bin", "rb") as f:
+            if os.fstat(f.fileno()).st_size != meta["nbytes"]:
+                return None
+            # 重みが1つも無いモデルでは mmap できない（長さ0）
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta["nbytes"] else b""
+    except (OSError, ValueError, KeyError):
+        return None
+    flat = np.frombuffer(buf, dtype="<f4")
+    ops: List[Tuple[str, Dict[str, Any]]] = []
+    for kind, params in meta["ops"]:
+        p: Dict[str, Any] = {}
+        for k, v in params.items():
+            if isinstance(v, dict):
+                start = v["offset"] // 4
+                count = int(np.prod(v["shape"])) if v["shape"] else 1
+                p[k] = flat[start:start + count].reshape(v["shape"])
+            else:
+                p[k] = tuple(v) if k == "strides" else v
+        ops.append((kind, p))
+    return ops
+
+
+def _prune_shared(prefix: str):
+    # 同じディレクトリの古いモデルの共有ファイルを消す（使用中のプロセスのマップは消しても有効なまま）
+    keep = os.path.basename(prefix) + "."
+    dir_part = keep.rsplit(".", 2)[0] + "."
+    for fn in os.listdir(SHARED_DIR):
+        if fn.startswith(dir_part) and not fn.startswith(keep):
+            try:
+                os.remove(os.path.join(SHARED_DIR, fn))
+            except OSError:
+                pass
+
+
+def shared_ops(model_dir: str, model_json: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """共有ファイルがあればそれを mmap、無ければ重みを読んで畳み込み、書き出してから mmap する。"""
+    prefix = shared_prefix(model_dir)
+    ops = load_shared_ops(prefix)
+    if ops is not None:
+        return ops
+    weights = load_weights(model_dir, model_json.get("weightsManifest") or [])
+    built = build_ops(model_json["modelTopology"], weights)
+    try:
+        export_ops(built, prefix)
+        _prune_shared(prefix)
+    except OSError:
+        return built  # 書き込めない環境ではプロセス内に持つ
+    return load_shared_ops(prefix) or built
+
+
+# ===== 前処理（@teachablemachine/image と同じ手順）=====
+# 1) 中央を正方形に切り抜き imageSize にリサイズ（preprocess.fit_to_model）
+# 2) グレースケールモデルなら輝度（0.299R + 0.587G + 0.114B）
+# 3) x / 127 - 1 で [-1, 1] に正規化
+# コンポーネント（index.html）は L 画像でも canvas の RGBA から 0.2989/0.5870/0.1140 で計算するため、
+# 係数の合計（0.9999）を掛けて値を揃える（白黒がはっきりした画像で 1e-3 を超える差になる）
+GRAY_WEIGHT_SUM = 0.2989 + 0.5870 + 0.1140
+
+
+def preprocess_image(img, image_size: int, grayscale: bool) -> np.ndarray:
+    arr = np.asarray(fit_to_model(img, image_size, grayscale), dtype=np.float32)
+    if arr.ndim == 2:
+        arr = arr[..., None] * np.float32(GRAY_WEIGHT_SUM)
+    return arr / 127.0 - 1.0
+
+
+class TMModel:
+    """Teachable Machine 画像モデルのNumPy実装（スレッドセーフ・読み取り専用）。"""
+
+    def __init__(self, model_dir: Optional[str] = None, shared: Optional[bool] = None):
+        model_dir = model_dir or source_dir()
+        self.model_dir = model_dir
+        with open(os.path.join(model_dir, "model.json"), "r", encoding="utf-8") as f:
+            model_json = json.load(f)
+        with open(os.path.join(model_dir, "metadata.json"), "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+
+        self.labels: List[str] = list(self.metadata.get("labels") or [])
+        self.image_size: int = int(self.metadata.get("imageSize") or 224)
+        self.grayscale: bool = bool(self.metadata.get("grayscale"))
+
+        if shared is None:
+            shared = SHARED_ENABLED
+        if shared:
+            self._ops = shared_ops(model_dir, model_json)
+        else:
+            weights = load_weights(model_dir, model_json.get("weightsManifest") or [])
+            self._ops = build_ops(model_json["modelTopology"], weights)
+
+    @property
+    def input_shape(self) -> Tuple[int, int, int]:
+        return (self.image_size, self.image_size, 1 if self.grayscale else 3)
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """predict_batch と同じ計算（メトリクスは記録しない。推論プロセス・ウォームアップ用）。"""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 3:
+            x = x[None]
+        return run_ops(self._ops, x)
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        """x: (N, H, W, C) の前処理済み配列 → (N, クラス数) の確率。"""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 3:
+            x = x[None]
+        metrics.CLASSIFY_BATCH_SIZE.observe(len(x))
+        with metrics.CLASSIFY_STAGE.time(stage="inference"):
+            return run_ops(self._ops, x)
+
+    def warm_up(self):
+        # 1回目の推論だけ遅い分（重みのページ読み込み・NumPyの初期化）を先に済ませる
+        self.forward(np.zeros((1,) + self.input_shape, dtype=np.float32))
+
+    def to_results(self, probs: np.ndarray) -> List[Dict[str, Any]]:
+        results = [
+            {"className": self.labels[i] if i < len(self.labels) else str(i), "probability": float(p)}
+            for i, p in enumerate(probs)
+        ]
+        results.sort(key=lambda r: r["probability"], reverse=True)
+        return results
+
+    def preprocess(self, img) -> np.ndarray:
+        return preprocess_image(img, self.image_size, self.grayscale)
+
+    def preprocess_bytes(self, image_bytes: bytes) -> np.ndarray:
+        # draftデコードで最初から小さく読む（フル解像度のRGBには展開しない）
+        with metrics.CLASSIFY_STAGE.time(stage="decode"):
+            img = load_model_image(image_bytes, self.image_size, self.grayscale)
+        with metrics.CLASSIFY_STAGE.time(stage="preprocess"):
+            return self.preprocess(img)
+
+    def predict_image(self, img) -> List[Dict[str, Any]]:
+        return self.to_results(self.predict_batch(self.preprocess(img))[0])
+
+    def predict_bytes(self, image_bytes: bytes) -> List[Dict[str, Any]]:
+        return self.to_results(self.predict_batch(self.preprocess_bytes(image_bytes))[0])
+
+
+# ===== プロセス内で1つだけ保持（model.json / weights.bin が更新されたら読み直す）=====
+MODEL_RELOAD_CHECK_INTERVAL = 2.0
+
+_model: Optional[TMModel] = None
+_model_signature = ""
+_model_checked_at = 0.0
+_model_lock = threading.Lock()
+
+
+def get_model() -> TMModel:
+    global _model, _model_signature, _model_checked_at
+    now = time.monotonic()
+    if _model is not None and now - _model_checked_at < MODEL_RELOAD_CHECK_INTERVAL:
+        return _model
+    with _model_lock:
+        if _model is None or now - _model_checked_at >= MODEL_RELOAD_CHECK_INTERVAL:
+            signature = model_signature()
+            if _model is None or signature != _model_signature:
+                _model = TMModel()
+                _model_signature = signature
+            _model_checked_at = now
+    return _model
+
+
+# ===== パリティ検証（記録済みのコンポーネント出力と比較）=====
+# 記録ファイル形式: [{"image": "相対/絶対パス", "predictions": [{className, probability}, ...]}, ...]
+def check_parity(recorded_path: str, tolerance: float = 1e-3) -> Dict[str, Any]:
+    with open(recorded_path, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    base = os.path.dirname(os.path.abspath(recorded_path))
+    model = get_model()
+    rows = []
+    for case in cases:
+        path = case["image"]
+        if not os.path.isabs(path):
+            path = os.path.join(base, path)
+        with open(path, "rb") as f:
+            got = model.predict_bytes(f.read())
+        expected = {p["className"]: float(p["probability"]) for p in case["predictions"]}
+        actual = {p["className"]: p["probability"] for p in got}
+        diff = max(abs(actual.get(k, 0.0) - v) for k, v in expected.items()) if expected else 0.0
+        top_expected = max(expected, key=expected.get) if expected else ""
+        rows.append({
+            "image": case["image"],
+            "max_abs_diff": diff,
+            "top1_match": got[0]["className"] == top_expected if got else False,
+        })
+    worst = max((r["max_abs_diff"] for r in rows), default=0.0)
+    return {
+        "cases": len(rows),
+        "max_abs_diff": worst,
+        "top1_agreement": (sum(r["top1_match"] for r in rows) / len(rows)) if rows else 1.0,
+        "ok": worst <= tolerance and all(r["top1_match"] for r in rows),
+        "rows": rows,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "--parity":
+        report = check_parity(sys.argv[2])
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        sys.exit(0 if report["ok"] else 1)
+    for p in sys.argv[1:]:
+        with open(p, "rb") as f:
+            print(p, json.dumps(get_model().predict_bytes(f.read()), ensure_ascii=False))
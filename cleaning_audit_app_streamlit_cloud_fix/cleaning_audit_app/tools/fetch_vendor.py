@@ -0,0 +1,58 @@
+"""清掃画面の外部ライブラリ（tfjs / teachablemachine-image）を static/vendor/ に取得する。
+
+使い方:
+    python tools/fetch_vendor.py            # 未取得のものだけ取得
+    python tools/fetch_vendor.py --force    # 取得し直す
+
+取得しておくと、app は CDN ではなく自前のURL（内容ハッシュ付き・immutable）で配信し、
+Service Worker（/sw.js）が事前キャッシュするので、電波の無い場所でも画面とAI判定が使える。
+Dockerfile ではイメージ作成時に実行する。取得できなかったものは警告だけ出して終了コード 0 で終わる
+（app は static/vendor/ に無いライブラリを CDN から読み込むので、ビルドは止めない）。
+--strict を付けると、取得できなかったときに終了コード 1 を返す。
+"""
+import os
+import sys
+import argparse
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import vendor_assets  # noqa: E402
+
+
+def fetch(url: str, dst: str, timeout: float = 60.0):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        data = resp.read()
+    tmp = f"{dst}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, dst)
+    return len(data)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--force", action="store_true", help="取得済みでも取得し直す")
+    ap.add_argument("--strict", action="store_true", help="取得できなかったら終了コード 1 にする")
+    args = ap.parse_args()
+
+    os.makedirs(vendor_assets.VENDOR_DIR, exist_ok=True)
+    failed = []
+    for path, url in vendor_assets.BUNDLES:
+        dst = os.path.join(vendor_assets.BASE_DIR, "static", path)
+        if os.path.isfile(dst) and not args.force:
+            print(f"skip: {path}")
+            continue
+        try:
+            size = fetch(url, dst)
+        except (urllib.error.URLError, OSError) as e:  # ネットワーク不可・タイムアウト・HTTPエラー
+            print(f"warning: {path} を取得できませんでした（CDN から読み込みます）: {e}", file=sys.stderr)
+            failed.append(path)
+            continue
+        print(f"{path}: {size:,} bytes <- {url}")
+    if failed and args.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
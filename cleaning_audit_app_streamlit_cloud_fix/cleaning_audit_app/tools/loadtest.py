@@ -0,0 +1,641 @@
+"""清掃シフト1回分を再現する負荷試験（asyncio の HTTP クライアントで Flask アプリに同時にアクセスする）。
+
+使い方:
+    python tools/loadtest.py --spawn                              # アプリと監査先の代わり（stub_receiver）を起動し、8時間分を60倍速で
+    python tools/loadtest.py --spawn --rooms-per-hour 240 --auditors 6 --out result.json
+    python tools/loadtest.py --url http://127.0.0.1:8080          # 起動済みのアプリに対して
+    python tools/loadtest.py --spawn --record shift.jsonl         # 作ったシナリオを保存
+    python tools/loadtest.py --spawn --replay shift.jsonl         # 同じシナリオをもう一度（変更の前後の比較）
+
+シナリオ（--seed で決まる。--record / --replay で保存・再生できる）:
+- 清掃: 部屋ごとに端末が / を開き、静的ファイル・sw.js・モデル（model.json / metadata / weights）を読み込み、
+  清掃時間が経ったら /api/report で送信する。部屋は --rooms-per-hour でランダム（ポアソン到着）に始まる。
+  - --returning の割合はキャッシュを持つ端末（ETag で再検証して 304）
+  - --legacy-ratio の割合は旧端末（/api/receive_report に {"filename", "content"} で送る）
+- 監査: --auditors 人がシフト中ずっと、ログインして --auditor-mix の割合で一覧 / 表示 / ダウンロード / 集計 / エクスポートを繰り返す。
+- 時間は --time-scale 倍速（清掃時間・監査の操作間隔・到着間隔をすべて縮める）。--time-scale 1 で実時間。
+
+結果: ルートごとの件数・エラー率（4xx/5xx・接続エラー）・p50/p95/p99（ms）と、全体のスループット。
+--spawn では AUDITOR_ENDPOINT を stub_receiver に向けて起動し、転送された件数も表示する。
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import math
+import time
+import uuid
+import random
+import shutil
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(APP_DIR, "benchmarks"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synth  # noqa: E402
+import stub_receiver  # noqa: E402
+
+AUDITOR_ACTIONS = ("list", "view", "download", "analytics", "export")
+DEFAULT_AUDITOR_MIX = "list=4,view=3,download=2,analytics=1,export=0"
+# ルートごとに集計する（ファイル名などは * にまとめる）
+_ROUTE_PATTERNS = [
+    (re.compile(r"^/static/"), "/static/*"),
+    (re.compile(r"^/model/"), "/model/*"),
+    (re.compile(r"^/vendor/"), "/vendor/*"),
+    (re.compile(r"^/auditor/reports/"), "/auditor/reports/*"),
+    (re.compile(r"^/auditor/download/"), "/auditor/download/*"),
+]
+_ASSET_RE = re.compile(r'(?:src|href)="(/(?!/)[^"]*)"')
+_MODEL_ASSETS_RE = re.compile(r"window\.MODEL_ASSETS\s*=\s*(\{.*?\});")
+_REPORT_LINK_RE = re.compile(r'href="/auditor/reports/([^"]+)"')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# ブラウザと同じく圧縮した応答を受け取る（本文を読むときだけ展開する）
+ACCEPT_ENCODING = "gzip, br" if brotli is not None else "gzip"
+
+
+# ===== HTTP クライアント（HTTP/1.1 keep-alive。端末1台 = 接続1本）=====
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        # 使い回した接続がサーバー側で閉じられていた場合だけ、1回つなぎ直して送り直す
+        reused = self._writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError, HttpError):
+            self.close()
+            if not reused:
+                raise
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        if self._writer is None:
+            await self._connect()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if body or method == "POST":
+            lines.append(f"Content-Length: {len(body)}")
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise HttpError("connection closed")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        status = int(parts[1])
+        resp_headers: Dict[str, str] = {}
+        cookies = []
+        while True:
+            line = (await self._reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            k, _, v = line.partition(":")
+            k, v = k.strip().lower(), v.strip()
+            if k == "set-cookie":
+                cookies.append(v)
+            resp_headers[k] = v
+        if cookies:
+            resp_headers["set-cookie"] = "\n".join(cookies)
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            data = b""
+        elif resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+            data = b"".join(chunks)
+        elif "content-length" in resp_headers:
+            data = await self._reader.readexactly(int(resp_headers["content-length"]))
+        else:
+            data = await self._reader.read()
+            resp_headers["connection"] = "close"
+        if resp_headers.get("connection", "").lower() == "close" or parts[0] == "HTTP/1.0":
+            self.close()
+        return status, resp_headers, data
+
+
+# ===== 計測 =====
+def route_name(method: str, path: str) -> str:
+    path = path.split("?", 1)[0]
+    for pattern, name in _ROUTE_PATTERNS:
+        if pattern.match(path):
+            path = name
+            break
+    return f"{method} {path}"
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    # nearest-rank（samples は並べ替え済み）
+    if not samples:
+        return None
+    return samples[min(len(samples), max(1, math.ceil(q / 100 * len(samples)))) - 1]
+
+
+class Stats:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.sessions = {"cleaner": 0, "auditor": 0, "failed": 0}
+        self.reports_sent = 0
+
+    def record(self, route: str, status: Optional[int], ms: float):
+        self.latency.setdefault(route, []).append(ms)
+        key = str(status) if status is not None else "error"
+        counts = self.statuses.setdefault(route, {})
+        counts[key] = counts.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        routes = {}
+        total = errors = 0
+        for route in sorted(self.latency):
+            samples = sorted(self.latency[route])
+            n, err = len(samples), self.errors.get(route, 0)
+            total += n
+            errors += err
+            routes[route] = {
+                "n": n,
+                "rps": round(n / elapsed, 2) if elapsed else None,
+                "error_rate": round(err / n, 4),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(samples[-1], 2),
+                "status": self.statuses.get(route, {}),
+            }
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 2) if elapsed else None,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "sessions": dict(self.sessions),
+            "reports_sent": self.reports_sent,
+            "reports_per_s": round(self.reports_sent / elapsed, 3) if elapsed else None,
+            "routes": routes,
+        }
+
+
+class Client:
+    """端末（ブラウザ）1台分: 接続1本・Cookie・HTTP キャッシュ（etags: パス → ETag, bodies: get_text で読んだ本文）。"""
+
+    def __init__(self, host: str, port: int, stats: Stats, timeout: float,
+                 etags: Optional[Dict[str, str]] = None, bodies: Optional[Dict[str, str]] = None):
+        self.conn = Connection(host, port, timeout)
+        self.stats = stats
+        self.cookies: Dict[str, str] = {}
+        self.etags = etags
+        self.bodies = bodies if bodies is not None else {}
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[int], Dict[str, str], bytes]:
+        headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if self.etags is not None and method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        route = route_name(method, path)
+        t0 = time.perf_counter()
+        try:
+            status, resp_headers, data = await self.conn.request(method, path, body, headers)
+        except Exception:
+            self.conn.close()
+            self.stats.record(route, None, (time.perf_counter() - t0) * 1000)
+            return None, {}, b""
+        self.stats.record(route, status, (time.perf_counter() - t0) * 1000)
+        for cookie in filter(None, resp_headers.get("set-cookie", "").split("\n")):
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value.strip()
+        if self.etags is not None and status == 200 and "etag" in resp_headers:
+            self.etags[path] = resp_headers["etag"]
+        return status, resp_headers, data
+
+    async def get_text(self, path: str) -> Tuple[Optional[int], str]:
+        """本文を展開して文字列で返す。304 ならキャッシュしておいた本文。"""
+        status, headers, data = await self.request("GET", path)
+        if status == 304:
+            return status, self.bodies.get(path, "")
+        encoding = headers.get("content-encoding", "")
+        if encoding == "gzip":
+            data = gzip.decompress(data)
+        elif encoding == "br" and brotli is not None:
+            data = brotli.decompress(data)
+        text = data.decode("utf-8", "replace")
+        if self.etags is not None and status == 200:
+            self.bodies[path] = text
+        return status, text
+
+    async def post_json(self, path: str, obj: Any):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        return await self.request("POST", path, body, {"Content-Type": "application/json"})
+
+    def close(self):
+        self.conn.close()
+
+
+# ===== シナリオ（シフト1回分。JSONL で保存・再生できる）=====
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in AUDITOR_ACTIONS:
+            raise ValueError(f"unknown auditor action: {name} (choose from {', '.join(AUDITOR_ACTIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("auditor mix has no positive weight")
+    return mix
+
+
+def build_scenario(args) -> List[Dict[str, Any]]:
+    """セッションの一覧（開始時刻順）。時刻・待ち時間は実時間（--time-scale で縮めた後）の秒。"""
+    rng = random.Random(args.seed)
+    scale = float(args.time_scale)
+    duration = args.shift_hours * 3600 / scale
+    sessions = []
+
+    rate = args.rooms_per_hour / 3600 * scale  # 1秒あたりの部屋数
+    at, i = 0.0, 0
+    while rate > 0:
+        at += rng.expovariate(rate)
+        if at >= duration:
+            break
+        payload = synth.report_payload(rng, i)
+        legacy = rng.random() < args.legacy_ratio
+        if not legacy:
+            payload["clientReportId"] = uuid.UUID(int=rng.getrandbits(128)).hex
+        sessions.append({
+            "kind": "cleaner",
+            "at": round(at, 3),
+            # 清掃時間（シフト上は中央値 約22分）
+            "clean_s": round(float(payload["durationSeconds"]) / scale, 3),
+            "returning": rng.random() < args.returning,
+            "legacy": legacy,
+            "report_id": uuid.UUID(int=rng.getrandbits(128)).hex[:12],
+            "payload": payload,
+        })
+        i += 1
+
+    mix = parse_mix(args.auditor_mix)
+    names, weights = zip(*mix.items())
+    for a in range(args.auditors):
+        at = rng.uniform(0, min(duration, args.auditor_think / scale))
+        steps, t = [], at
+        while True:
+            wait = rng.expovariate(scale / args.auditor_think)
+            t += wait
+            if t >= duration:
+                break
+            steps.append({"action": rng.choices(names, weights)[0], "wait": round(wait, 3), "pick": round(rng.random(), 4)})
+        sessions.append({"kind": "auditor", "at": round(at, 3), "auditor": a, "steps": steps})
+
+    sessions.sort(key=lambda s: s["at"])
+    return sessions
+
+
+def save_scenario(path: str, meta: Dict[str, Any], sessions: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"scenario": meta}, ensure_ascii=False) + "\n")
+        for s in sessions:
+            f.write(json.dumps(s, ensure_ascii=False) + "\n")
+
+
+def load_scenario(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    meta = lines[0].get("scenario", {}) if lines and "scenario" in lines[0] else {}
+    return meta, [s for s in lines if "kind" in s]
+
+
+# ===== セッション =====
+async def load_page(client: Client) -> bool:
+    """清掃画面を開く: /、静的ファイル、sw.js、モデル（app.js が読む model.json / metadata.json と重み）。"""
+    status, html = await client.get_text("/")
+    if status not in (200, 304):
+        return False
+    assets = [u for u in dict.fromkeys(_ASSET_RE.findall(html)) if u != "/" and not u.startswith("/auditor")]
+    for path in assets + ["/sw.js"]:
+        await client.request("GET", path)
+    m = _MODEL_ASSETS_RE.search(html)
+    if m:
+        spec = json.loads(m.group(1))
+        if spec.get("metadata_url"):
+            await client.request("GET", spec["metadata_url"])
+        model_url = spec.get("model_url")
+        if model_url:
+            status, text = await client.get_text(model_url)
+            try:
+                manifest = json.loads(text).get("weightsManifest", []) if status in (200, 304) else []
+            except ValueError:
+                manifest = []
+            base = model_url.rsplit("/", 1)[0]
+            for name in (name for group in manifest for name in group.get("paths", [])):
+                await client.request("GET", f"{base}/{name}")
+    return True
+
+
+async def cleaner_session(client: Client, s: Dict[str, Any], stats: Stats) -> bool:
+    if not await load_page(client):
+        return False
+    # 清掃中は接続を閉じておく（端末は何十分もつなぎっぱなしにしない）
+    client.close()
+    await asyncio.sleep(s["clean_s"])
+    if s["legacy"]:
+        filename = f"cleaning_report_{s['report_id']}.txt"
+        content = synth.report_text(s["payload"], s["report_id"])
+        status, _, _ = await client.post_json("/api/receive_report", {"filename": filename, "content": content})
+    else:
+        status, _, _ = await client.post_json("/api/report", s["payload"])
+    if status != 200:
+        return False
+    stats.reports_sent += 1
+    return True
+
+
+async def auditor_session(client: Client, s: Dict[str, Any]) -> bool:
+    await client.request("GET", "/auditor/login")
+    status, _, _ = await client.request("POST", "/auditor/login?" + urlencode({"next": "/auditor"}),
+                                        b"password=1111", {"Content-Type": "application/x-www-form-urlencoded"})
+    if status not in (200, 302, 303):
+        return False
+    filenames: List[str] = []
+    ok = True
+    for step in s["steps"]:
+        await asyncio.sleep(step["wait"])
+        action, pick = step["action"], step["pick"]
+        if action in ("view", "download") and not filenames:
+            action = "list"  # まだ一覧を見ていない
+        if action == "list":
+            # 大半は先頭ページ。たまに2ページ目・点数の低い順・部屋での絞り込み
+            query: Dict[str, Any] = {}
+            if pick < 0.15:
+                query["page"] = 2
+            elif pick < 0.3:
+                query.update(sort="score", order="asc")
+            elif pick < 0.4:
+                query["room"] = synth.ROOMS[int(pick * 1000) % len(synth.ROOMS)]
+            status, html = await client.get_text("/auditor" + ("?" + urlencode(query) if query else ""))
+            if status == 200:
+                filenames = _REPORT_LINK_RE.findall(html) or filenames
+        elif action in ("view", "download"):
+            name = filenames[int(pick * len(filenames))]
+            prefix = "/auditor/reports/" if action == "view" else "/auditor/download/"
+            status, _, _ = await client.request("GET", prefix + name)
+        elif action == "analytics":
+            status, _, _ = await client.request("GET", "/auditor/analytics")
+        else:
+            status, _, _ = await client.request("GET", "/auditor/export?format=csv")
+        ok = ok and status is not None and status < 400
+    return ok
+
+
+async def run_scenario(base_url: str, sessions: List[Dict[str, Any]], timeout: float) -> Tuple[Stats, float]:
+    parts = urlsplit(base_url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    stats = Stats()
+    # 端末の HTTP キャッシュ（ETag）。キャッシュを持つ端末（returning）はこれで再検証する
+    etags: Dict[str, str] = {}
+    bodies: Dict[str, str] = {}
+    primer = Client(host, port, Stats(), timeout, etags, bodies)
+    try:
+        await load_page(primer)
+    finally:
+        primer.close()
+
+    start = time.monotonic()
+
+    async def run_one(s):
+        await asyncio.sleep(max(0.0, start + s["at"] - time.monotonic()))
+        cleaner = s["kind"] == "cleaner"
+        returning = cleaner and s.get("returning")
+        client = Client(host, port, stats, timeout, dict(etags) if returning else None,
+                        dict(bodies) if returning else None)
+        try:
+            ok = await (cleaner_session(client, s, stats) if cleaner else auditor_session(client, s))
+        except Exception:
+            ok = False
+        finally:
+            client.close()
+        stats.sessions[s["kind"]] += 1
+        if not ok:
+            stats.sessions["failed"] += 1
+
+    await asyncio.gather(*(run_one(s) for s in sessions))
+    return stats, time.monotonic() - start
+
+
+# ===== アプリと監査先（stub_receiver）の起動（--spawn）=====
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(fail_rate: float, delay: float):
+    """監査先（AUDITOR_ENDPOINT）の代わりを別スレッドで起動する。受信件数は stub_receiver.STATS。"""
+    server = stub_receiver.ThreadingHTTPServer(("127.0.0.1", 0),
+                                               stub_receiver.make_handler(None, fail_rate, delay, True))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/receive_report"
+
+
+def start_app(root: str, endpoint: str, store: str, workers: int, threads: int) -> Tuple[subprocess.Popen, str]:
+    """一時ディレクトリを保存先にしてアプリを起動する（gunicorn があれば gunicorn.conf.py、無ければ flask run）。"""
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "REPORTS_DIR": os.path.join(root, "reports"),
+        "DATA_DIR": os.path.join(root, "var"),
+        "REPORT_STORE": store,
+        "AUDITOR_ENDPOINT": endpoint,
+        "GUNICORN_WORKERS": str(workers),
+        "GUNICORN_THREADS": str(threads),
+        "CLASSIFY_WARMUP": "0",  # 画像判定は使わない
+    })
+    if shutil.which("gunicorn"):
+        cmd = ["gunicorn", "app:app"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--with-threads"]
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with code {proc.returncode}: {' '.join(cmd)}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_app(proc)
+    raise RuntimeError("app did not start within 60s")
+
+
+def stop_app(proc: subprocess.Popen):
+    if proc.poll() is None:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+
+
+def seed_reports(base_url: str, n: int):
+    """監査画面に最初から並んでいるレポート（/api/receive_report の一括受信で入れる。計測には含めない）。"""
+    parts = urlsplit(base_url)
+
+    async def post():
+        conn = Connection(parts.hostname, parts.port or 80, 300)
+        try:
+            for i in range(0, n, 5000):
+                body = synth.ndjson_gz(synth.report_items(min(5000, n - i), start=i))
+                status, _, _ = await conn.request("POST", "/api/receive_report?format=ndjson", body, {
+                    "Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+                if status != 200:
+                    raise RuntimeError(f"seeding reports failed: HTTP {status}")
+        finally:
+            conn.close()
+
+    asyncio.run(post())
+
+
+def wait_forwarded(expected: int, timeout: float) -> int:
+    # アウトボックスが監査先へ送り終えるのを待つ（届いた件数を返す）
+    deadline = time.monotonic() + timeout
+    while stub_receiver.STATS["reports"] < expected and time.monotonic() < deadline:
+        time.sleep(0.2)
+    return stub_receiver.STATS["reports"]
+
+
+# ===== 表示 =====
+def print_summary(result: Dict[str, Any]):
+    print(f"elapsed {result['elapsed_s']}s  requests {result['requests']}  {result['rps']} req/s  "
+          f"errors {result['error_rate'] * 100:.2f}%  reports {result['reports_sent']} ({result['reports_per_s']}/s)")
+    print(f"sessions: {result['sessions']}")
+    if "forwarded" in result:
+        print(f"forwarded to auditor endpoint: {result['forwarded']}  (stub: {result['stub']})")
+    header = f"{'route':<36} {'n':>7} {'req/s':>8} {'err%':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, r in result["routes"].items():
+        print(f"{route:<36} {r['n']:>7} {r['rps']:>8} {r['error_rate'] * 100:>6.2f}% "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = ap.add_argument_group("対象")
+    target.add_argument("--url", help="起動済みのアプリ（例: http://127.0.0.1:8080）")
+    target.add_argument("--spawn", action="store_true", help="一時ディレクトリでアプリと監査先（stub）を起動する")
+    target.add_argument("--store", choices=("fs", "sqlite"), default="fs", help="--spawn 時の REPORT_STORE")
+    target.add_argument("--workers", type=int, default=1, help="--spawn 時の GUNICORN_WORKERS")
+    target.add_argument("--threads", type=int, default=8, help="--spawn 時の GUNICORN_THREADS")
+    target.add_argument("--seed-reports", type=int, default=1000, help="--spawn 時に最初から入れておくレポート数")
+    target.add_argument("--stub-fail-rate", type=float, default=0.0, help="監査先（stub）が 503 を返す割合")
+    target.add_argument("--stub-delay", type=float, default=0.0, help="監査先（stub）の応答遅延（秒）")
+    target.add_argument("--drain", type=float, default=30.0, help="終了後、監査先への転送を待つ最大秒数")
+
+    shift = ap.add_argument_group("シナリオ")
+    shift.add_argument("--seed", type=int, default=0)
+    shift.add_argument("--shift-hours", type=float, default=8.0)
+    shift.add_argument("--time-scale", type=float, default=60.0, help="何倍速で再生するか（1 で実時間）")
+    shift.add_argument("--rooms-per-hour", type=float, default=60.0)
+    shift.add_argument("--returning", type=float, default=0.8, help="キャッシュを持つ端末の割合")
+    shift.add_argument("--legacy-ratio", type=float, default=0.1, help="/api/receive_report で送る旧端末の割合")
+    shift.add_argument("--auditors", type=int, default=2)
+    shift.add_argument("--auditor-mix", default=DEFAULT_AUDITOR_MIX,
+                       help=f"監査の操作の割合（{', '.join(AUDITOR_ACTIONS)}）")
+    shift.add_argument("--auditor-think", type=float, default=30.0, help="監査の操作間隔の平均（シフト上の秒）")
+    shift.add_argument("--record", help="作ったシナリオを JSONL で保存する")
+    shift.add_argument("--replay", help="保存したシナリオを再生する（シナリオの引数は無視）")
+
+    ap.add_argument("--timeout", type=float, default=30.0, help="1リクエストのタイムアウト（秒）")
+    ap.add_argument("--out", help="結果のJSON出力先")
+    args = ap.parse_args()
+    if not args.url and not args.spawn:
+        ap.error("--url か --spawn を指定してください")
+
+    if args.replay:
+        meta, sessions = load_scenario(args.replay)
+    else:
+        try:
+            sessions = build_scenario(args)
+        except ValueError as e:
+            ap.error(str(e))
+        meta = {k: getattr(args, k) for k in ("seed", "shift_hours", "time_scale", "rooms_per_hour", "returning",
+                                              "legacy_ratio", "auditors", "auditor_mix", "auditor_think")}
+    if args.record:
+        save_scenario(args.record, meta, sessions)
+    cleaners = sum(1 for s in sessions if s["kind"] == "cleaner")
+    print(f"scenario: {cleaners} rooms, {len(sessions) - cleaners} auditors, "
+          f"{meta.get('shift_hours')}h shift at x{meta.get('time_scale')}", file=sys.stderr)
+
+    proc = stub = root = None
+    base_url = args.url
+    try:
+        if args.spawn:
+            root = tempfile.mkdtemp(prefix="loadtest_")
+            stub, endpoint = start_stub(args.stub_fail_rate, args.stub_delay)
+            proc, base_url = start_app(root, endpoint, args.store, args.workers, args.threads)
+            if args.seed_reports:
+                seed_reports(base_url, args.seed_reports)
+        stats, elapsed = asyncio.run(run_scenario(base_url, sessions, args.timeout))
+        result = {"target": base_url, "scenario": meta, **stats.summary(elapsed)}
+        if stub is not None:
+            result["forwarded"] = wait_forwarded(stats.reports_sent, args.drain)
+            result["stub"] = dict(stub_receiver.STATS)
+    finally:
+        if proc is not None:
+            stop_app(proc)
+        if stub is not None:
+            stub.shutdown()
+        if root is not None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_summary(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
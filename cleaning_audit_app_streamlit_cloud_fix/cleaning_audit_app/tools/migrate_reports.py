@@ -0,0 +1,112 @@
+"""既存のレポート（reports/ 直下の .txt）を新しい保存先（report_store.py）へ移す。
+
+使い方:
+    python tools/migrate_reports.py --to fs                  # reports/ 直下 -> reports/YYYY/MM/DD/（その場で移動）
+    python tools/migrate_reports.py --to sqlite              # reports/ -> var/reports.sqlite3（元のファイルは残す）
+    python tools/migrate_reports.py --to sqlite --delete-source
+    python tools/migrate_reports.py --to fs --dest /mnt/reports --dry-run
+
+- 日付別のディレクトリはファイルの更新時刻（=受信日時）で決め、更新時刻もそのまま引き継ぐ
+  （監査一覧の「受信日時」の並びが変わらない）
+- 何度実行してもよい（移行済みのものは上書きされるだけ）。アプリを止めずに実行してよい
+- 移行後、REPORT_STORE=sqlite を指定して起動する（fs の場合は設定不要）。索引は起動時に差分同期される
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import report_store  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPORTS_DIR = os.environ.get("REPORTS_DIR", os.path.join(BASE_DIR, "reports"))
+DEFAULT_DATA_DIR = os.environ.get("DATA_DIR", os.path.join(BASE_DIR, "var"))
+
+
+def legacy_files(src: str):
+    """src 直下の旧形式のレポート（日付別のディレクトリに入っていないもの）。"""
+    try:
+        with os.scandir(src) as it:
+            for entry in it:
+                if report_store.valid_filename(entry.name) and entry.is_file():
+                    yield entry.name, entry.stat()
+    except FileNotFoundError:
+        return
+
+
+def shard_in_place(src: str, dry_run: bool = False) -> int:
+    """src 直下のファイルを src/YYYY/MM/DD/ へ移す（os.replace なので更新時刻もそのまま）。"""
+    moved = 0
+    for filename, st in legacy_files(src):
+        directory = os.path.join(src, report_store.FileReportStore.shard_for(st.st_mtime))
+        dst = os.path.join(directory, filename)
+        if not dry_run:
+            os.makedirs(directory, exist_ok=True)
+            # 同じ名前が既に日付別にあれば新しい方を残す
+            if os.path.exists(dst) and os.stat(dst).st_mtime_ns > st.st_mtime_ns:
+                os.remove(os.path.join(src, filename))
+            else:
+                os.replace(os.path.join(src, filename), dst)
+        moved += 1
+    return moved
+
+
+def copy_store(src: str, dest, batch_size: int, delete_source: bool, dry_run: bool) -> int:
+    """src（旧形式・日付別のどちらも）の全レポートを dest へ書き込む。"""
+    source = report_store.FileReportStore(src)
+    copied = 0
+    batch = []
+
+    def flush():
+        nonlocal copied
+        if not dry_run:
+            dest.write_many([(fn, text, st.mtime) for fn, text, st in batch])
+            if delete_source:
+                for fn, _text, _st in batch:
+                    if dest.exists(fn):
+                        source.delete(fn)
+        copied += len(batch)
+        batch.clear()
+
+    for filename, st in source.scan():
+        text = source.read(filename)
+        if text is None:
+            continue
+        batch.append((filename, text, st))
+        if len(batch) >= batch_size:
+            flush()
+            print(f"  {copied:,} 件", file=sys.stderr)
+    if batch:
+        flush()
+    return copied
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--src", default=DEFAULT_REPORTS_DIR, help="移行元のディレクトリ（既定: REPORTS_DIR）")
+    ap.add_argument("--to", choices=report_store.STORE_KINDS, required=True, help="移行先の保存方式")
+    ap.add_argument("--dest", help="移行先（fs: ディレクトリ、既定は --src と同じ / sqlite: DBファイル、"
+                                   "既定は DATA_DIR/reports.sqlite3）")
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--delete-source", action="store_true", help="書き込めたものは移行元から削除する")
+    ap.add_argument("--dry-run", action="store_true", help="件数を数えるだけで書き込まない")
+    args = ap.parse_args()
+
+    if args.to == "fs":
+        dest = os.path.abspath(args.dest or args.src)
+        if dest == os.path.abspath(args.src):
+            n = shard_in_place(args.src, args.dry_run)
+            print(f"{'(dry-run) ' if args.dry_run else ''}{n:,} 件を日付別のディレクトリへ移動: {args.src}")
+            return
+        store = report_store.FileReportStore(dest)
+    else:
+        dest = args.dest or os.path.join(DEFAULT_DATA_DIR, "reports.sqlite3")
+        store = report_store.SQLiteReportStore(dest)
+
+    n = copy_store(args.src, store, args.batch_size, args.delete_source, args.dry_run)
+    store.close()
+    print(f"{'(dry-run) ' if args.dry_run else ''}{n:,} 件を移行: {args.src} -> {dest} ({args.to})")
+
+
+if __name__ == "__main__":
+    main()
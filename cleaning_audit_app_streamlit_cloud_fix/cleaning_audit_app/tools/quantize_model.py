@@ -0,0 +1,148 @@
+"""float16 / int8（チャネル単位）の量子化モデルを生成し、float32との精度差を比較する。
+
+使い方:
+    python tools/quantize_model.py                       # static/model/float16, static/model/int8 を生成
+    python tools/quantize_model.py --images ./photos     # 生成 + 画像フォルダで精度比較
+    python tools/quantize_model.py --images ./photos --report quant_report.json
+
+- float16 は tfjs 標準の quantization {"dtype": "float16"} 形式
+- int8 は quantization {"dtype": "int8", "axis": 出力チャネル軸, "scales": [...]} の独自形式
+  （tfjs標準はテンソル単位のuint8のみのため、コンポーネント側で読み込み前に復元する）
+- 1次元の小さな重み（BatchNormの係数やバイアス）は float32 のまま残す
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tm_engine  # noqa: E402
+
+VARIANTS = ("float16", "int8")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _channel_axis(name: str, shape: Tuple[int, ...]) -> int:
+    # Conv/Dense は最後の軸（出力チャネル）、Depthwise は入力チャネル軸（shape[2]）
+    if "depthwise_kernel" in name and len(shape) == 4:
+        return 2
+    return len(shape) - 1
+
+
+def quantize_weights(manifest: List[Dict[str, Any]], weights: Dict[str, np.ndarray], variant: str):
+    specs, chunks = [], []
+    for group in manifest:
+        for spec in group.get("weights") or []:
+            name = spec["name"]
+            arr = np.asarray(weights[name], dtype=np.float32)
+            new_spec = {k: v for k, v in spec.items() if k != "quantization"}
+            if arr.ndim <= 1:
+                chunks.append(arr.astype("<f4").tobytes())
+            elif variant == "float16":
+                new_spec["quantization"] = {"dtype": "float16"}
+                chunks.append(arr.astype("<f2").tobytes())
+            elif variant == "int8":
+                axis = _channel_axis(name, arr.shape)
+                reduce_axes = tuple(i for i in range(arr.ndim) if i != axis)
+                max_abs = np.abs(arr).max(axis=reduce_axes)
+                scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+                bshape = [1] * arr.ndim
+                bshape[axis] = -1
+                q = np.clip(np.rint(arr / scales.reshape(bshape)), -127, 127).astype(np.int8)
+                new_spec["quantization"] = {"dtype": "int8", "axis": axis, "scales": [float(s) for s in scales]}
+                chunks.append(q.tobytes())
+            else:
+                raise ValueError(f"unknown variant: {variant}")
+            specs.append(new_spec)
+    return [{"paths": ["weights.bin"], "weights": specs}], b"".join(chunks)
+
+
+def build_variant(src_dir: str, variant: str) -> str:
+    with open(os.path.join(src_dir, "model.json"), "r", encoding="utf-8") as f:
+        model_json = json.load(f)
+    weights = tm_engine.load_weights(src_dir, model_json["weightsManifest"])
+    manifest, data = quantize_weights(model_json["weightsManifest"], weights, variant)
+
+    out_dir = os.path.join(src_dir, variant)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "model.json"), "w", encoding="utf-8") as f:
+        json.dump({**model_json, "weightsManifest": manifest}, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(out_dir, "weights.bin"), "wb") as f:
+        f.write(data)
+    shutil.copyfile(os.path.join(src_dir, "metadata.json"), os.path.join(out_dir, "metadata.json"))
+    return out_dir
+
+
+def _load_inputs(model: tm_engine.TMModel, images_dir: str) -> Tuple[List[str], np.ndarray]:
+    from PIL import Image
+
+    names, arrays = [], []
+    for fn in sorted(os.listdir(images_dir)):
+        if not fn.lower().endswith(IMAGE_EXTS):
+            continue
+        try:
+            with Image.open(os.path.join(images_dir, fn)) as img:
+                arrays.append(model.preprocess(img))
+            names.append(fn)
+        except Exception:
+            continue
+    if not arrays:
+        return [], np.zeros((0,) + model.input_shape, dtype=np.float32)
+    return names, np.stack(arrays)
+
+
+def compare(src_dir: str, images_dir: str, variants=VARIANTS, batch_size: int = 32) -> Dict[str, Any]:
+    base = tm_engine.TMModel(src_dir)
+    names, x = _load_inputs(base, images_dir)
+
+    def run(model):
+        if len(x) == 0:
+            return np.zeros((0, len(base.labels)), dtype=np.float32)
+        return np.concatenate([model.predict_batch(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+    ref = run(base)
+    report = {
+        "images": len(names),
+        "float32": {"weights_bytes": os.path.getsize(os.path.join(src_dir, "weights.bin"))},
+    }
+    for variant in variants:
+        vdir = os.path.join(src_dir, variant)
+        probs = run(tm_engine.TMModel(vdir))
+        drift = np.abs(probs - ref) if len(ref) else np.zeros((0,))
+        report[variant] = {
+            "weights_bytes": os.path.getsize(os.path.join(vdir, "weights.bin")),
+            "top1_agreement": float((probs.argmax(1) == ref.argmax(1)).mean()) if len(ref) else None,
+            "mean_abs_drift": float(drift.mean()) if drift.size else None,
+            "max_abs_drift": float(drift.max()) if drift.size else None,
+            "disagreements": [names[i] for i in np.nonzero(probs.argmax(1) != ref.argmax(1))[0]] if len(ref) else [],
+        }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model-dir", default=tm_engine.MODEL_DIR)
+    ap.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    ap.add_argument("--images", help="精度比較に使う画像フォルダ")
+    ap.add_argument("--report", help="比較結果のJSON出力先")
+    args = ap.parse_args()
+
+    for v in args.variants:
+        out = build_variant(args.model_dir, v)
+        print(f"{v}: {out} ({os.path.getsize(os.path.join(out, 'weights.bin'))} bytes)")
+
+    if args.images:
+        report = compare(args.model_dir, args.images, args.variants)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        print(text)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""tm_engine のパリティ検証用の記録ファイル（tests/fixtures/parity/recorded.json）を作る。
+
+使い方（TensorFlow と tf-keras が入った環境で実行する。アプリ本体には不要）:
+    pip install "tensorflow-cpu==2.15.*" "tf-keras==2.15.*"
+    python tools/record_parity.py photo1.jpg photo2.png ... --out tests/fixtures/parity
+
+- 各画像を Streamlit と同じ処理（preprocess.load_for_model）で imageSize の PNG にして out に保存する
+  （コンポーネントが受け取る画像そのもの）
+- コンポーネント（tm_classifier_component/index.html）と同じ画素の計算（RGBA → グレースケール → x/127-1）で、
+  tf.loadLayersModel と同じレイヤー構成（model.json の modelTopology）を Keras で組み立てて推論した確率を記録する
+- 記録形式は tm_engine.check_parity と同じ: [{"image": "xxx.png", "predictions": [{className, probability}]}]
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+import preprocess  # noqa: E402
+
+
+def load_keras_model(model_dir: str):
+    import tf_keras as keras
+
+    with open(os.path.join(model_dir, "model.json"), "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    topology = spec["modelTopology"]
+    model = keras.models.model_from_json(json.dumps(topology.get("model_config", topology)))
+    weights = {}
+    for group in spec["weightsManifest"]:
+        data = b"".join(open(os.path.join(model_dir, p), "rb").read() for p in group["paths"])
+        offset = 0
+        for w in group["weights"]:
+            n = int(np.prod(w["shape"])) if w["shape"] else 1
+            weights[w["name"]] = np.frombuffer(data, np.float32, n, offset).reshape(w["shape"])
+            offset += 4 * n
+    model.set_weights([weights[w.name.split(":")[0]] for w in model.weights])
+    return model
+
+
+def component_pixels(img: Image.Image, grayscale: bool) -> np.ndarray:
+    # index.html の pixelsFromDataUrl と同じ計算（canvas の RGBA から）
+    rgba = np.asarray(img.convert("RGBA"), dtype=np.float64)
+    r, g, b = rgba[..., 0], rgba[..., 1], rgba[..., 2]
+    if grayscale:
+        x = ((r * 0.2989 + g * 0.5870 + b * 0.1140) / 127 - 1)[..., None]
+    else:
+        x = np.stack([r, g, b], axis=-1) / 127 - 1
+    return x.astype(np.float32)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("images", nargs="+")
+    ap.add_argument("--out", default=os.path.join(APP_DIR, "tests", "fixtures", "parity"))
+    ap.add_argument("--model-dir", default=os.path.join(APP_DIR, "static", "model"))
+    args = ap.parse_args()
+
+    with open(os.path.join(args.model_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    labels = meta.get("labels") or []
+    model = load_keras_model(args.model_dir)
+    os.makedirs(args.out, exist_ok=True)
+
+    cases = []
+    for path in args.images:
+        with open(path, "rb") as f:
+            img = preprocess.load_for_model(f.read(), args.model_dir)
+        name = os.path.splitext(os.path.basename(path))[0] + ".png"
+        img.save(os.path.join(args.out, name), format="PNG")
+        probs = model.predict(component_pixels(img, bool(meta.get("grayscale")))[None], verbose=0)[0]
+        predictions = [{"className": labels[i] if i < len(labels) else str(i), "probability": float(p)}
+                       for i, p in enumerate(probs)]
+        predictions.sort(key=lambda r: r["probability"], reverse=True)
+        cases.append({"image": name, "predictions": predictions})
+        print(name, predictions[0]["className"], round(predictions[0]["probability"], 4))
+
+    with open(os.path.join(args.out, "recorded.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(cases, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""監査先（/api/receive_report）の代わりに使うローカルの受信サーバー。
+
+使い方:
+    python tools/stub_receiver.py --port 8090
+    AUDITOR_ENDPOINT=http://127.0.0.1:8090/api/receive_report python app.py
+
+    python tools/stub_receiver.py --fail-rate 0.3      # 30% の POST を 503 で失敗させる
+    python tools/stub_receiver.py --delay 2 --out ./received
+    python tools/stub_receiver.py --reject 'bad'       # ファイル名が 'bad' に一致するものだけ ok: false で返す
+    python tools/stub_receiver.py --legacy              # 1件形式しか知らない古い受信側（results を返さない）
+    python tools/stub_receiver.py --status 422          # すべての POST を 422 で拒否する
+
+- 1件形式 {"filename", "content"} とまとめ形式 {"reports": [...]} の両方を受け付ける
+  （1件形式の応答に accepts_batch: true を付ける。--legacy では付けない）
+- HTTP/1.1 keep-alive で応答するので、送信側が接続を使い回しているかを確認できる
+- 終了時（Ctrl+C）に受信件数・POST回数・接続数を表示する
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS = {"posts": 0, "reports": 0, "failed": 0, "connections": 0}
+_stats_lock = threading.Lock()
+
+
+def make_handler(out_dir, fail_rate: float, delay: float, quiet: bool,
+                 reject: str = "", legacy: bool = False, status: int = 0):
+    reject_re = re.compile(reject) if reject else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with _stats_lock:
+                STATS["connections"] += 1
+
+        def log_message(self, fmt, *args):
+            if not quiet:
+                sys.stderr.write("[stub] " + (fmt % args) + "\n")
+
+        def _reply(self, status: int, obj):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with _stats_lock:
+                self._reply(200, dict(STATS))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if delay:
+                time.sleep(delay)
+            if status:
+                with _stats_lock:
+                    STATS["failed"] += 1
+                return self._reply(status, {"ok": False, "error": f"stub status {status}"})
+            if fail_rate and random.random() < fail_rate:
+                with _stats_lock:
+                    STATS["failed"] += 1
+                return self._reply(503, {"ok": False, "error": "stub failure"})
+            try:
+                data = json.loads(raw.decode("utf-8") or "{}")
+            except ValueError:
+                return self._reply(400, {"ok": False, "error": "invalid json"})
+
+            if legacy:
+                # 古い受信側: {"reports": [...]} も1件として扱い、本文の無い時刻名のファイルを保存して 200 を返す
+                filename = data.get("filename") or time.strftime("cleaning_report_%Y%m%d_%H%M%S.txt")
+                filename = re.sub(r"[^A-Za-z0-9_.-]", "_", filename)
+                if out_dir:
+                    with open(os.path.join(out_dir, filename), "w", encoding="utf-8") as f:
+                        f.write(data.get("content") or "")
+                with _stats_lock:
+                    STATS["posts"] += 1
+                    STATS["reports"] += 1
+                return self._reply(200, {"ok": True, "saved_as": filename})
+
+            items = data["reports"] if isinstance(data.get("reports"), list) else [data]
+            results = []
+            for item in items:
+                filename = re.sub(r"[^A-Za-z0-9_.-]", "_", (item.get("filename") or "report.txt"))
+                if reject_re is not None and reject_re.search(filename):
+                    with _stats_lock:
+                        STATS["failed"] += 1
+                    results.append({"filename": item.get("filename") or "", "ok": False, "error": "rejected"})
+                    continue
+                if out_dir:
+                    with open(os.path.join(out_dir, filename), "w", encoding="utf-8") as f:
+                        f.write(item.get("content") or "")
+                results.append({"filename": item.get("filename") or "", "ok": True, "saved_as": filename})
+            saved = sum(1 for r in results if r["ok"])
+            with _stats_lock:
+                STATS["posts"] += 1
+                STATS["reports"] += saved
+            if "reports" not in data:
+                return self._reply(200, dict(results[0], accepts_batch=True))
+            self._reply(200, {"ok": saved == len(results), "results": results})
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--out", help="受信したレポートの保存先（省略時は保存しない）")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="503 で失敗させる割合（0〜1）")
+    ap.add_argument("--delay", type=float, default=0.0, help="応答までの遅延（秒）")
+    ap.add_argument("--reject", default="", help="ok: false で返すファイル名の正規表現（件ごとの失敗）")
+    ap.add_argument("--legacy", action="store_true", help="1件形式のみの古い受信側として応答する")
+    ap.add_argument("--status", type=int, default=0, help="すべての POST にこのステータスで応答する（4xx の確認用）")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args()
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(args.out, args.fail_rate, args.delay, args.quiet,
+                                              args.reject, args.legacy, args.status))
+    print(f"stub receiver: http://{args.host}:{args.port}/api/receive_report")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(STATS, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+from typing import Callable, List
+
+# =============================
+# 清掃画面で使う外部ライブラリ（tfjs / teachablemachine-image）
+# - tools/fetch_vendor.py で static/vendor/ に取得しておくと自前で配信する（Service Worker でも事前キャッシュ）
+# - 未取得ならこれまでどおり CDN（jsDelivr）から読み込む
+# =============================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VENDOR_DIR = os.path.join(BASE_DIR, "static", "vendor")
+
+# (static/ 以下のパス, CDN のURL) 読み込み順
+BUNDLES = (
+    ("vendor/tf.min.js", "https://cdn.jsdelivr.net/npm/@tensorflow/tfjs@4.20.0/dist/tf.min.js"),
+    ("vendor/teachablemachine-image.min.js",
+     "https://cdn.jsdelivr.net/npm/@teachablemachine/image@0.8.5/dist/teachablemachine-image.min.js"),
+)
+
+
+def script_urls(asset_url: Callable[[str], str]) -> List[str]:
+    """各ライブラリのURL。static/vendor/ にあれば asset_url() の内容ハッシュ付きURL、無ければ CDN。"""
+    urls = []
+    for path, cdn_url in BUNDLES:
+        local = os.path.join(BASE_DIR, "static", path)
+        urls.append(asset_url(path) if os.path.isfile(local) else cdn_url)
+    return urls